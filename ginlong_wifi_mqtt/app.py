@@ -4,25 +4,84 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import contextlib
+import ipaddress
 import json
 import logging
 import os
-from dataclasses import dataclass, replace
+import socket
+import sys
+import time
+from collections.abc import Coroutine
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
+from typing import Any
 
 import aiomqtt
 
-from .decoder import DecodeError, decode_hex_string, decode_inverter_data
-from .discovery import discovery_messages
+from .bulk import BATCH_SIZE, INPUT_FORMATS, OUTPUT_FORMATS, bulk_decode
+from .capture import CaptureWriter, read_capture
+from .changes import PUBLISH_MODES, ChangeFilter, parse_deadband
+from .decoder import (
+    FRAME_OVERHEAD,
+    DecodeError,
+    InverterReport,
+    decode_hex_string,
+    decode_inverter_report,
+)
+from .discovery import HOMEASSISTANT_STATUS_TOPIC, DiscoveryCache
+from .framing import FrameBuffer
+from .history import HistoryWriter, parse_time, query_history, write_history
+from .inflight import InflightWindow, next_or_failure
 from .lan_discovery import (
-    discover_loggers,
+    MAX_SWEEP_ADDRESSES,
+    DiscoveryService,
+    LoggerAdvertisement,
     normalize_mac_address,
+    parse_discovery_network,
     select_logger,
 )
-from .v4 import request_v4_status
+from .metrics import (
+    DATAGRAMS_DROPPED,
+    DECODE_FAILURES,
+    FRAME_BYTES,
+    FRAMES_RECEIVED,
+    MQTT_RECONNECTS,
+    REPORTS_PENDING,
+    start_metrics_server,
+)
+from .poller import (
+    PollTarget,
+    V4Poller,
+    V4SessionPool,
+    parse_poll_target,
+    request_target_status,
+)
+from .rollups import RollupAggregator, RollupMessage
+from .simulator import run_simulator, simulated_fleet
+from .speedups import (
+    EVENT_LOOPS,
+    JSON_ENCODERS,
+    event_loop_factory,
+    run_in_loop,
+    select_json_encoder,
+)
+from .store import LatestReports, RecordingSink, ReportRecorder, ReportSink
+from .tracing import ReportTrace
+from .workers import run_workers
 
 LOGGER = logging.getLogger("ginlong_wifi_mqtt")
-MAX_FRAME_SIZE = 4096
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+BENCHMARKS = ("decode", "framing", "encode", "tcp", "udp", "publish")
+# Frames replayed at full speed between yields to the MQTT publisher.
+REPLAY_BATCH = 64
+# The data length is a single byte, so no valid report can be larger.
+MAX_DATAGRAM_SIZE = 0xFF + FRAME_OVERHEAD
+
+
+def state_topic(client_id: str) -> str:
+    return f"ginlong/inverter_{client_id}"
 
 
 @dataclass(frozen=True)
@@ -47,10 +106,49 @@ class Settings:
     discovery_broadcast: str
     discovery_bind_address: str
     discovery_timeout: float
+    fleet: bool = False
+    poll_targets: tuple[PollTarget, ...] = ()
+    tcp_idle_timeout: float = 420
+    udp_batch_size: int = 64
+    workers: int = 1
+    event_loop: str = "auto"
+    backlog_size: int = 0
+    backlog_file: Path | None = None
+    backlog_file_size: int = 64 * 1024 * 1024
+    mqtt_inflight: int = 20
+    publish_mode: str = "full"
+    deadbands: tuple[tuple[str, float], ...] = ()
+    refresh_interval: float = 900
+    poll_concurrency: int = 16
+    poll_jitter: float = 0.1
+    poll_max_backoff: float = 900
+    poll_persistent: bool = False
+    discovery_interval: float = 300
+    discovery_networks: tuple[ipaddress.IPv4Network, ...] = ()
+    discovery_all_interfaces: bool = False
+    discovery_sweep: bool = False
+    discovery_sweep_rate: float = 200
+    capture_file: Path | None = None
+    metrics_address: str = "0.0.0.0"
+    metrics_port: int | None = None
+    report_log_interval: float = 60
+    slow_report_threshold: float | None = None
+    history_file: Path | None = None
+    history_retention: float = 30
+    rollups: bool = False
+    scaled_values: bool = True
 
     @property
     def mqtt_topic(self) -> str:
-        return f"ginlong/inverter_{self.client_id}"
+        return state_topic(self.client_id)
+
+    def all_poll_targets(self) -> tuple[PollTarget, ...]:
+        if self.poll_host is None or self.logger_serial is None:
+            return self.poll_targets
+        return (
+            PollTarget(self.poll_host, self.poll_port, self.logger_serial),
+            *self.poll_targets,
+        )
 
 
 def environment_flag(name: str, default: bool = False) -> bool:
@@ -69,44 +167,71 @@ def build_parser() -> argparse.ArgumentParser:
         choices=("DEBUG", "INFO", "WARNING", "ERROR"),
         default=os.getenv("LOG_LEVEL", "INFO"),
     )
+    parser.add_argument(
+        "--event-loop",
+        choices=EVENT_LOOPS,
+        default=os.getenv("GINLONG_EVENT_LOOP", "auto"),
+        help="event loop implementation; auto uses uvloop when installed "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--json-encoder",
+        choices=JSON_ENCODERS,
+        default=os.getenv("GINLONG_JSON_ENCODER", "auto"),
+        help="JSON encoder for MQTT payloads; auto uses orjson or msgspec when "
+        "installed, and unavailable encoders fall back to json "
+        "(default: %(default)s)",
+    )
     commands = parser.add_subparsers(dest="command", required=True)
 
-    serve = commands.add_parser("serve", help="receive and publish inverter reports")
-    serve.add_argument(
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument(
         "--listen",
         action=argparse.BooleanOptionalAction,
         default=environment_flag("GINLONG_LISTEN", True),
         help="enable the passive TCP/UDP listener",
     )
-    serve.add_argument(
+    options.add_argument(
         "--listen-address",
         default=os.getenv("GINLONG_LISTEN_ADDRESS", "0.0.0.0"),
         help="address on which to receive inverter reports (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
         "--listen-port",
         type=int,
         default=int(os.getenv("GINLONG_LISTEN_PORT", "9999")),
         help="port on which to receive inverter reports (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
         "--client-id",
         default=os.getenv("GINLONG_CLIENT_ID", "solis"),
         help="identifier used in MQTT topics (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
+        "--fleet",
+        action=argparse.BooleanOptionalAction,
+        default=environment_flag("GINLONG_FLEET"),
+        help="publish each inverter serial to its own topic instead of --client-id",
+    )
+    options.add_argument(
         "--mqtt-address",
         default=os.getenv("MQTT_HOST", "127.0.0.1"),
         help="MQTT broker hostname or address (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
         "--mqtt-port",
         type=int,
         default=int(os.getenv("MQTT_PORT", "1883")),
         help="MQTT broker port (default: %(default)s)",
     )
-    serve.add_argument("--mqtt-username", default=os.getenv("MQTT_USERNAME"))
-    credentials = serve.add_mutually_exclusive_group()
+    options.add_argument(
+        "--mqtt-inflight",
+        type=int,
+        default=int(os.getenv("MQTT_INFLIGHT", "20")),
+        help="QoS 1 publishes awaiting acknowledgement at once (default: %(default)s)",
+    )
+    options.add_argument("--mqtt-username", default=os.getenv("MQTT_USERNAME"))
+    credentials = options.add_mutually_exclusive_group()
     credentials.add_argument("--mqtt-password", default=os.getenv("MQTT_PASSWORD"))
     credentials.add_argument(
         "--mqtt-password-file",
@@ -118,36 +243,170 @@ def build_parser() -> argparse.ArgumentParser:
         ),
         help="read the MQTT password from a file, such as a Swarm secret",
     )
-    serve.add_argument(
+    options.add_argument(
         "--homeassistant",
         action=argparse.BooleanOptionalAction,
         default=environment_flag("HOMEASSISTANT"),
-        help="publish Home Assistant discovery on every MQTT connection",
+        help="publish Home Assistant discovery and follow its birth messages",
+    )
+    options.add_argument(
+        "--publish-mode",
+        choices=PUBLISH_MODES,
+        default=os.getenv("GINLONG_PUBLISH_MODE", "full"),
+        help="publish every report, or only changes (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
+        "--deadband",
+        dest="deadbands",
+        action="append",
+        metavar="FIELD=DELTA",
+        default=os.getenv("GINLONG_DEADBANDS", "").split(),
+        help="ignore raw changes of at most DELTA in FIELD; may be repeated",
+    )
+    options.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=float(os.getenv("GINLONG_REFRESH_INTERVAL", "900")),
+        help="seconds between forced full state publishes (default: %(default)s)",
+    )
+    options.add_argument(
         "--protocol",
         choices=("tcp", "udp"),
         default=os.getenv("GINLONG_PROTOCOL", "tcp"),
         help="inverter transport protocol (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
+        "--tcp-idle-timeout",
+        type=float,
+        default=float(os.getenv("GINLONG_TCP_IDLE_TIMEOUT", "420")),
+        help="seconds before closing a silent TCP connection (default: %(default)s)",
+    )
+    options.add_argument(
+        "--udp-batch-size",
+        type=int,
+        default=int(os.getenv("GINLONG_UDP_BATCH_SIZE", "64")),
+        help="datagrams read per socket wakeup before yielding (default: %(default)s)",
+    )
+    options.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("GINLONG_WORKERS", "1")),
+        help="listener processes sharing the listen port; more than one "
+        "forwards their reports to this process (default: %(default)s)",
+    )
+    options.add_argument(
         "--reconnect-delay",
         type=float,
         default=float(os.getenv("MQTT_RECONNECT_DELAY", "5")),
         help="seconds between MQTT reconnection attempts (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
+        "--backlog-size",
+        type=int,
+        default=int(os.getenv("GINLONG_BACKLOG_SIZE", "0")),
+        help="superseded reports kept while MQTT is down (default: %(default)s)",
+    )
+    options.add_argument(
+        "--backlog-file",
+        type=Path,
+        default=(
+            Path(os.environ["GINLONG_BACKLOG_FILE"])
+            if "GINLONG_BACKLOG_FILE" in os.environ
+            else None
+        ),
+        help="append-only file to which a full in-memory backlog spills",
+    )
+    options.add_argument(
+        "--backlog-file-size",
+        type=int,
+        default=int(os.getenv("GINLONG_BACKLOG_FILE_SIZE", str(64 * 1024 * 1024))),
+        help="maximum bytes held in the backlog file (default: %(default)s)",
+    )
+    options.add_argument(
+        "--metrics-port",
+        type=int,
+        default=(
+            int(os.environ["GINLONG_METRICS_PORT"])
+            if "GINLONG_METRICS_PORT" in os.environ
+            else None
+        ),
+        help="serve Prometheus metrics on this port at /metrics",
+    )
+    options.add_argument(
+        "--metrics-address",
+        default=os.getenv("GINLONG_METRICS_ADDRESS", "0.0.0.0"),
+        help="address on which to serve metrics (default: %(default)s)",
+    )
+    options.add_argument(
+        "--report-log-interval",
+        type=float,
+        default=float(os.getenv("GINLONG_REPORT_LOG_INTERVAL", "60")),
+        help="seconds between INFO logs of each inverter's reports, or 0 for "
+        "every report (default: %(default)s)",
+    )
+    options.add_argument(
+        "--slow-report-threshold",
+        type=float,
+        default=(
+            float(os.environ["GINLONG_SLOW_REPORT_THRESHOLD"])
+            if "GINLONG_SLOW_REPORT_THRESHOLD" in os.environ
+            else None
+        ),
+        help="log the stage timings of reports slower than this many seconds "
+        "from receive to acknowledgement",
+    )
+    options.add_argument(
+        "--scaled-values",
+        action=argparse.BooleanOptionalAction,
+        default=environment_flag("GINLONG_SCALED_VALUES", True),
+        help="add values in engineering units and derived DC power and "
+        "efficiency to JSON state, and point discovery at them",
+    )
+    options.add_argument(
+        "--rollups",
+        action=argparse.BooleanOptionalAction,
+        default=environment_flag("GINLONG_ROLLUPS"),
+        help="publish 1-minute and 15-minute aggregates of every inverter",
+    )
+    options.add_argument(
+        "--history-file",
+        type=Path,
+        default=(
+            Path(os.environ["GINLONG_HISTORY_FILE"])
+            if "GINLONG_HISTORY_FILE" in os.environ
+            else None
+        ),
+        help="record every decoded report to this SQLite database",
+    )
+    options.add_argument(
+        "--history-retention",
+        type=float,
+        default=float(os.getenv("GINLONG_HISTORY_RETENTION", "30")),
+        help="days of report history to keep (default: %(default)s)",
+    )
+    options.add_argument(
+        "--capture",
+        dest="capture_file",
+        type=Path,
+        default=(
+            Path(os.environ["GINLONG_CAPTURE_FILE"])
+            if "GINLONG_CAPTURE_FILE" in os.environ
+            else None
+        ),
+        help="append every received raw frame to this capture file",
+    )
+    options.add_argument(
         "--poll-host",
         default=os.getenv("GINLONG_POLL_HOST"),
         help="actively poll a legacy V4 logger at this address",
     )
-    serve.add_argument(
+    options.add_argument(
         "--poll-port",
         type=int,
         default=int(os.getenv("GINLONG_POLL_PORT", "8899")),
         help="legacy V4 logger port (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
         "--logger-serial",
         type=int,
         default=(
@@ -157,43 +416,284 @@ def build_parser() -> argparse.ArgumentParser:
         ),
         help="numeric WiFi logger serial required for active polling",
     )
-    serve.add_argument(
+    options.add_argument(
+        "--poll-target",
+        dest="poll_targets",
+        action="append",
+        metavar="SERIAL@HOST[:PORT]",
+        default=os.getenv("GINLONG_POLL_TARGETS", "").split(),
+        help="additional legacy V4 logger to poll; may be repeated",
+    )
+    options.add_argument(
         "--poll-interval",
         type=float,
         default=float(os.getenv("GINLONG_POLL_INTERVAL", "60")),
         help="seconds between active status polls (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
+        "--poll-persistent",
+        action=argparse.BooleanOptionalAction,
+        default=environment_flag("GINLONG_POLL_PERSISTENT"),
+        help="keep one connection open per logger between polls",
+    )
+    options.add_argument(
+        "--poll-concurrency",
+        type=int,
+        default=int(os.getenv("GINLONG_POLL_CONCURRENCY", "16")),
+        help="maximum simultaneous status polls (default: %(default)s)",
+    )
+    options.add_argument(
+        "--poll-jitter",
+        type=float,
+        default=float(os.getenv("GINLONG_POLL_JITTER", "0.1")),
+        help="random share of the interval varied per poll (default: %(default)s)",
+    )
+    options.add_argument(
+        "--poll-max-backoff",
+        type=float,
+        default=float(os.getenv("GINLONG_POLL_MAX_BACKOFF", "900")),
+        help="longest delay between polls of a failing logger (default: %(default)s)",
+    )
+    options.add_argument(
         "--discover",
         action=argparse.BooleanOptionalAction,
         default=environment_flag("GINLONG_DISCOVER"),
-        help="discover the active poll target by UDP broadcast at startup",
+        help="keep discovering poll targets by UDP broadcast in the background",
     )
-    serve.add_argument(
+    options.add_argument(
         "--logger-mac",
         default=os.getenv("GINLONG_LOGGER_MAC"),
         help="select this logger MAC when LAN discovery finds multiple devices",
     )
-    serve.add_argument(
+    options.add_argument(
         "--discovery-broadcast",
         default=os.getenv("GINLONG_DISCOVERY_BROADCAST", "255.255.255.255"),
         help="broadcast address used for logger discovery (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
         "--discovery-bind-address",
         default=os.getenv("GINLONG_DISCOVERY_BIND_ADDRESS", "0.0.0.0"),
         help="local address from which to send discovery (default: %(default)s)",
     )
-    serve.add_argument(
+    options.add_argument(
         "--discovery-timeout",
         type=float,
         default=float(os.getenv("GINLONG_DISCOVERY_TIMEOUT", "3")),
-        help="seconds to collect discovery responses (default: %(default)s)",
+        help="seconds between broadcasts until a logger answers "
+        "(default: %(default)s)",
+    )
+    options.add_argument(
+        "--discovery-interval",
+        type=float,
+        default=float(os.getenv("GINLONG_DISCOVERY_INTERVAL", "300")),
+        help="seconds between broadcasts once loggers are known "
+        "(default: %(default)s)",
+    )
+    options.add_argument(
+        "--discovery-network",
+        dest="discovery_networks",
+        action="append",
+        metavar="CIDR",
+        default=os.getenv("GINLONG_DISCOVERY_NETWORKS", "").split(),
+        help="also broadcast discovery to this IPv4 network; may be repeated",
+    )
+    options.add_argument(
+        "--discovery-all-interfaces",
+        action=argparse.BooleanOptionalAction,
+        default=environment_flag("GINLONG_DISCOVERY_ALL_INTERFACES"),
+        help="also broadcast discovery to the network of every local interface",
+    )
+    options.add_argument(
+        "--discovery-sweep",
+        action=argparse.BooleanOptionalAction,
+        default=environment_flag("GINLONG_DISCOVERY_SWEEP"),
+        help="also send discovery to every host of the discovery networks",
+    )
+    options.add_argument(
+        "--discovery-sweep-rate",
+        type=float,
+        default=float(os.getenv("GINLONG_DISCOVERY_SWEEP_RATE", "200")),
+        help="packets per second sent by a sweep (default: %(default)s)",
+    )
+    commands.add_parser(
+        "serve", parents=[options], help="receive and publish inverter reports"
+    )
+    replay = commands.add_parser(
+        "replay",
+        parents=[options],
+        help="publish the frames of a capture file",
+        description="Replay a --capture file through the decoder and MQTT "
+        "publisher. The serve options apply; the listener, polling and "
+        "discovery are not started.",
+    )
+    replay.add_argument("replay_file", metavar="CAPTURE", type=Path)
+    replay.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="playback speed relative to the recording, or 0 for as fast as "
+        "possible (default: %(default)s)",
+    )
+    history = commands.add_parser(
+        "history",
+        help="query the recorded report history",
+        description="Print reports recorded with --history-file in time order. "
+        "Times are Unix seconds, ISO 8601 or an age such as 15m, 2h or 7d.",
+    )
+    history.add_argument(
+        "--history-file",
+        type=Path,
+        default=(
+            Path(os.environ["GINLONG_HISTORY_FILE"])
+            if "GINLONG_HISTORY_FILE" in os.environ
+            else None
+        ),
+        help="history database to read",
+    )
+    history.add_argument(
+        "--serial",
+        dest="serials",
+        action="append",
+        default=[],
+        help="only this inverter serial; may be repeated",
+    )
+    history.add_argument("--since", help="earliest report time")
+    history.add_argument("--until", help="report time to stop before")
+    history.add_argument(
+        "--field",
+        dest="fields",
+        action="append",
+        default=[],
+        metavar="FIELD",
+        help="only this raw field; may be repeated",
+    )
+    history.add_argument("--limit", type=int, help="print at most this many reports")
+    history.add_argument(
+        "--format",
+        choices=("jsonl", "csv"),
+        default="jsonl",
+        help="output format (default: %(default)s)",
+    )
+    benchmark = commands.add_parser(
+        "benchmark", help="measure decode, ingest and publish throughput"
+    )
+    benchmark.add_argument(
+        "--only",
+        dest="benchmarks",
+        action="append",
+        choices=BENCHMARKS,
+        help="run only this benchmark; may be repeated",
+    )
+    benchmark.add_argument(
+        "--frames",
+        type=int,
+        default=20000,
+        help="frames per benchmark (default: %(default)s)",
+    )
+    benchmark.add_argument(
+        "--connections",
+        type=int,
+        default=100,
+        help="concurrent sticks in the TCP benchmark (default: %(default)s)",
+    )
+    benchmark.add_argument(
+        "--json", action="store_true", help="print the results as JSON"
+    )
+    simulate = commands.add_parser(
+        "simulate", help="run simulated WiFi sticks for load testing"
+    )
+    simulate.add_argument(
+        "--devices",
+        type=int,
+        default=100,
+        help="number of simulated sticks (default: %(default)s)",
+    )
+    simulate.add_argument(
+        "--protocol",
+        choices=("tcp", "udp", "none"),
+        default="tcp",
+        help="transport used to push reports (default: %(default)s)",
+    )
+    simulate.add_argument(
+        "--target-address",
+        default="127.0.0.1",
+        help="bridge listener address (default: %(default)s)",
+    )
+    simulate.add_argument(
+        "--target-port",
+        type=int,
+        default=9999,
+        help="bridge listener port (default: %(default)s)",
+    )
+    simulate.add_argument(
+        "--interval",
+        type=float,
+        default=360,
+        help="seconds between reports of each stick (default: %(default)s)",
+    )
+    simulate.add_argument(
+        "--bind-address",
+        default="127.0.0.1",
+        help="address of the V4 and discovery responders (default: %(default)s)",
+    )
+    simulate.add_argument(
+        "--v4-port",
+        type=int,
+        help="answer legacy V4 status polls on this port, such as 8899",
+    )
+    simulate.add_argument(
+        "--discovery-port",
+        type=int,
+        help="answer LAN discovery on this port, such as 48899",
+    )
+    simulate.add_argument(
+        "--seed", type=int, help="seed for reproducible simulated values"
     )
     decode = commands.add_parser(
-        "decode", help="decode one hexadecimal inverter report"
+        "decode",
+        help="decode one hexadecimal inverter report or many from files",
+        description="Decode HEX, or stream every report in the --input files "
+        "or standard input as JSON lines, CSV or Parquet. Input is one "
+        "hexadecimal report per line, back-to-back binary frames or a "
+        "--capture file. Records that cannot be decoded are reported on "
+        "standard error by line or frame number.",
+    )
+    decode.add_argument("hex_report", metavar="HEX", nargs="?")
+    decode.add_argument(
+        "--input",
+        dest="inputs",
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="read reports from this file, - for standard input; repeatable",
+    )
+    decode.add_argument(
+        "--input-format",
+        choices=INPUT_FORMATS,
+        default="auto",
+        help="input format (default: %(default)s, detected from the content)",
+    )
+    decode.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="jsonl",
+        help="output format for --input (default: %(default)s)",
+    )
+    decode.add_argument(
+        "--output", type=Path, help="write to this file instead of standard output"
+    )
+    decode.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="decode in this many processes (default: %(default)s)",
+    )
+    decode.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="reports decoded per chunk (default: %(default)s)",
     )
-    decode.add_argument("hex_report", metavar="HEX")
     return parser
 
 
@@ -203,14 +703,70 @@ def settings_from_args(args: argparse.Namespace) -> Settings:
         password = args.mqtt_password_file.read_text(encoding="utf-8").strip()
     if args.poll_host and args.logger_serial is None and not args.discover:
         raise ValueError("--logger-serial is required with --poll-host")
-    if not args.listen and not args.poll_host and not args.discover:
+    poll_targets = tuple(
+        parse_poll_target(value, args.poll_port) for value in args.poll_targets
+    )
+    if (
+        not args.listen
+        and not args.poll_host
+        and not poll_targets
+        and not args.discover
+    ):
         raise ValueError(
-            "enable --listen, configure --poll-host or --discover, or both"
+            "enable --listen, configure --poll-host, --poll-target or "
+            "--discover, or both"
         )
     if args.poll_interval <= 0:
         raise ValueError("--poll-interval must be greater than zero")
+    if args.poll_concurrency <= 0:
+        raise ValueError("--poll-concurrency must be greater than zero")
+    if not 0 <= args.poll_jitter < 1:
+        raise ValueError("--poll-jitter must be at least zero and below one")
     if args.discovery_timeout <= 0:
         raise ValueError("--discovery-timeout must be greater than zero")
+    if args.discovery_interval <= 0:
+        raise ValueError("--discovery-interval must be greater than zero")
+    discovery_networks = tuple(
+        parse_discovery_network(value) for value in args.discovery_networks
+    )
+    if args.discovery_sweep_rate <= 0:
+        raise ValueError("--discovery-sweep-rate must be greater than zero")
+    if args.discovery_sweep and any(
+        network.num_addresses > MAX_SWEEP_ADDRESSES for network in discovery_networks
+    ):
+        raise ValueError("--discovery-sweep networks must not be larger than a /20")
+    if args.tcp_idle_timeout <= 0:
+        raise ValueError("--tcp-idle-timeout must be greater than zero")
+    if args.udp_batch_size <= 0:
+        raise ValueError("--udp-batch-size must be greater than zero")
+    if args.workers <= 0:
+        raise ValueError("--workers must be greater than zero")
+    if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        raise ValueError("--workers needs SO_REUSEPORT, which is unavailable here")
+    if args.workers > 1 and args.capture_file is not None:
+        raise ValueError("--capture cannot be combined with --workers")
+    deadbands = tuple(parse_deadband(value) for value in args.deadbands)
+    if args.homeassistant and args.publish_mode == "deadband":
+        # Discovery templates read every key of the state topic, which
+        # partial deadband objects leave undefined.
+        raise ValueError(
+            "--publish-mode deadband cannot be used with --homeassistant; "
+            "use fields or changed"
+        )
+    if args.refresh_interval <= 0:
+        raise ValueError("--refresh-interval must be greater than zero")
+    if args.mqtt_inflight <= 0:
+        raise ValueError("--mqtt-inflight must be greater than zero")
+    if args.history_retention <= 0:
+        raise ValueError("--history-retention must be greater than zero")
+    if args.report_log_interval < 0:
+        raise ValueError("--report-log-interval must not be negative")
+    if args.slow_report_threshold is not None and args.slow_report_threshold < 0:
+        raise ValueError("--slow-report-threshold must not be negative")
+    if args.backlog_size < 0:
+        raise ValueError("--backlog-size must not be negative")
+    if args.backlog_file is not None and args.backlog_size == 0:
+        raise ValueError("--backlog-file requires a --backlog-size")
     logger_mac = (
         normalize_mac_address(args.logger_mac) if args.logger_mac else None
     )
@@ -236,222 +792,520 @@ def settings_from_args(args: argparse.Namespace) -> Settings:
         discovery_broadcast=args.discovery_broadcast,
         discovery_bind_address=args.discovery_bind_address,
         discovery_timeout=args.discovery_timeout,
+        discovery_interval=args.discovery_interval,
+        discovery_networks=discovery_networks,
+        discovery_all_interfaces=args.discovery_all_interfaces,
+        discovery_sweep=args.discovery_sweep,
+        discovery_sweep_rate=args.discovery_sweep_rate,
+        capture_file=args.capture_file,
+        metrics_address=args.metrics_address,
+        metrics_port=args.metrics_port,
+        report_log_interval=args.report_log_interval,
+        slow_report_threshold=args.slow_report_threshold,
+        history_file=args.history_file,
+        history_retention=args.history_retention,
+        rollups=args.rollups,
+        scaled_values=args.scaled_values,
+        fleet=args.fleet,
+        poll_targets=poll_targets,
+        tcp_idle_timeout=args.tcp_idle_timeout,
+        udp_batch_size=args.udp_batch_size,
+        workers=args.workers,
+        event_loop=args.event_loop,
+        backlog_size=args.backlog_size,
+        backlog_file=args.backlog_file,
+        backlog_file_size=args.backlog_file_size,
+        mqtt_inflight=args.mqtt_inflight,
+        publish_mode=args.publish_mode,
+        deadbands=deadbands,
+        refresh_interval=args.refresh_interval,
+        poll_concurrency=args.poll_concurrency,
+        poll_jitter=args.poll_jitter,
+        poll_max_backoff=args.poll_max_backoff,
+        poll_persistent=args.poll_persistent,
     )
 
 
-def enqueue_latest(
-    queue: asyncio.Queue[dict[str, object]], status: dict[str, object]
-) -> None:
-    """Keep only the latest report while MQTT is unavailable."""
-    if queue.full():
-        queue.get_nowait()
-    queue.put_nowait(status)
+class ReportLogSampler:
+    """Choose which received reports are logged at INFO rather than DEBUG.
+
+    The first report of each inverter is logged, then at most one every
+    ``interval`` seconds, noting how many were received in between. An
+    interval of zero logs every report.
+    """
+
+    def __init__(self, interval: float = 60) -> None:
+        self.interval = interval
+        self._logged: dict[str, tuple[float, int]] = {}
 
+    def sample(self, inverter_serial: str, now: float) -> int | None:
+        """Return the reports skipped since the last logged one, or ``None``."""
+        logged_at, skipped = self._logged.get(inverter_serial, (None, 0))
+        if logged_at is not None and now - logged_at < self.interval:
+            self._logged[inverter_serial] = (logged_at, skipped + 1)
+            return None
+        self._logged[inverter_serial] = (now, 0)
+        return skipped
 
-async def process_payload(
+
+REPORT_LOG = ReportLogSampler()
+
+
+def process_payload(
     raw_data: bytes,
-    queue: asyncio.Queue[dict[str, object]],
+    reports: ReportSink,
     peer: object,
-) -> None:
+    capture: CaptureWriter | None = None,
+    transport: str = "tcp",
+    received: float | None = None,
+) -> bool:
+    """Decode and store one raw frame received at ``received`` (perf_counter)."""
+    if received is None:
+        received = time.perf_counter()
+    FRAMES_RECEIVED.inc(transport)
+    FRAME_BYTES.observe(len(raw_data), transport)
+    if capture is not None:
+        capture.write(raw_data, peer, transport)
     try:
-        status = decode_inverter_data(raw_data)
+        report = decode_inverter_report(raw_data)
     except DecodeError as error:
+        DECODE_FAILURES.inc(error.reason)
         LOGGER.warning("Rejected report from %s: %s", peer, error)
-        return
+        return False
 
-    LOGGER.info(
-        "Received report from %s: inverter=%s power=%sW bytes=%d",
+    skipped = REPORT_LOG.sample(report.inverter_serial, time.monotonic())
+    LOGGER.log(
+        logging.DEBUG if skipped is None else logging.INFO,
+        "Received report from %s: inverter=%s power=%sW bytes=%d%s",
         peer,
-        status["inverter_serial"],
-        status["watt_now"],
+        report.inverter_serial,
+        report["watt_now"],
         len(raw_data),
+        f" ({skipped} more since the last logged)" if skipped else "",
     )
-    enqueue_latest(queue, status)
+    trace = report.trace = ReportTrace(received, time.perf_counter())
+    reports.put(report)
+    trace.enqueued = time.perf_counter()
+    return True
 
 
-async def handle_tcp_client(
-    reader: asyncio.StreamReader,
-    writer: asyncio.StreamWriter,
-    queue: asyncio.Queue[dict[str, object]],
-) -> None:
-    peer = writer.get_extra_info("peername")
-    raw_data = bytearray()
-    try:
-        while len(raw_data) < MAX_FRAME_SIZE:
-            timeout = 10 if not raw_data else 1
-            try:
-                chunk = await asyncio.wait_for(
-                    reader.read(MAX_FRAME_SIZE - len(raw_data)), timeout
+class InverterStreamProtocol(asyncio.Protocol):
+    """Decode every report sent over a persistent TCP connection."""
+
+    def __init__(
+        self,
+        reports: ReportSink,
+        idle_timeout: float,
+        capture: CaptureWriter | None = None,
+    ) -> None:
+        self.reports = reports
+        self.idle_timeout = idle_timeout
+        self.capture = capture
+        self.frames = FrameBuffer()
+        self.peer: object = None
+        self.transport: asyncio.Transport | None = None
+        self._last_activity = 0.0
+        self._idle_handle: asyncio.TimerHandle | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self.transport = transport
+        self.peer = transport.get_extra_info("peername")
+        loop = asyncio.get_running_loop()
+        self._last_activity = loop.time()
+        self._idle_handle = loop.call_later(self.idle_timeout, self._check_idle)
+
+    def data_received(self, data: bytes) -> None:
+        # Only record activity here; the idle timer is re-armed lazily instead
+        # of being rescheduled for every chunk.
+        self._last_activity = asyncio.get_running_loop().time()
+        received = time.perf_counter()
+        try:
+            for frame in self.frames.feed(data):
+                process_payload(
+                    frame, self.reports, self.peer, self.capture, "tcp", received
                 )
-            except TimeoutError:
-                break
-            if not chunk:
-                break
-            raw_data.extend(chunk)
-
-            # Known reports are data-length + 14 bytes including framing/trailer.
-            if len(raw_data) >= 2 and len(raw_data) >= raw_data[1] + 14:
-                break
-
-        if raw_data:
-            await process_payload(bytes(raw_data), queue, peer)
-    except Exception:
-        LOGGER.exception("Unhandled TCP client error from %s", peer)
-    finally:
-        writer.close()
-        await writer.wait_closed()
+        except Exception:
+            LOGGER.exception("Unhandled TCP client error from %s", self.peer)
+            assert self.transport is not None
+            self.transport.close()
+
+    def _check_idle(self) -> None:
+        loop = asyncio.get_running_loop()
+        remaining = self._last_activity + self.idle_timeout - loop.time()
+        if remaining > 0:
+            self._idle_handle = loop.call_later(remaining, self._check_idle)
+            return
+        LOGGER.debug("Closing idle TCP connection from %s", self.peer)
+        assert self.transport is not None
+        self.transport.close()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        if self.frames.discarded or len(self.frames):
+            LOGGER.warning(
+                "Discarded %d unframed and %d trailing bytes from %s",
+                self.frames.discarded,
+                len(self.frames),
+                self.peer,
+            )
 
 
 class InverterDatagramProtocol(asyncio.DatagramProtocol):
-    def __init__(self, queue: asyncio.Queue[dict[str, object]]) -> None:
-        self.queue = queue
+    """Decode datagrams inline so that a flood cannot queue unbounded work."""
+
+    def __init__(
+        self, reports: ReportSink, capture: CaptureWriter | None = None
+    ) -> None:
+        self.reports = reports
+        self.capture = capture
+        self.received = 0
+        self.rejected = 0
+        self.dropped = 0
 
     def datagram_received(self, data: bytes, addr: object) -> None:
-        asyncio.create_task(process_payload(data, self.queue, addr))
+        self.received += 1
+        if len(data) > MAX_DATAGRAM_SIZE:
+            self.dropped += 1
+            DATAGRAMS_DROPPED.inc()
+            LOGGER.debug("Dropped %d-byte datagram from %s", len(data), addr)
+            return
+        received = time.perf_counter()
+        if not process_payload(
+            data, self.reports, addr, self.capture, "udp", received
+        ):
+            self.rejected += 1
 
     def error_received(self, exc: Exception) -> None:
         LOGGER.warning("UDP receive error: %s", exc)
 
 
-async def poll_v4_logger(
-    settings: Settings,
-    queue: asyncio.Queue[dict[str, object]],
-) -> None:
-    assert settings.poll_host is not None
-    assert settings.logger_serial is not None
+class BatchedDatagramReader:
+    """Drain several datagrams per socket wakeup into a datagram protocol.
 
-    while True:
-        started = asyncio.get_running_loop().time()
+    The stock asyncio transport reads one datagram per event loop iteration.
+    Reading up to ``batch_size`` at a time amortises the wakeup, while the
+    limit still returns control to the MQTT publisher during a flood; excess
+    datagrams wait in, and are eventually dropped by, the kernel buffer.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        protocol: InverterDatagramProtocol,
+        batch_size: int,
+    ) -> None:
+        self.sock = sock
+        self.protocol = protocol
+        self.batch_size = batch_size
+        # One spare byte detects datagrams larger than any valid report.
+        self._buffer = bytearray(MAX_DATAGRAM_SIZE + 1)
+        self._view = memoryview(self._buffer)
+
+    def read_ready(self) -> None:
+        for _ in range(self.batch_size):
+            try:
+                size, addr = self.sock.recvfrom_into(self._buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as error:
+                self.protocol.error_received(error)
+                return
+            self.protocol.datagram_received(bytes(self._view[:size]), addr)
+
+
+def bind_udp_socket(
+    address: str, port: int, *, reuse_port: bool = False
+) -> socket.socket:
+    family, kind, proto, _, sockaddr = socket.getaddrinfo(
+        address, port, type=socket.SOCK_DGRAM, flags=socket.AI_PASSIVE
+    )[0]
+    sock = socket.socket(family, kind, proto)
+    try:
+        sock.setblocking(False)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(sockaddr)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def discovered_poll_targets(
+    settings: Settings, advertisements: list[LoggerAdvertisement]
+) -> tuple[PollTarget, ...]:
+    """Merge discovered loggers into the configured poll targets.
+
+    A discovered logger replaces a static target with the same serial, so a
+    configured ``--poll-host`` only serves as the fallback until it answers.
+    In fleet mode without ``--logger-mac`` every logger that reports its
+    serial is polled.
+    """
+    if settings.fleet and settings.logger_mac is None:
+        candidates = advertisements
+        fallback_serial = None
+    else:
         try:
-            raw_data = await request_v4_status(
-                settings.poll_host,
-                settings.poll_port,
-                settings.logger_serial,
-            )
-            await process_payload(
-                raw_data,
-                queue,
-                f"poll {settings.poll_host}:{settings.poll_port}",
+            selected = select_logger(
+                advertisements,
+                mac_address=settings.logger_mac,
+                serial=settings.logger_serial,
             )
-        except (OSError, TimeoutError, asyncio.IncompleteReadError) as error:
+        except ValueError as error:
+            LOGGER.warning("WiFi logger discovery: %s", error)
+            selected = None
+        candidates = [] if selected is None else [selected]
+        fallback_serial = settings.logger_serial
+
+    discovered: dict[int, PollTarget] = {}
+    for advertisement in candidates:
+        logger_serial = advertisement.serial or fallback_serial
+        if logger_serial is None:
             LOGGER.warning(
-                "Legacy V4 poll of %s:%d failed: %s",
-                settings.poll_host,
-                settings.poll_port,
-                error,
+                "Discovered WiFi logger mac=%s did not report a serial; "
+                "configure --logger-serial",
+                advertisement.mac_address,
             )
-
-        elapsed = asyncio.get_running_loop().time() - started
-        await asyncio.sleep(max(0, settings.poll_interval - elapsed))
+            continue
+        discovered[logger_serial] = PollTarget(
+            advertisement.ip_address, settings.poll_port, logger_serial
+        )
+    static = tuple(
+        target
+        for target in settings.all_poll_targets()
+        if target.logger_serial not in discovered
+    )
+    return (*discovered.values(), *static)
 
 
-async def resolve_poll_target(settings: Settings) -> Settings:
-    if not settings.discover:
-        return settings
+async def run_discovery(
+    settings: Settings, poller: V4Poller, sessions: V4SessionPool | None
+) -> None:
+    def loggers_changed(advertisements: list[LoggerAdvertisement]) -> None:
+        for advertisement in advertisements:
+            LOGGER.info(
+                "Discovered WiFi logger ip=%s mac=%s serial=%s",
+                advertisement.ip_address,
+                advertisement.mac_address,
+                advertisement.serial
+                if advertisement.serial is not None
+                else "not reported",
+            )
+        targets = discovered_poll_targets(settings, advertisements)
+        poller.set_targets(targets)
+        if sessions is not None:
+            sessions.retain(targets)
 
+    service = DiscoveryService(
+        loggers_changed,
+        broadcast_address=settings.discovery_broadcast,
+        bind_address=settings.discovery_bind_address,
+        interval=settings.discovery_interval,
+        retry_delay=settings.discovery_timeout,
+        networks=settings.discovery_networks,
+        all_interfaces=settings.discovery_all_interfaces,
+        sweep=settings.discovery_sweep,
+        sweep_rate=settings.discovery_sweep_rate,
+        # One logger is only chosen once every reply to a round is known.
+        per_round=not settings.fleet,
+    )
     LOGGER.info(
-        "Discovering WiFi loggers via UDP broadcast %s:48899",
+        "Discovering WiFi loggers via UDP broadcast %s:%d%s",
         settings.discovery_broadcast,
+        service.port,
+        "".join(f", {network}" for network in settings.discovery_networks),
     )
     try:
-        advertisements = await discover_loggers(
-            broadcast_address=settings.discovery_broadcast,
-            bind_address=settings.discovery_bind_address,
-            timeout=settings.discovery_timeout,
-        )
-        selected = select_logger(
-            advertisements,
-            mac_address=settings.logger_mac,
-            serial=settings.logger_serial,
-        )
-    except (OSError, ValueError) as error:
+        await service.run()
+    except OSError as error:
+        # Polling carries on with whatever targets are configured.
         LOGGER.warning("WiFi logger discovery failed: %s", error)
-        selected = None
-
-    if selected is not None:
-        logger_serial = selected.serial or settings.logger_serial
-        if logger_serial is None:
-            raise ValueError(
-                "discovered logger did not report a serial; configure "
-                "--logger-serial"
-            )
-        LOGGER.info(
-            "Discovered WiFi logger ip=%s mac=%s serial=%s",
-            selected.ip_address,
-            selected.mac_address,
-            selected.serial if selected.serial is not None else "not reported",
-        )
-        if selected.serial is None:
-            LOGGER.info("Using configured logger serial %d", logger_serial)
-        return replace(
-            settings,
-            poll_host=selected.ip_address,
-            logger_serial=logger_serial,
-        )
 
-    if settings.poll_host is not None and settings.logger_serial is not None:
-        LOGGER.warning(
-            "No matching logger discovered; using static poll target %s:%d",
-            settings.poll_host,
-            settings.poll_port,
-        )
-        return settings
 
-    raise ValueError(
-        "no matching logger discovered and no usable static poll target exists"
+async def publish_discovery(
+    window: InflightWindow, cache: DiscoveryCache, client_id: str
+) -> None:
+    """Publish retained discovery for a client ID unless the broker has it."""
+    if not cache.needs_publish(client_id):
+        return
+    _, messages = cache.messages(client_id, state_topic(client_id))
+    for topic, payload in messages:
+        # The client ID token lets a lost publish be forgotten on disconnect.
+        await window.publish(topic, payload, retain=True, token=client_id)
+    cache.mark_published(client_id)
+    LOGGER.info(
+        "Published %d retained Home Assistant discovery topics for %s",
+        len(messages),
+        client_id,
     )
 
 
-async def publish_discovery(
-    client: aiomqtt.Client, settings: Settings
+async def watch_homeassistant_status(
+    client: aiomqtt.Client, window: InflightWindow, cache: DiscoveryCache
 ) -> None:
-    count = 0
-    for topic, payload in discovery_messages(
-        settings.client_id, settings.mqtt_topic
-    ):
-        await client.publish(topic, payload=payload, qos=1, retain=True)
-        count += 1
-    LOGGER.info("Published %d retained Home Assistant discovery topics", count)
+    """Republish all discovery when Home Assistant sends its birth message."""
+    await client.subscribe(HOMEASSISTANT_STATUS_TOPIC, qos=1)
+    async for message in client.messages:
+        if message.payload not in (b"online", "online"):
+            continue
+        LOGGER.info("Home Assistant restarted; republishing discovery")
+        for client_id in cache.forget_all():
+            await publish_discovery(window, cache, client_id)
+
+
+async def publish_rollups(window: InflightWindow, rollups: RollupAggregator) -> None:
+    """Publish rollup windows as they close.
+
+    Each message is its own token, so the publisher puts back those left
+    unacknowledged by a lost connection; those not yet sent are put back here.
+    """
+    while True:
+        messages = await rollups.get()
+        sent = 0
+        try:
+            for message in messages:
+                await window.publish(message.topic, message.payload, token=message)
+                sent += 1
+        except BaseException:
+            rollups.restore(messages[sent:])
+            raise
+
+
+async def cancel_and_wait(task: asyncio.Task[Any]) -> None:
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def run_alongside(
+    stack: contextlib.AsyncExitStack,
+    window: InflightWindow,
+    coroutine: Coroutine[Any, Any, None],
+) -> None:
+    """Run a task for the life of one connection.
+
+    Its failure fails ``window``, so the publisher reconnects or stops as it
+    would for a failed publish, and the task is awaited when ``stack`` closes.
+    """
+    task = asyncio.create_task(coroutine)
+    window.watch(task)
+    stack.push_async_callback(cancel_and_wait, task)
+
+
+async def next_report(
+    reports: LatestReports, window: InflightWindow
+) -> tuple[str, InverterReport]:
+    try:
+        return reports.get_nowait()
+    except asyncio.QueueEmpty:
+        # Only an idle publisher needs to watch for acknowledgements failing.
+        return await next_or_failure(window, asyncio.ensure_future(reports.get()))
 
 
 async def mqtt_publisher(
     settings: Settings,
-    queue: asyncio.Queue[dict[str, object]],
+    reports: LatestReports,
+    rollups: RollupAggregator | None = None,
 ) -> None:
     client = aiomqtt.Client(
         hostname=settings.mqtt_address,
         port=settings.mqtt_port,
         username=settings.mqtt_username,
         password=settings.mqtt_password,
+        max_inflight_messages=settings.mqtt_inflight,
     )
-    pending: dict[str, object] | None = None
-
+    # aiomqtt warns about more than ten pending publishes; a full in-flight
+    # window is expected here.
+    client.pending_calls_threshold = max(
+        client.pending_calls_threshold, settings.mqtt_inflight
+    )
+    changes = ChangeFilter(
+        settings.publish_mode,
+        dict(settings.deadbands),
+        settings.refresh_interval,
+        scaled=settings.scaled_values,
+    )
+    discovery = DiscoveryCache(
+        field_topics=settings.publish_mode == "fields",
+        scaled=settings.scaled_values,
+    )
+    loop = asyncio.get_running_loop()
     while True:
+        window = InflightWindow(client, settings.mqtt_inflight)
+        # Re-queued reports must not be filtered against themselves.
+        changes.reset()
         try:
-            async with client:
+            async with client, contextlib.AsyncExitStack() as stack:
                 LOGGER.info(
                     "Connected to MQTT broker %s:%d",
                     settings.mqtt_address,
                     settings.mqtt_port,
                 )
+                # Retained discovery is only republished when its content
+                # changes or Home Assistant restarts, and in fleet mode only
+                # once an inverter has actually reported.
                 if settings.homeassistant:
-                    await publish_discovery(client, settings)
+                    run_alongside(
+                        stack,
+                        window,
+                        watch_homeassistant_status(client, window, discovery),
+                    )
+                    if not settings.fleet:
+                        await publish_discovery(
+                            window, discovery, settings.client_id
+                        )
+                if rollups is not None:
+                    run_alongside(stack, window, publish_rollups(window, rollups))
 
+                # The store hands out any backlog, in order, before live
+                # reports, and takes back whatever could not be published.
                 while True:
-                    if pending is None:
-                        pending = await queue.get()
-                    await client.publish(
-                        settings.mqtt_topic,
-                        payload=json.dumps(pending, separators=(",", ":")),
-                        qos=1,
-                        retain=False,
-                    )
-                    LOGGER.info(
-                        "Published inverter state to %s",
-                        settings.mqtt_topic,
-                    )
-                    pending = None
+                    try:
+                        client_id, report = await next_report(reports, window)
+                    except asyncio.QueueEmpty:
+                        # The input has finished; deliver what is in flight.
+                        await window.drain()
+                        return
+                    trace = report.trace
+                    on_ack = None
+                    if trace is not None:
+                        trace.dequeued = time.perf_counter()
+                        on_ack = partial(
+                            trace.complete,
+                            report.inverter_serial,
+                            settings.slow_report_threshold,
+                        )
+                    try:
+                        if settings.homeassistant:
+                            await publish_discovery(window, discovery, client_id)
+                        topic = state_topic(client_id)
+                        messages = changes.messages(
+                            client_id, topic, report, loop.time()
+                        )
+                        token = (client_id, report)
+                        # The trace completes with the last message's PUBACK.
+                        for index, (message_topic, payload) in enumerate(messages):
+                            await window.publish(
+                                message_topic,
+                                payload,
+                                token=token,
+                                on_ack=on_ack if index == len(messages) - 1 else None,
+                            )
+                    except aiomqtt.MqttError:
+                        reports.restore(client_id, report)
+                        raise
+                    if messages:
+                        LOGGER.debug("Published inverter state to %s", topic)
         except aiomqtt.MqttError as error:
+            MQTT_RECONNECTS.inc()
+            for token in reversed(window.abort()):
+                if isinstance(token, str):
+                    discovery.forget(token)
+                elif rollups is not None and isinstance(token, RollupMessage):
+                    rollups.restore([token])
+                else:
+                    reports.restore(*token)
             LOGGER.warning(
                 "MQTT connection failed or was lost: %s; retrying in %.1fs",
                 error,
@@ -462,13 +1316,21 @@ async def mqtt_publisher(
 
 async def run_listener(
     settings: Settings,
-    queue: asyncio.Queue[dict[str, object]],
+    reports: ReportSink,
+    capture: CaptureWriter | None = None,
+    *,
+    reuse_port: bool = False,
 ) -> None:
+    """Receive pushed reports; ``reuse_port`` lets worker processes share the port."""
+    loop = asyncio.get_running_loop()
     if settings.protocol == "tcp":
-        server = await asyncio.start_server(
-            lambda reader, writer: handle_tcp_client(reader, writer, queue),
+        server = await loop.create_server(
+            lambda: InverterStreamProtocol(
+                reports, settings.tcp_idle_timeout, capture
+            ),
             settings.listen_address,
             settings.listen_port,
+            reuse_port=reuse_port or None,
         )
         LOGGER.info(
             "Listening on TCP %s:%d",
@@ -478,11 +1340,19 @@ async def run_listener(
         async with server:
             await server.serve_forever()
 
-    loop = asyncio.get_running_loop()
-    transport, _ = await loop.create_datagram_endpoint(
-        lambda: InverterDatagramProtocol(queue),
-        local_addr=(settings.listen_address, settings.listen_port),
+    protocol = InverterDatagramProtocol(reports, capture)
+    sock = bind_udp_socket(
+        settings.listen_address, settings.listen_port, reuse_port=reuse_port
     )
+    transport: asyncio.BaseTransport | None = None
+    try:
+        reader = BatchedDatagramReader(sock, protocol, settings.udp_batch_size)
+        loop.add_reader(sock.fileno(), reader.read_ready)
+    except NotImplementedError:
+        # Proactor event loops cannot watch raw sockets.
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: protocol, sock=sock
+        )
     LOGGER.info(
         "Listening on UDP %s:%d",
         settings.listen_address,
@@ -491,29 +1361,105 @@ async def run_listener(
     try:
         await asyncio.Future()
     finally:
-        transport.close()
+        if transport is not None:
+            transport.close()
+        else:
+            loop.remove_reader(sock.fileno())
+            sock.close()
+        LOGGER.info(
+            "UDP listener received %d datagrams: %d rejected, %d dropped",
+            protocol.received,
+            protocol.rejected,
+            protocol.dropped,
+        )
+
+
+def create_store(settings: Settings) -> LatestReports:
+    return LatestReports(
+        None if settings.fleet else settings.client_id,
+        backlog_size=settings.backlog_size,
+        spill_path=settings.backlog_file,
+        spill_limit=settings.backlog_file_size,
+    )
+
+
+async def start_observability(
+    settings: Settings, reports: LatestReports
+) -> asyncio.Server | None:
+    REPORT_LOG.interval = settings.report_log_interval
+    REPORTS_PENDING.function = reports.__len__
+    if settings.metrics_port is None:
+        return None
+    server = await start_metrics_server(
+        settings.metrics_address, settings.metrics_port
+    )
+    LOGGER.info(
+        "Serving metrics on http://%s:%d/metrics",
+        settings.metrics_address,
+        settings.metrics_port,
+    )
+    return server
 
 
 async def run_bridge(settings: Settings) -> None:
-    settings = await resolve_poll_target(settings)
-    queue: asyncio.Queue[dict[str, object]] = asyncio.Queue(maxsize=1)
+    reports = create_store(settings)
+    metrics = await start_observability(settings, reports)
+    capture = (
+        CaptureWriter(settings.capture_file)
+        if settings.capture_file is not None
+        else None
+    )
+    recorders: list[ReportRecorder] = []
+    rollups = None
+    if settings.rollups:
+        rollups = RollupAggregator(reports.route, state_topic)
+        recorders.append(rollups)
     tasks = [
         asyncio.create_task(
-            mqtt_publisher(settings, queue), name="mqtt-publisher"
+            mqtt_publisher(settings, reports, rollups), name="mqtt-publisher"
         )
     ]
-    if settings.listen_enabled:
+    if settings.history_file is not None:
+        history = HistoryWriter(
+            settings.history_file, retention=settings.history_retention * 86400
+        )
+        recorders.append(history)
+        tasks.append(asyncio.create_task(history.run(), name="report-history"))
+    # Receivers put reports into the sink; the publisher reads the store.
+    sink: ReportSink = RecordingSink(reports, *recorders) if recorders else reports
+    if settings.listen_enabled and settings.workers > 1:
         tasks.append(
-            asyncio.create_task(
-                run_listener(settings, queue), name="inverter-listener"
-            )
+            asyncio.create_task(run_workers(settings, sink), name="listener-workers")
         )
-    if settings.poll_host:
+    elif settings.listen_enabled:
         tasks.append(
             asyncio.create_task(
-                poll_v4_logger(settings, queue), name="legacy-v4-poller"
+                run_listener(settings, sink, capture), name="inverter-listener"
             )
         )
+    poll_targets = settings.all_poll_targets()
+    sessions = V4SessionPool() if settings.poll_persistent else None
+    if poll_targets or settings.discover:
+        poller = V4Poller(
+            poll_targets,
+            settings.poll_interval,
+            lambda raw_data, peer: process_payload(
+                raw_data, sink, peer, capture, "poll"
+            ),
+            concurrency=settings.poll_concurrency,
+            jitter=settings.poll_jitter,
+            max_backoff=settings.poll_max_backoff,
+            request=(
+                sessions.request if sessions is not None else request_target_status
+            ),
+        )
+        tasks.append(asyncio.create_task(poller.run(), name="legacy-v4-poller"))
+        if settings.discover:
+            tasks.append(
+                asyncio.create_task(
+                    run_discovery(settings, poller, sessions), name="lan-discovery"
+                )
+            )
 
     try:
         await asyncio.gather(*tasks)
@@ -521,6 +1467,58 @@ async def run_bridge(settings: Settings) -> None:
         for task in tasks:
             task.cancel()
         await asyncio.gather(*tasks, return_exceptions=True)
+        if sessions is not None:
+            await sessions.close()
+        if metrics is not None:
+            metrics.close()
+        if capture is not None:
+            capture.close()
+            LOGGER.info(
+                "Captured %d frames to %s", capture.frames, settings.capture_file
+            )
+        reports.close()
+
+
+async def replay_capture(path: Path, reports: LatestReports, speed: float) -> int:
+    """Feed captured frames to the store, keeping their timing scaled by speed."""
+    loop = asyncio.get_running_loop()
+    replayed = 0
+    origin: tuple[float, float] | None = None
+    for captured in read_capture(path):
+        if speed > 0:
+            if origin is None:
+                origin = (captured.timestamp, loop.time())
+            delay = origin[1] + (captured.timestamp - origin[0]) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif replayed % REPLAY_BATCH == 0:
+            await asyncio.sleep(0)
+        process_payload(
+            captured.frame,
+            reports,
+            f"replay {captured.transport} {captured.peer}",
+        )
+        replayed += 1
+    return replayed
+
+
+async def run_replay(settings: Settings, path: Path, speed: float) -> None:
+    reports = create_store(settings)
+    metrics = await start_observability(settings, reports)
+    publisher = asyncio.create_task(
+        mqtt_publisher(settings, reports), name="mqtt-publisher"
+    )
+    try:
+        replayed = await replay_capture(path, reports, speed)
+        reports.finish()
+        await publisher
+    finally:
+        publisher.cancel()
+        await asyncio.gather(publisher, return_exceptions=True)
+        if metrics is not None:
+            metrics.close()
+        reports.close()
+    LOGGER.info("Replayed %d frames from %s", replayed, path)
 
 
 def cli() -> None:
@@ -528,16 +1526,94 @@ def cli() -> None:
     args = parser.parse_args()
     logging.basicConfig(
         level=getattr(logging, args.log_level),
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        format=LOG_FORMAT,
+    )
+
+    json_encoder = select_json_encoder(args.json_encoder)
+    event_loop, loop_factory = event_loop_factory(args.event_loop)
+    LOGGER.debug(
+        "Using the %s event loop and the %s JSON encoder", event_loop, json_encoder
     )
+    run = partial(run_in_loop, loop_factory=loop_factory)
 
     try:
         if args.command == "decode":
-            status = decode_hex_string(args.hex_report)
-            print(json.dumps(status, indent=2, sort_keys=True))
+            if args.hex_report is not None and args.inputs:
+                raise ValueError("decode takes either HEX or --input, not both")
+            if args.hex_report is not None:
+                try:
+                    status = decode_hex_string(args.hex_report)
+                except DecodeError as error:
+                    print(f"HEX: {error}", file=sys.stderr)
+                    sys.exit(1)
+                print(json.dumps(status, indent=2, sort_keys=True))
+                return
+            if args.workers <= 0 or args.batch_size <= 0:
+                raise ValueError("--workers and --batch-size must be positive")
+            _, failed = bulk_decode(
+                args.inputs or ["-"],
+                output=args.output,
+                input_format=args.input_format,
+                output_format=args.format,
+                workers=args.workers,
+                batch_size=args.batch_size,
+            )
+            if failed:
+                sys.exit(1)
+            return
+        if args.command == "history":
+            if args.history_file is None:
+                raise ValueError("history requires --history-file")
+            if args.limit is not None and args.limit <= 0:
+                raise ValueError("--limit must be greater than zero")
+            rows = query_history(
+                args.history_file,
+                serials=args.serials,
+                start=None if args.since is None else parse_time(args.since),
+                end=None if args.until is None else parse_time(args.until),
+                fields=args.fields,
+                limit=args.limit,
+            )
+            write_history(rows, sys.stdout, args.format)
+            return
+        if args.command == "benchmark":
+            # Imported here because the benchmarks drive this module.
+            from .benchmark import format_results, run_benchmarks
+
+            if args.frames <= 0 or args.connections <= 0:
+                raise ValueError("--frames and --connections must be positive")
+            results = run(
+                run_benchmarks(
+                    tuple(args.benchmarks or BENCHMARKS),
+                    frames=args.frames,
+                    connections=args.connections,
+                )
+            )
+            print(format_results(results, as_json=args.json))
+            return
+        if args.command == "simulate":
+            if args.devices <= 0 or args.interval <= 0:
+                raise ValueError("--devices and --interval must be positive")
+            run(
+                run_simulator(
+                    simulated_fleet(args.devices, seed=args.seed),
+                    protocol=args.protocol,
+                    target_address=args.target_address,
+                    target_port=args.target_port,
+                    interval=args.interval,
+                    bind_address=args.bind_address,
+                    v4_port=args.v4_port,
+                    discovery_port=args.discovery_port,
+                )
+            )
             return
         settings = settings_from_args(args)
-        asyncio.run(run_bridge(settings))
+        if args.command == "replay":
+            if args.speed < 0:
+                raise ValueError("--speed must not be negative")
+            run(run_replay(settings, args.replay_file, args.speed))
+            return
+        run(run_bridge(settings))
     except (DecodeError, ValueError) as error:
         parser.error(str(error))
     except KeyboardInterrupt:
@@ -0,0 +1,460 @@
+"""Throughput and latency benchmarks of the decode, ingest and publish paths.
+
+Every benchmark runs in-process against local sockets: synthetic sticks for
+the TCP and UDP listeners and a minimal stand-in MQTT broker for the
+publisher. The numbers are meant for comparing revisions on one machine,
+not as absolute capacity figures.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+from .app import (
+    BENCHMARKS,
+    BatchedDatagramReader,
+    InverterDatagramProtocol,
+    InverterStreamProtocol,
+    Settings,
+    bind_udp_socket,
+    mqtt_publisher,
+)
+from .decoder import InverterReport, decode_inverter_data, decode_inverter_report
+from .discovery import discovery_messages
+from .framing import FrameBuffer
+from .simulator import encode_frame
+from .speedups import dumps
+from .store import LatestReports
+from .tracing import ReportTrace
+
+SAMPLE_VALUES = {
+    "temp": 431,
+    "dc_volts1": 3012,
+    "dc_amps1": 62,
+    "ac_volts1": 2311,
+    "ac_amps1": 81,
+    "ac_freq": 4998,
+    "kwh_day": 1234,
+    "kwh_total": 251234,
+}
+# Frames sent by a synthetic sender before yielding to the listener.
+SEND_BURST = 32
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    operations: int
+    seconds: float
+    p50_us: float
+    p99_us: float
+    peak_bytes_per_frame: float | None = None
+    lost: int = 0
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.operations / self.seconds if self.seconds else 0.0
+
+
+def synthetic_frame(serial: str, sequence: int) -> bytes:
+    """Return a valid report for ``serial`` carrying ``sequence`` as watt_now."""
+    return encode_frame(serial, SAMPLE_VALUES | {"watt_now": sequence & 0xFFFF})
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(
+    name: str,
+    seconds: float,
+    latencies: list[float],
+    *,
+    peak_bytes_per_frame: float | None = None,
+    lost: int = 0,
+) -> BenchmarkResult:
+    return BenchmarkResult(
+        name,
+        len(latencies),
+        seconds,
+        percentile(latencies, 0.5) * 1e6,
+        percentile(latencies, 0.99) * 1e6,
+        peak_bytes_per_frame,
+        lost,
+    )
+
+
+def peak_bytes_per_call(function: Callable[[], object], calls: int = 1000) -> float:
+    """Average tracemalloc peak above the baseline while ``function`` runs."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(calls):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return statistics.fmean(peaks)
+
+
+def timed_calls(
+    function: Callable[[], object], calls: int
+) -> tuple[float, list[float]]:
+    clock = time.perf_counter
+    latencies = []
+    started = clock()
+    for _ in range(calls):
+        before = clock()
+        function()
+        latencies.append(clock() - before)
+    return clock() - started, latencies
+
+
+def bench_decode(frames: int) -> BenchmarkResult:
+    frame = synthetic_frame("BENCH", 1)
+    seconds, latencies = timed_calls(lambda: decode_inverter_data(frame), frames)
+    return summarize(
+        "decode",
+        seconds,
+        latencies,
+        peak_bytes_per_frame=peak_bytes_per_call(lambda: decode_inverter_data(frame)),
+    )
+
+
+def bench_framing(frames: int) -> BenchmarkResult:
+    """Split a stream arriving in uneven chunks and decode every frame."""
+    frame = synthetic_frame("BENCH", 1)
+    chunks = [frame[:40], frame[40:] + frame[:70], frame[70:]]
+    buffer = FrameBuffer()
+
+    def feed() -> None:
+        for chunk in chunks:
+            for complete in buffer.feed(chunk):
+                decode_inverter_report(complete)
+
+    # Three chunks carry two frames.
+    seconds, latencies = timed_calls(feed, frames // 2)
+    latencies = [latency / 2 for latency in latencies for _ in range(2)]
+    return summarize(
+        "framing",
+        seconds,
+        latencies,
+        peak_bytes_per_frame=peak_bytes_per_call(feed) / 2,
+    )
+
+
+def bench_encode(frames: int) -> BenchmarkResult:
+    """Encode a partial state payload and one discovery payload per frame."""
+    state = {"inverter_serial": "BENCH", **SAMPLE_VALUES}
+    config = json.loads(next(discovery_messages("bench", "ginlong/bench"))[1])
+
+    def encode() -> None:
+        dumps(state)
+        dumps(config, sort_keys=True)
+
+    seconds, latencies = timed_calls(encode, frames)
+    return summarize(
+        "encode",
+        seconds,
+        latencies,
+        peak_bytes_per_frame=peak_bytes_per_call(encode),
+    )
+
+
+class TimedReports(LatestReports):
+    """Record when each report, keyed by serial and sequence, is stored."""
+
+    def __init__(self, expected: int) -> None:
+        super().__init__()
+        self.expected = expected
+        self.stored: dict[tuple[str, int], float] = {}
+        self.complete = asyncio.Event()
+
+    def put(self, report: InverterReport) -> str:
+        self.stored[(report.inverter_serial, report["watt_now"])] = (
+            time.perf_counter()
+        )
+        if len(self.stored) >= self.expected:
+            self.complete.set()
+        return super().put(report)
+
+
+def latencies_between(
+    sent: dict[tuple[str, int], float], stored: dict[tuple[str, int], float]
+) -> list[float]:
+    return [stored[key] - sent_at for key, sent_at in sent.items() if key in stored]
+
+
+async def wait_until_stored(reports: TimedReports, quiet: float = 0.5) -> None:
+    """Wait for every report, or until none has arrived for ``quiet`` seconds."""
+    while not reports.complete.is_set():
+        count = len(reports.stored)
+        try:
+            await asyncio.wait_for(reports.complete.wait(), quiet)
+        except TimeoutError:
+            if len(reports.stored) == count:
+                return
+
+
+async def bench_tcp(frames: int, connections: int) -> BenchmarkResult:
+    per_connection = min(max(frames // connections, 1), 0x10000)
+    reports = TimedReports(per_connection * connections)
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(
+        lambda: InverterStreamProtocol(reports, idle_timeout=60), "127.0.0.1", 0
+    )
+    port = server.sockets[0].getsockname()[1]
+    sent: dict[tuple[str, int], float] = {}
+
+    async def stick(index: int) -> None:
+        serial = f"BENCH{index:06d}"
+        payloads = [synthetic_frame(serial, n) for n in range(per_connection)]
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for sequence, payload in enumerate(payloads):
+                sent[(serial, sequence)] = time.perf_counter()
+                writer.write(payload)
+                await writer.drain()
+                # Interleave the sticks like independent devices would.
+                await asyncio.sleep(0)
+            await wait_until_stored(reports)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    started = time.perf_counter()
+    async with server:
+        await asyncio.gather(*(stick(index) for index in range(connections)))
+    seconds = max(reports.stored.values(), default=started) - started
+    return summarize(
+        f"tcp x{connections}",
+        seconds,
+        latencies_between(sent, reports.stored),
+        lost=len(sent) - len(reports.stored),
+    )
+
+
+async def bench_udp(frames: int) -> BenchmarkResult:
+    reports = TimedReports(frames)
+    loop = asyncio.get_running_loop()
+    receiver = bind_udp_socket("127.0.0.1", 0)
+    reader = BatchedDatagramReader(receiver, InverterDatagramProtocol(reports), 64)
+    loop.add_reader(receiver.fileno(), reader.read_ready)
+    address = receiver.getsockname()
+    sender, _ = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol, remote_addr=address
+    )
+    # watt_now carries 16 bits of the sequence and the serial the rest.
+    keys = [(f"BENCH{n >> 16}", n & 0xFFFF) for n in range(frames)]
+    payloads = [synthetic_frame(*key) for key in keys]
+    sent: dict[tuple[str, int], float] = {}
+    started = time.perf_counter()
+    try:
+        for sequence, (key, payload) in enumerate(zip(keys, payloads)):
+            sent[key] = time.perf_counter()
+            sender.sendto(payload)
+            if sequence % SEND_BURST == SEND_BURST - 1:
+                await asyncio.sleep(0)
+        await wait_until_stored(reports)
+    finally:
+        sender.close()
+        loop.remove_reader(receiver.fileno())
+        receiver.close()
+    seconds = max(reports.stored.values(), default=started) - started
+    return summarize(
+        "udp",
+        seconds,
+        latencies_between(sent, reports.stored),
+        lost=len(sent) - len(reports.stored),
+    )
+
+
+class StandInBroker:
+    """Just enough of an MQTT 3.1.1 broker to acknowledge a publisher."""
+
+    def __init__(self) -> None:
+        self.server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        assert self.server is not None
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length = multiplier = 0
+                for multiplier in (1, 128, 128**2, 128**3):
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                packet_type = header >> 4
+                if packet_type == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif packet_type == 3:  # PUBLISH
+                    if header & 0x06:
+                        topic_size = int.from_bytes(body[:2], "big")
+                        packet_id = body[2 + topic_size : 4 + topic_size]
+                        writer.write(b"\x40\x02" + packet_id)
+                elif packet_type == 8:  # SUBSCRIBE
+                    granted = bytearray()
+                    offset = 2
+                    while offset < len(body):
+                        offset += 2 + int.from_bytes(body[offset : offset + 2], "big")
+                        granted.append(min(body[offset], 1))
+                        offset += 1
+                    writer.write(bytes((0x90, 2 + len(granted))) + body[:2] + granted)
+                elif packet_type == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif packet_type == 14:  # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def benchmark_settings(port: int) -> Settings:
+    return Settings(
+        listen_enabled=False,
+        listen_address="127.0.0.1",
+        listen_port=0,
+        client_id="bench",
+        mqtt_address="127.0.0.1",
+        mqtt_port=port,
+        mqtt_username=None,
+        mqtt_password=None,
+        homeassistant=False,
+        protocol="tcp",
+        reconnect_delay=1,
+        poll_host=None,
+        poll_port=8899,
+        logger_serial=None,
+        poll_interval=60,
+        discover=False,
+        logger_mac=None,
+        discovery_broadcast="255.255.255.255",
+        discovery_bind_address="0.0.0.0",
+        discovery_timeout=3,
+    )
+
+
+class AckTimedTrace(ReportTrace):
+    """Trace that also keeps each report's time from publish to PUBACK."""
+
+    __slots__ = ("latencies",)
+
+    def __init__(self, latencies: list[float]) -> None:
+        now = time.perf_counter()
+        super().__init__(now, now)
+        self.latencies = latencies
+
+    def complete(
+        self, inverter_serial: str, slow_threshold: float | None = None
+    ) -> dict[str, float]:
+        stages = super().complete(inverter_serial, slow_threshold)
+        self.latencies.append(stages["publish"])
+        return stages
+
+
+async def bench_publish(frames: int) -> BenchmarkResult:
+    """Publish a backlog and time each report from publish to its PUBACK."""
+    broker = StandInBroker()
+    await broker.start()
+    reports = LatestReports("bench", backlog_size=frames)
+    latencies: list[float] = []
+    for sequence in range(frames):
+        report = decode_inverter_report(synthetic_frame("BENCH", sequence))
+        report.trace = AckTimedTrace(latencies)
+        reports.put(report)
+    reports.finish()
+    try:
+        started = time.perf_counter()
+        await mqtt_publisher(benchmark_settings(broker.port), reports)
+        seconds = time.perf_counter() - started
+    finally:
+        await broker.close()
+        reports.close()
+    return summarize("publish", seconds, latencies, lost=frames - len(latencies))
+
+
+async def run_benchmarks(
+    names: tuple[str, ...] = BENCHMARKS,
+    *,
+    frames: int = 20000,
+    connections: int = 100,
+) -> list[BenchmarkResult]:
+    # Per-report INFO logging would dominate the measurements.
+    logger = logging.getLogger("ginlong_wifi_mqtt")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        results = []
+        for name in names:
+            if name == "decode":
+                results.append(bench_decode(frames))
+            elif name == "framing":
+                results.append(bench_framing(frames))
+            elif name == "encode":
+                results.append(bench_encode(frames))
+            elif name == "tcp":
+                results.append(await bench_tcp(frames, connections))
+            elif name == "udp":
+                results.append(await bench_udp(frames))
+            elif name == "publish":
+                results.append(await bench_publish(frames))
+        return results
+    finally:
+        logger.setLevel(level)
+
+
+def format_results(results: list[BenchmarkResult], *, as_json: bool = False) -> str:
+    if as_json:
+        return json.dumps(
+            [
+                {**asdict(result), "ops_per_second": result.ops_per_second}
+                for result in results
+            ],
+            indent=2,
+        )
+    lines = [
+        f"{'benchmark':<12} {'ops':>8} {'ops/s':>11} {'p50 us':>9} "
+        f"{'p99 us':>9} {'peak B/frame':>13} {'lost':>6}"
+    ]
+    for result in results:
+        peak = (
+            "-"
+            if result.peak_bytes_per_frame is None
+            else f"{result.peak_bytes_per_frame:.0f}"
+        )
+        lines.append(
+            f"{result.name:<12} {result.operations:>8} "
+            f"{result.ops_per_second:>11,.0f} {result.p50_us:>9.1f} "
+            f"{result.p99_us:>9.1f} {peak:>13} {result.lost:>6}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,348 @@
+"""Streaming bulk decode of many reports from files or standard input.
+
+Input is read in chunks of ``batch_size`` records, each chunk is decoded
+column-wise by :func:`decode_inverter_batch`, optionally in a pool of worker
+processes, and written out before more input is read. Memory therefore stays
+bounded by a few chunks however large the input is, and a record that cannot
+be decoded is reported by its line or frame number without stopping the run.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+import sys
+from array import array
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from typing import Any, BinaryIO, Protocol, TextIO
+
+from .capture import CAPTURE_MAGIC, RECORD_HEADER
+from .decoder import FIELD_NAMES, InverterBatch, decode_inverter_batch
+from .framing import FrameBuffer
+from .speedups import dumps
+
+LOGGER = logging.getLogger(__name__)
+INPUT_FORMATS = ("auto", "hex", "binary", "capture")
+OUTPUT_FORMATS = ("jsonl", "csv", "parquet")
+DECODE_COLUMNS = (
+    "source",
+    "record",
+    "headcode",
+    "datalength",
+    "ctrlcode",
+    "inverter_serial",
+    *FIELD_NAMES,
+)
+BATCH_SIZE = 4096
+READ_SIZE = 1 << 16
+# Bytes inspected to tell hexadecimal text from binary input.
+DETECT_SIZE = 512
+_TEXT = frozenset(range(0x20, 0x7F)) | frozenset(b"\t\r\n")
+
+# A record number and either a frame or the hexadecimal line holding one.
+Record = tuple[int, bytes | str]
+
+
+@dataclass
+class DecodedChunk:
+    """Decoded rows and per-record errors of one chunk of one input."""
+
+    source: str
+    records: array[int]
+    batch: InverterBatch
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    def record_numbers(self) -> list[int]:
+        return [self.records[index] for index in self.batch.indices]
+
+    def rows(self) -> Iterator[tuple[Any, ...]]:
+        """Yield rows in :data:`DECODE_COLUMNS` order."""
+        batch = self.batch
+        return zip(
+            [self.source] * len(batch),
+            self.record_numbers(),
+            batch.headcode,
+            batch.datalength,
+            batch.ctrlcode,
+            batch.inverter_serial,
+            *batch.columns.values(),
+        )
+
+
+def detect_format(stream: BinaryIO) -> str:
+    """Guess the input format from the first bytes without consuming them."""
+    head = stream.peek(DETECT_SIZE)[:DETECT_SIZE]  # type: ignore[attr-defined]
+    if head.startswith(CAPTURE_MAGIC):
+        return "capture"
+    # Frames carry zero bytes and binary values, so only text is hexadecimal.
+    if head and _TEXT.issuperset(head):
+        return "hex"
+    return "binary"
+
+
+def read_hex(stream: BinaryIO) -> Iterator[Record]:
+    """Yield one record per non-blank line; ``#`` starts a comment line."""
+    for number, line in enumerate(stream, 1):
+        text = line.decode("ascii", errors="replace").strip()
+        if text and not text.startswith("#"):
+            yield number, text
+
+
+def read_binary(stream: BinaryIO, source: str = "-") -> Iterator[Record]:
+    """Yield back-to-back frames, delimited by their own length byte."""
+    frames = FrameBuffer()
+    number = 0
+    while chunk := stream.read(READ_SIZE):
+        for frame in frames.feed(chunk):
+            number += 1
+            yield number, frame
+    skipped = frames.discarded + len(frames)
+    if skipped:
+        LOGGER.warning("Skipped %d bytes outside frames in %s", skipped, source)
+
+
+def read_capture_stream(stream: BinaryIO, source: str = "-") -> Iterator[Record]:
+    """Yield the frames of a ``--capture`` file read sequentially."""
+    if stream.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+        raise ValueError(f"{source} is not a frame capture")
+    number = 0
+    while len(header := stream.read(RECORD_HEADER.size)) == RECORD_HEADER.size:
+        _, _, peer_size, frame_size = RECORD_HEADER.unpack(header)
+        body = stream.read(peer_size + frame_size)
+        if len(body) < peer_size + frame_size:
+            break
+        number += 1
+        yield number, body[peer_size:]
+
+
+def read_records(
+    stream: BinaryIO, input_format: str = "auto", source: str = "-"
+) -> Iterator[Record]:
+    if input_format == "auto":
+        input_format = detect_format(stream)
+    if input_format == "hex":
+        return read_hex(stream)
+    if input_format == "capture":
+        return read_capture_stream(stream, source)
+    return read_binary(stream, source)
+
+
+def decode_chunk(source: str, chunk: Sequence[Record]) -> DecodedChunk:
+    """Decode one chunk of records; runs in worker processes when enabled."""
+    records = array("L")
+    frames: list[bytes] = []
+    errors: list[tuple[int, str]] = []
+    for number, payload in chunk:
+        if isinstance(payload, str):
+            try:
+                payload = bytes.fromhex(payload)
+            except ValueError as error:
+                errors.append((number, f"invalid hexadecimal input: {error}"))
+                continue
+        records.append(number)
+        frames.append(payload)
+    batch = decode_inverter_batch(frames)
+    errors.extend((records[index], message) for index, message in batch.errors)
+    errors.sort()
+    return DecodedChunk(source, records, batch, errors)
+
+
+def _chunked(records: Iterable[Record], size: int) -> Iterator[list[Record]]:
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _ordered_map(
+    function: Callable[[list[Record]], DecodedChunk],
+    chunks: Iterable[list[Record]],
+    pool: ProcessPoolExecutor | None,
+    window: int,
+) -> Iterator[DecodedChunk]:
+    """Map like :meth:`Executor.map` but with at most ``window`` chunks queued."""
+    if pool is None:
+        yield from map(function, chunks)
+        return
+    pending: deque[Future[DecodedChunk]] = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(function, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def decode_inputs(
+    inputs: Sequence[str],
+    *,
+    input_format: str = "auto",
+    workers: int = 1,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[DecodedChunk]:
+    """Decode every input in order; ``-`` reads standard input.
+
+    An input that cannot be read yields one error for record 0, which stands
+    for the whole input, and the remaining inputs are still decoded.
+    """
+    with ExitStack() as stack:
+        pool = (
+            stack.enter_context(ProcessPoolExecutor(workers)) if workers > 1 else None
+        )
+        for source in inputs:
+            try:
+                with ExitStack() as input_stack:
+                    stream: BinaryIO = (
+                        sys.stdin.buffer
+                        if source == "-"
+                        else input_stack.enter_context(Path(source).open("rb"))
+                    )
+                    records = read_records(stream, input_format, source)
+                    yield from _ordered_map(
+                        partial(decode_chunk, source),
+                        _chunked(records, batch_size),
+                        pool,
+                        workers * 2,
+                    )
+            except OSError as error:
+                message = f"cannot read input: {error.strerror or error}"
+                yield DecodedChunk(source, array("L"), InverterBatch(), [(0, message)])
+
+
+class ChunkWriter(Protocol):
+    def write(self, chunk: DecodedChunk) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class JsonLinesWriter:
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write(self, chunk: DecodedChunk) -> None:
+        self.stream.writelines(
+            dumps(dict(zip(DECODE_COLUMNS, row))) + "\n" for row in chunk.rows()
+        )
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self._writer = csv.writer(stream)
+        self._writer.writerow(DECODE_COLUMNS)
+
+    def write(self, chunk: DecodedChunk) -> None:
+        self._writer.writerows(chunk.rows())
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class ParquetWriter:
+    """Write each chunk as a row group; requires the optional pyarrow."""
+
+    def __init__(self, path: Path) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("parquet output requires pyarrow") from None
+        self._pa = pa
+        self._writer: Any = None
+        self._open = partial(pq.ParquetWriter, path)
+
+    def write(self, chunk: DecodedChunk) -> None:
+        if not len(chunk):
+            return
+        pa = self._pa
+        batch = chunk.batch
+        table = pa.table(
+            {
+                "source": pa.array([chunk.source] * len(batch)),
+                "record": pa.array(chunk.record_numbers(), pa.uint32()),
+                "headcode": pa.array(batch.headcode, pa.uint8()),
+                "datalength": pa.array(batch.datalength, pa.uint8()),
+                "ctrlcode": pa.array(batch.ctrlcode, pa.uint16()),
+                "inverter_serial": pa.array(batch.inverter_serial, pa.string()),
+                **{
+                    name: pa.array(column, pa.uint32())
+                    for name, column in batch.columns.items()
+                },
+            }
+        )
+        if self._writer is None:
+            self._writer = self._open(table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_writer(
+    output_format: str, output: Path | None, stack: ExitStack
+) -> ChunkWriter:
+    if output_format == "parquet":
+        if output is None:
+            raise ValueError("parquet output requires --output")
+        return ParquetWriter(output)
+    try:
+        stream = (
+            sys.stdout
+            if output is None
+            else stack.enter_context(output.open("w", encoding="utf-8", newline=""))
+        )
+    except OSError as error:
+        raise ValueError(f"cannot write {output}: {error.strerror}") from None
+    if output_format == "csv":
+        return CsvWriter(stream)
+    return JsonLinesWriter(stream)
+
+
+def bulk_decode(
+    inputs: Sequence[str],
+    *,
+    output: Path | None = None,
+    input_format: str = "auto",
+    output_format: str = "jsonl",
+    workers: int = 1,
+    batch_size: int = BATCH_SIZE,
+    errors: TextIO | None = None,
+) -> tuple[int, int]:
+    """Decode ``inputs`` to ``output`` and return the decoded and failed counts.
+
+    Every record that fails is reported to ``errors``, standard error by
+    default, as ``source:record: message``.
+    """
+    errors = sys.stderr if errors is None else errors
+    decoded = failed = 0
+    with ExitStack() as stack:
+        writer = open_writer(output_format, output, stack)
+        try:
+            for chunk in decode_inputs(
+                inputs,
+                input_format=input_format,
+                workers=workers,
+                batch_size=batch_size,
+            ):
+                writer.write(chunk)
+                decoded += len(chunk)
+                failed += len(chunk.errors)
+                for number, message in chunk.errors:
+                    where = f"{chunk.source}:{number}" if number else chunk.source
+                    errors.write(f"{where}: {message}\n")
+        finally:
+            writer.close()
+    return decoded, failed
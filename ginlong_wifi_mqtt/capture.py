@@ -0,0 +1,124 @@
+"""Compact binary capture of raw inverter frames for later replay."""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import struct
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+LOGGER = logging.getLogger(__name__)
+CAPTURE_MAGIC = b"GWMCAP\x00\x01"
+# Timestamp, transport, peer length and frame length precede each record.
+RECORD_HEADER = struct.Struct("<dBBH")
+TRANSPORTS = ("tcp", "udp", "poll")
+
+
+@dataclass(frozen=True)
+class CapturedFrame:
+    timestamp: float
+    transport: str
+    peer: str
+    frame: bytes
+
+
+def format_peer(peer: object) -> str:
+    if isinstance(peer, tuple) and len(peer) >= 2:
+        return f"{peer[0]}:{peer[1]}"
+    return str(peer)
+
+
+class CaptureWriter:
+    """Append every raw frame, valid or not, to a capture file.
+
+    Records are length-prefixed after an 8-byte file header, so a capture can
+    be memory-mapped and walked without parsing the frames. Each record is
+    flushed as it is written, so a container stopped without a clean shutdown
+    loses at most the record being written, and a record left half-written
+    is cut off when the capture is reopened.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.frames = 0
+        self._file: BinaryIO = path.open("a+b")
+        if self._file.seek(0, 2) == 0:
+            self._file.write(CAPTURE_MAGIC)
+            return
+        self._file.seek(0)
+        if self._file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a frame capture")
+        torn = _drop_partial_record(self._file)
+        if torn:
+            LOGGER.warning("Dropped a %d-byte partial record from %s", torn, path)
+
+    def write(
+        self,
+        frame: bytes,
+        peer: object,
+        transport: str,
+        timestamp: float | None = None,
+    ) -> None:
+        peer_bytes = format_peer(peer).encode()[:0xFF]
+        self._file.write(
+            RECORD_HEADER.pack(
+                time.time() if timestamp is None else timestamp,
+                TRANSPORTS.index(transport),
+                len(peer_bytes),
+                len(frame),
+            )
+        )
+        self._file.write(peer_bytes)
+        self._file.write(frame)
+        self._file.flush()
+        self.frames += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _drop_partial_record(capture: BinaryIO) -> int:
+    """Cut a record left half-written by a crash; return the bytes removed."""
+    end = capture.seek(0, 2)
+    keep = capture.seek(len(CAPTURE_MAGIC))
+    while len(header := capture.read(RECORD_HEADER.size)) == RECORD_HEADER.size:
+        _, _, peer_size, frame_size = RECORD_HEADER.unpack(header)
+        record_end = keep + RECORD_HEADER.size + peer_size + frame_size
+        if record_end > end:
+            break
+        keep = capture.seek(record_end)
+    if keep < end:
+        capture.truncate(keep)
+    capture.seek(keep)
+    return end - keep
+
+
+def read_capture(path: Path) -> Iterator[CapturedFrame]:
+    """Yield the frames of a capture in recorded order.
+
+    A record cut short, as left by a writer that was killed, ends the capture.
+    """
+    with path.open("rb") as capture:
+        if capture.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a frame capture")
+        if capture.seek(0, 2) == len(CAPTURE_MAGIC):
+            return
+        with mmap.mmap(capture.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = len(CAPTURE_MAGIC)
+            while offset + RECORD_HEADER.size <= len(data):
+                timestamp, transport, peer_size, frame_size = (
+                    RECORD_HEADER.unpack_from(data, offset)
+                )
+                offset += RECORD_HEADER.size
+                end = offset + peer_size + frame_size
+                if end > len(data):
+                    return
+                peer = data[offset : offset + peer_size].decode()
+                frame = data[offset + peer_size : end]
+                offset = end
+                yield CapturedFrame(timestamp, TRANSPORTS[transport], peer, frame)
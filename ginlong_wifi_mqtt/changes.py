@@ -0,0 +1,114 @@
+"""Change-only and deadband filtering of published inverter state."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from .decoder import FIELD_NAMES, InverterReport
+from .scaling import scaled_values, state_json
+from .speedups import dumps
+
+PUBLISH_MODES = ("full", "changed", "deadband", "fields")
+
+
+def parse_deadband(value: str) -> tuple[str, float]:
+    """Parse a ``FIELD=DELTA`` deadband option."""
+    name, separator, delta_text = value.partition("=")
+    if not separator or name not in FIELD_NAMES:
+        raise ValueError(f"invalid deadband {value!r}; use FIELD=DELTA")
+    try:
+        delta = float(delta_text)
+    except ValueError as error:
+        raise ValueError(f"invalid deadband {value!r}: {error}") from error
+    if delta < 0:
+        raise ValueError(f"invalid deadband {value!r}: delta must not be negative")
+    return name, delta
+
+
+@dataclass
+class _Published:
+    values: dict[str, int]
+    refreshed_at: float
+
+
+class ChangeFilter:
+    """Turn reports into MQTT messages according to the publish mode.
+
+    ``full`` publishes every report unchanged. The other modes compare each
+    raw field with the value last published for the same inverter; a field
+    has changed once it differs by more than its deadband, or at all when it
+    has none. ``changed`` then publishes the full report only if any field
+    changed, ``deadband`` publishes a partial object holding just the changed
+    fields, and ``fields`` publishes each changed value to its own
+    ``<state topic>/<field>`` topic. Every ``refresh_interval`` seconds a full
+    report is published regardless. With ``scaled``, JSON state also carries
+    the scaled and derived values of :mod:`.scaling` that depend on what it
+    contains.
+    """
+
+    def __init__(
+        self,
+        mode: str = "full",
+        deadbands: Mapping[str, float] | None = None,
+        refresh_interval: float = 900,
+        *,
+        scaled: bool = False,
+    ) -> None:
+        if mode not in PUBLISH_MODES:
+            raise ValueError(f"unknown publish mode {mode!r}")
+        self.mode = mode
+        self.deadbands = dict(deadbands or {})
+        self.refresh_interval = refresh_interval
+        self.scaled = scaled
+        self.skipped = 0
+        self._published: dict[str, _Published] = {}
+
+    def _state_json(self, report: InverterReport) -> str:
+        return state_json(report) if self.scaled else report.to_json()
+
+    def reset(self) -> None:
+        """Forget published values so that the next reports go out in full."""
+        self._published.clear()
+
+    def messages(
+        self,
+        client_id: str,
+        topic: str,
+        report: InverterReport,
+        now: float,
+    ) -> list[tuple[str, str]]:
+        if self.mode == "full":
+            return [(topic, self._state_json(report))]
+
+        values = {name: report[name] for name in FIELD_NAMES}
+        previous = self._published.get(client_id)
+        if previous is None or now - previous.refreshed_at >= self.refresh_interval:
+            self._published[client_id] = _Published(values, now)
+            if self.mode == "fields":
+                return [
+                    (f"{topic}/{name}", str(value)) for name, value in values.items()
+                ]
+            return [(topic, self._state_json(report))]
+
+        last = previous.values
+        changed = {
+            name: value
+            for name, value in values.items()
+            if abs(value - last[name]) > self.deadbands.get(name, 0)
+        }
+        if not changed:
+            self.skipped += 1
+            return []
+        if self.mode == "changed":
+            previous.values = values
+            return [(topic, self._state_json(report))]
+
+        last.update(changed)
+        if self.mode == "fields":
+            return [(f"{topic}/{name}", str(value)) for name, value in changed.items()]
+        payload: dict[str, Any] = {"inverter_serial": report.inverter_serial, **changed}
+        if self.scaled:
+            payload.update(scaled_values(report, changed))
+        return [(topic, dumps(payload))]
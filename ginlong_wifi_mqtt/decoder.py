@@ -2,15 +2,33 @@
 
 from __future__ import annotations
 
+import json
+import re
 import struct
-from typing import Any
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .tracing import ReportTrace
 
 HEADCODE = 0x68
+END_CODE = 0x16
 DATA_LENGTH = 0x59
+# Header, control code, serials, checksum and end code around the data.
+FRAME_OVERHEAD = 14
 INVERTER_SERIAL_OFFSET = 15
 INVERTER_DATA_OFFSET = 31
 INVERTER_VALUES = struct.Struct(">20HL9H")
 MIN_FRAME_SIZE = INVERTER_DATA_OFFSET + INVERTER_VALUES.size
+FRAME_SIZE = DATA_LENGTH + FRAME_OVERHEAD
+# Head code, data length, control code and inverter serial of every layout.
+_HEADER_FORMAT = f">BBH{INVERTER_SERIAL_OFFSET - 4}x16s"
+_HEADER_ITEMS = 4
+FRAME_VALUES = struct.Struct(f"{_HEADER_FORMAT}{INVERTER_VALUES.format[1:]}")
 
 FIELD_NAMES = (
     "temp",
@@ -44,43 +62,524 @@ FIELD_NAMES = (
     "unknown9",
     "kwh_lastmonth",
 )
+_FIELD_CODES = tuple(
+    code
+    for count, code in re.findall(r"(\d*)([A-Za-z])", INVERTER_VALUES.format)
+    for _ in range(int(count or 1))
+)
 
 
 class DecodeError(ValueError):
     """Raised when a received payload is not a supported inverter report."""
 
+    @property
+    def reason(self) -> str:
+        """The message without frame-specific details, for grouping failures."""
+        return _MESSAGE_DETAILS.sub("", str(self).partition(":")[0]).strip()
+
+
+_MESSAGE_DETAILS = re.compile(r"\s+(?:0x[0-9a-f]+|\d+)\b")
+
+
+LayoutKey = tuple[int, int, int | None]
+
+
+@dataclass(frozen=True)
+class FrameLayout:
+    """Where the frames of one inverter model keep each report field.
+
+    ``values`` is the big-endian :mod:`struct` format of the data starting at
+    ``data_offset`` and ``fields`` names the :data:`FIELD_NAMES` entry that
+    each of its items holds, or ``None`` for an item to ignore. Fields a
+    layout lacks decode as zero, and ``scales`` multiplies raw values into
+    the units of the default layout, so every layout yields the same report
+    schema. A ``control_code`` of ``None`` matches any control code.
+    """
+
+    name: str
+    data_length: int
+    values: str
+    fields: tuple[str | None, ...]
+    control_code: int | None = None
+    headcode: int = HEADCODE
+    data_offset: int = INVERTER_DATA_OFFSET
+    scales: tuple[tuple[str, float], ...] = ()
+
+    @property
+    def key(self) -> LayoutKey:
+        return (self.headcode, self.data_length, self.control_code)
+
+
+class CompiledLayout:
+    """A :class:`FrameLayout` compiled to one struct and a field map."""
+
+    __slots__ = (
+        "layout",
+        "struct",
+        "min_size",
+        "checksum_offset",
+        "_positions",
+        "_scales",
+        "_identity",
+    )
+
+    def __init__(self, layout: FrameLayout) -> None:
+        if layout.data_offset < INVERTER_DATA_OFFSET:
+            raise ValueError(f"{layout.name}: data overlaps the inverter serial")
+        values = struct.Struct(f">{layout.values}")
+        items = len(values.unpack(bytes(values.size)))
+        if len(layout.fields) != items:
+            raise ValueError(
+                f"{layout.name}: {len(layout.fields)} fields for {items} values"
+            )
+        names = [name for name in layout.fields if name is not None]
+        unknown = set(names).union(name for name, _ in layout.scales).difference(
+            FIELD_NAMES
+        )
+        if unknown or len(names) != len(set(names)):
+            raise ValueError(f"{layout.name}: unknown or repeated fields")
+        self.layout = layout
+        self.struct = struct.Struct(
+            f"{_HEADER_FORMAT}{layout.data_offset - INVERTER_DATA_OFFSET}x"
+            f"{layout.values}"
+        )
+        self.min_size = self.struct.size
+        self.checksum_offset = layout.data_length + FRAME_OVERHEAD - 2
+        if self.min_size > self.checksum_offset:
+            raise ValueError(f"{layout.name}: values extend past the checksum")
+        # Fields the layout lacks read the zero appended after its values.
+        missing = _HEADER_ITEMS + items
+        self._positions = tuple(
+            _HEADER_ITEMS + layout.fields.index(name)
+            if name in layout.fields
+            else missing
+            for name in FIELD_NAMES
+        )
+        factors = dict(layout.scales)
+        self._scales = tuple(factors.get(name, 1) for name in FIELD_NAMES)
+        self._identity = layout.fields == FIELD_NAMES and not layout.scales
+
+    def unpack(self, frame: bytes | bytearray | memoryview) -> tuple[Any, ...]:
+        """Unpack the header and the :data:`FIELD_NAMES` values of a frame."""
+        values = self.struct.unpack_from(frame)
+        if self._identity:
+            return values
+        values = (*values, 0)
+        return (
+            *values[:_HEADER_ITEMS],
+            *(
+                values[position] if scale == 1 else round(values[position] * scale)
+                for position, scale in zip(self._positions, self._scales)
+            ),
+        )
+
+
+_LAYOUTS: dict[LayoutKey, CompiledLayout] = {}
+
+
+def register_layout(layout: FrameLayout) -> CompiledLayout:
+    """Compile ``layout`` and decode matching frames with it from now on."""
+    compiled = _LAYOUTS[layout.key] = CompiledLayout(layout)
+    return compiled
+
+
+def find_layout(
+    headcode: int, data_length: int, control_code: int
+) -> CompiledLayout | None:
+    """Return the layout for a frame header, preferring an exact control code."""
+    return _LAYOUTS.get((headcode, data_length, control_code)) or _LAYOUTS.get(
+        (headcode, data_length, None)
+    )
+
+
+DEFAULT_LAYOUT = register_layout(
+    FrameLayout("solis-2g", DATA_LENGTH, INVERTER_VALUES.format[1:], FIELD_NAMES)
+)
+
+
+def _unsupported(headcode: int, data_length: int, control_code: int) -> str:
+    keys = _LAYOUTS.keys()
+    if all(key[0] != headcode for key in keys):
+        return f"unknown headcode 0x{headcode:02x}"
+    if all(key[:2] != (headcode, data_length) for key in keys):
+        return f"unknown data length {data_length}"
+    return f"unknown control code 0x{control_code:04x}"
+
+
+def _header_layout(raw_data: bytes | bytearray | memoryview) -> CompiledLayout:
+    key = (raw_data[0], raw_data[1], raw_data[2] << 8 | raw_data[3])
+    layout = find_layout(*key)
+    if layout is None:
+        raise DecodeError(_unsupported(*key))
+    return layout
+
+
+def frame_layout(raw_data: bytes | bytearray | memoryview) -> CompiledLayout:
+    """Return the layout of a supported frame or raise :class:`DecodeError`.
+
+    The checksum and end code are verified whenever the frame is long enough
+    to carry them.
+    """
+    size = len(raw_data)
+    if size < 4:
+        raise DecodeError(f"frame is too short: {size} bytes")
+    layout = _header_layout(raw_data)
+    if size < layout.min_size:
+        raise DecodeError(
+            f"incomplete frame: received {size} bytes, "
+            f"need at least {layout.min_size}"
+        )
+    offset = layout.checksum_offset
+    if size > offset:
+        checksum = sum(raw_data[1:offset]) & 0xFF
+        if checksum != raw_data[offset]:
+            raise DecodeError(
+                f"checksum mismatch: computed 0x{checksum:02x}, "
+                f"frame carries 0x{raw_data[offset]:02x}"
+            )
+    if size > offset + 1 and raw_data[offset + 1] != END_CODE:
+        raise DecodeError(f"bad end code 0x{raw_data[offset + 1]:02x}")
+    return layout
+
+
+def frame_error(raw_data: bytes | bytearray | memoryview) -> str | None:
+    """Return why a frame cannot be decoded, or ``None`` if it is supported."""
+    try:
+        frame_layout(raw_data)
+    except DecodeError as error:
+        return str(error)
+    return None
+
+
+REPORT_KEYS = (
+    "raw_length",
+    "raw",
+    "headcode",
+    "datalength",
+    "ctrlcode",
+    "inverter_serial",
+    *FIELD_NAMES,
+)
+# Positions in the FRAME_VALUES tuple; raw, raw_length and the serial are
+# derived separately.
+_VALUE_INDEX = {
+    "headcode": 0,
+    "datalength": 1,
+    "ctrlcode": 2,
+    **{name: position for position, name in enumerate(FIELD_NAMES, start=4)},
+}
+_JSON_TEMPLATE = (
+    '{"raw_length":%d,"raw":"%s","headcode":%d,"datalength":%d,'
+    '"ctrlcode":%d,"inverter_serial":%s,'
+    + ",".join(f'"{name}":%d' for name in FIELD_NAMES)
+    + "}"
+)
+
+
+def _serial_text(serial: bytes) -> str:
+    return serial.decode("ascii", errors="replace").rstrip("\x00 ")
+
+
+class InverterReport(Mapping[str, Any]):
+    """Read-only, lazily decoded view of one validated inverter report.
+
+    The report keeps a :class:`memoryview` of the received frame instead of
+    copying it, unpacks the field values on first access and only builds the
+    hexadecimal ``raw`` string or a dict when asked to. It behaves as a
+    mapping with the same keys as :func:`decode_inverter_data`, whichever
+    :class:`FrameLayout` the frame uses. Without a ``layout`` the frame's
+    header selects one through :func:`find_layout`, but the rest of the frame
+    is trusted to be valid. Reports received by the bridge carry a
+    :class:`~.tracing.ReportTrace`.
+    """
+
+    __slots__ = ("frame", "layout", "_values", "trace")
+
+    def __init__(
+        self,
+        frame: bytes | bytearray | memoryview,
+        layout: CompiledLayout | None = None,
+    ) -> None:
+        self.frame = memoryview(frame)
+        self.layout = _header_layout(frame) if layout is None else layout
+        self._values: tuple[Any, ...] | None = None
+        self.trace: ReportTrace | None = None
+
+    def _decoded(self) -> tuple[Any, ...]:
+        if self._values is None:
+            self._values = self.layout.unpack(self.frame)
+        return self._values
+
+    @property
+    def inverter_serial(self) -> str:
+        return _serial_text(self._decoded()[3])
+
+    def hex(self) -> str:
+        return self.frame.hex()
+
+    def field_values(self) -> tuple[int, ...]:
+        """Return the raw values in :data:`FIELD_NAMES` order."""
+        return self._decoded()[4:]
+
+    def __getitem__(self, key: str) -> Any:
+        position = _VALUE_INDEX.get(key)
+        if position is not None:
+            return self._decoded()[position]
+        if key == "inverter_serial":
+            return self.inverter_serial
+        if key == "raw":
+            return self.hex()
+        if key == "raw_length":
+            return len(self.frame) - INVERTER_SERIAL_OFFSET
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(REPORT_KEYS)
+
+    def __len__(self) -> int:
+        return len(REPORT_KEYS)
+
+    def __repr__(self) -> str:
+        return f"InverterReport({self.hex()!r})"
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the legacy raw-value schema as a plain dict."""
+        headcode, data_length, control_code, _, *values = self._decoded()
+        status: dict[str, Any] = {
+            "raw_length": len(self.frame) - INVERTER_SERIAL_OFFSET,
+            "raw": self.hex(),
+            "headcode": headcode,
+            "datalength": data_length,
+            "ctrlcode": control_code,
+            "inverter_serial": self.inverter_serial,
+        }
+        status.update(zip(FIELD_NAMES, values, strict=True))
+        return status
+
+    def to_json(self) -> str:
+        """Serialise to compact legacy JSON without building a dict."""
+        headcode, data_length, control_code, _, *values = self._decoded()
+        return _JSON_TEMPLATE % (
+            len(self.frame) - INVERTER_SERIAL_OFFSET,
+            self.hex(),
+            headcode,
+            data_length,
+            control_code,
+            json.dumps(self.inverter_serial),
+            *values,
+        )
+
+
+def decode_inverter_report(
+    raw_data: bytes | bytearray | memoryview,
+) -> InverterReport:
+    """Validate one frame and return a lazily decoded report view."""
+    return InverterReport(raw_data, frame_layout(raw_data))
+
 
 def decode_inverter_data(raw_data: bytes) -> dict[str, Any]:
     """Decode one inverter report while preserving the legacy raw-value schema."""
-    if len(raw_data) < 4:
-        raise DecodeError(f"frame is too short: {len(raw_data)} bytes")
-
-    headcode, data_length, control_code = struct.unpack_from("!BBH", raw_data)
-    if headcode != HEADCODE:
-        raise DecodeError(f"unknown headcode 0x{headcode:02x}")
-    if data_length != DATA_LENGTH:
-        raise DecodeError(f"unknown data length {data_length}")
-    if len(raw_data) < MIN_FRAME_SIZE:
-        raise DecodeError(
-            f"incomplete frame: received {len(raw_data)} bytes, need at least {MIN_FRAME_SIZE}"
+    return decode_inverter_report(raw_data).as_dict()
+
+
+@dataclass
+class InverterBatch:
+    """Column-oriented decode result for many inverter reports.
+
+    ``indices`` maps each decoded row back to its position in the input, and
+    rejected frames are listed in ``errors`` with the same messages that
+    :class:`DecodeError` would carry.
+    """
+
+    indices: array[int] = field(default_factory=lambda: array("L"))
+    headcode: array[int] = field(default_factory=lambda: array("B"))
+    datalength: array[int] = field(default_factory=lambda: array("B"))
+    ctrlcode: array[int] = field(default_factory=lambda: array("H"))
+    inverter_serial: list[str] = field(default_factory=list)
+    columns: dict[str, array[int]] = field(
+        default_factory=lambda: {
+            name: array("L" if code == "L" else "H")
+            for name, code in zip(FIELD_NAMES, _FIELD_CODES, strict=True)
+        }
+    )
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def row(self, position: int) -> dict[str, Any]:
+        """Return one decoded row in the legacy schema, without ``raw``."""
+        status: dict[str, Any] = {
+            "headcode": self.headcode[position],
+            "datalength": self.datalength[position],
+            "ctrlcode": self.ctrlcode[position],
+            "inverter_serial": self.inverter_serial[position],
+        }
+        status.update(
+            (name, column[position]) for name, column in self.columns.items()
+        )
+        return status
+
+
+def decode_inverter_batch(
+    frames: bytes | bytearray | memoryview | Iterable[bytes],
+) -> InverterBatch:
+    """Decode many reports at once into one array per field.
+
+    ``frames`` is either a sequence of individual frames or one buffer of
+    back-to-back frames, each as long as its data length byte says. When all
+    of them are full frames of the default layout, they are validated and
+    unpacked one field at a time across the whole buffer, and only frames
+    that fail a check are looked at one by one. Other inputs are validated
+    frame by frame and repacked into the default layout. No per-frame dict
+    is built either way.
+    """
+    if isinstance(frames, (bytes, bytearray, memoryview)):
+        buffer = bytes(frames)
+        if _full_frames(buffer):
+            return _decode_full_frames(buffer)
+        return _decode_each(_split_frames(memoryview(buffer)))
+    frames = list(frames)
+    if all(len(frame) == FRAME_SIZE for frame in frames):
+        buffer = b"".join(frames)
+        if _full_frames(buffer):
+            return _decode_full_frames(buffer)
+    return _decode_each(frames)
+
+
+def _full_frames(buffer: bytes) -> bool:
+    """Whether ``buffer`` holds only frames sized for the default layout.
+
+    Such frames decode with the default layout or not at all, unless another
+    layout shares its data length.
+    """
+    count, remainder = divmod(len(buffer), FRAME_SIZE)
+    return (
+        not remainder
+        and buffer[1::FRAME_SIZE] == bytes((DATA_LENGTH,)) * count
+        and all(
+            layout is DEFAULT_LAYOUT
+            for key, layout in _LAYOUTS.items()
+            if key[1] == DATA_LENGTH
         )
+    )
+
 
-    serial_bytes = raw_data[
-        INVERTER_SERIAL_OFFSET : INVERTER_SERIAL_OFFSET + 16
+def _decode_full_frames(buffer: bytes) -> InverterBatch:
+    batch = InverterBatch()
+    count = len(buffer) // FRAME_SIZE
+    rejected = _rejected_frames(buffer, count)
+    if not rejected:
+        batch.indices.extend(range(count))
+        _extend_columns(batch, buffer, FRAME_SIZE)
+        return batch
+    frames = [
+        buffer[offset : offset + FRAME_SIZE]
+        for offset in range(0, len(buffer), FRAME_SIZE)
     ]
-    inverter_serial = serial_bytes.decode("ascii", errors="replace").rstrip("\x00 ")
-    values = INVERTER_VALUES.unpack_from(raw_data, INVERTER_DATA_OFFSET)
-
-    status: dict[str, Any] = {
-        "raw_length": len(raw_data[INVERTER_SERIAL_OFFSET:]),
-        "raw": raw_data.hex(),
-        "headcode": headcode,
-        "datalength": data_length,
-        "ctrlcode": control_code,
-        "inverter_serial": inverter_serial,
-    }
-    status.update(zip(FIELD_NAMES, values, strict=True))
-    return status
+    for index in rejected:
+        batch.errors.append((index, frame_error(frames[index]) or "invalid frame"))
+        frames[index] = b""
+    batch.indices.extend(index for index, frame in enumerate(frames) if frame)
+    _extend_columns(batch, b"".join(frames), FRAME_SIZE)
+    return batch
+
+
+def _rejected_frames(buffer: bytes, count: int) -> list[int]:
+    """Return the positions of full frames that :func:`frame_layout` rejects."""
+    rejected: set[int] = set()
+    for offset, expected in ((0, HEADCODE), (FRAME_SIZE - 1, END_CODE)):
+        found = buffer[offset::FRAME_SIZE]
+        if found != bytes((expected,)) * count:
+            rejected.update(
+                index for index, value in enumerate(found) if value != expected
+            )
+    computed = _checksums(buffer, count)
+    carried = buffer[FRAME_SIZE - 2 :: FRAME_SIZE]
+    if computed != carried:
+        rejected.update(
+            index
+            for index, (checksum, value) in enumerate(zip(computed, carried))
+            if checksum != value
+        )
+    return sorted(rejected)
+
+
+def _checksums(buffer: bytes, count: int) -> bytes:
+    """Return the checksum of every full frame in ``buffer`` in one pass.
+
+    Each byte position of all frames is spread into one 16-bit lane per frame
+    of a single integer, so adding those integers sums every frame in its own
+    lane. The bytes of one frame add up to less than 2**16, so no lane
+    carries into the next.
+    """
+    lanes = bytearray(2 * count)
+    total = 0
+    for offset in range(1, FRAME_SIZE - 2):
+        lanes[1::2] = buffer[offset::FRAME_SIZE]
+        total += int.from_bytes(lanes, "big")
+    return total.to_bytes(2 * count, "big")[1::2]
+
+
+def _decode_each(frames: Iterable[bytes | memoryview]) -> InverterBatch:
+    batch = InverterBatch()
+    packed = bytearray()
+    for index, frame in enumerate(frames):
+        try:
+            layout = frame_layout(frame)
+            if layout is DEFAULT_LAYOUT:
+                packed += frame[: FRAME_VALUES.size]
+            else:
+                packed += FRAME_VALUES.pack(*layout.unpack(frame))
+        except DecodeError as error:
+            batch.errors.append((index, str(error)))
+            continue
+        except struct.error as error:
+            batch.errors.append((index, f"value out of range: {error}"))
+            continue
+        batch.indices.append(index)
+    _extend_columns(batch, bytes(packed), FRAME_VALUES.size)
+    return batch
+
+
+def _extend_columns(batch: InverterBatch, rows: bytes, stride: int) -> None:
+    """Append the fields of ``rows``, laid out as frames ``stride`` bytes apart."""
+    batch.headcode.frombytes(rows[0::stride])
+    batch.datalength.frombytes(rows[1::stride])
+    _extend_column(batch.ctrlcode, rows, 2, 2, stride)
+    serials = struct.Struct(
+        f"{INVERTER_SERIAL_OFFSET}x16s{stride - INVERTER_DATA_OFFSET}x"
+    )
+    raw_serials = list(map(itemgetter(0), serials.iter_unpack(rows)))
+    names = {serial: _serial_text(serial) for serial in set(raw_serials)}
+    batch.inverter_serial.extend(map(names.__getitem__, raw_serials))
+    offset = INVERTER_DATA_OFFSET
+    for column, code in zip(batch.columns.values(), _FIELD_CODES, strict=True):
+        size = struct.calcsize(f">{code}")
+        _extend_column(column, rows, offset, size, stride)
+        offset += size
+
+
+def _extend_column(
+    column: array[int], rows: bytes, offset: int, size: int, stride: int
+) -> None:
+    """Append the big-endian ``size``-byte value at ``offset`` of every row."""
+    width = column.itemsize
+    values = bytearray(width * (len(rows) // stride))
+    for byte in range(size):
+        values[width - size + byte :: width] = rows[offset + byte :: stride]
+    native = array(column.typecode, values)
+    if sys.byteorder == "little":
+        native.byteswap()
+    column.extend(native)
+
+
+def _split_frames(view: memoryview) -> Iterator[memoryview]:
+    offset = 0
+    while offset < len(view):
+        size = view[offset + 1] + FRAME_OVERHEAD if offset + 1 < len(view) else 1
+        yield view[offset : offset + size]
+        offset += size
 
 
 def decode_hex_string(hex_string: str) -> dict[str, Any]:
@@ -2,49 +2,79 @@
 
 from __future__ import annotations
 
-import json
+import hashlib
+import re
 from collections.abc import Iterator
 from dataclasses import dataclass
 
+from .speedups import dumps
+
+HOMEASSISTANT_STATUS_TOPIC = "homeassistant/status"
+
 
 @dataclass(frozen=True)
 class Sensor:
     key: str
     name: str
-    device_class: str
+    device_class: str | None
     state_class: str
     unit: str
     value_template: str
+    # Key of the pre-scaled value in the state payload.
+    scaled_key: str
 
 
 SENSORS = (
-    Sensor("watt_now", "Current Power", "power", "measurement", "W", "{{ value_json.watt_now }}"),
-    Sensor("temp", "Temperature", "temperature", "measurement", "°C", "{{ (value_json.temp / 10.0) | round(1) }}"),
-    Sensor("dc_volts1", "DC1 Voltage", "voltage", "measurement", "V", "{{ value_json.dc_volts1 / 10.0 }}"),
-    Sensor("dc_amps1", "DC1 Current", "current", "measurement", "A", "{{ value_json.dc_amps1 / 10.0 }}"),
-    Sensor("dc_volts2", "DC2 Voltage", "voltage", "measurement", "V", "{{ value_json.dc_volts2 / 10.0 }}"),
-    Sensor("dc_amps2", "DC2 Current", "current", "measurement", "A", "{{ value_json.dc_amps2 / 10.0 }}"),
-    Sensor("dc_volts3", "DC3 Voltage", "voltage", "measurement", "V", "{{ value_json.dc_volts3 / 10.0 }}"),
-    Sensor("dc_amps3", "DC3 Current", "current", "measurement", "A", "{{ value_json.dc_amps3 / 10.0 }}"),
-    Sensor("ac_volts1", "AC1 Voltage", "voltage", "measurement", "V", "{{ value_json.ac_volts1 / 10.0 }}"),
-    Sensor("ac_amps1", "AC1 Current", "current", "measurement", "A", "{{ value_json.ac_amps1 / 10.0 }}"),
-    Sensor("ac_volts2", "AC2 Voltage", "voltage", "measurement", "V", "{{ value_json.ac_volts2 / 10.0 }}"),
-    Sensor("ac_amps2", "AC2 Current", "current", "measurement", "A", "{{ value_json.ac_amps2 / 10.0 }}"),
-    Sensor("ac_volts3", "AC3 Voltage", "voltage", "measurement", "V", "{{ value_json.ac_volts3 / 10.0 }}"),
-    Sensor("ac_amps3", "AC3 Current", "current", "measurement", "A", "{{ value_json.ac_amps3 / 10.0 }}"),
-    Sensor("ac_freq", "AC Frequency", "frequency", "measurement", "Hz", "{{ value_json.ac_freq / 100.0 }}"),
-    Sensor("kwh_day", "Daily Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_day / 100.0 }}"),
-    Sensor("kwh_yesterday", "Yesterday's Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_yesterday / 100.0 }}"),
-    Sensor("kwh_total", "Total Energy", "energy", "total_increasing", "kWh", "{{ value_json.kwh_total / 10.0 }}"),
-    Sensor("kwh_month", "This Month's Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_month }}"),
-    Sensor("kwh_lastmonth", "Last Month's Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_lastmonth }}"),
+    Sensor("watt_now", "Current Power", "power", "measurement", "W", "{{ value_json.watt_now }}", "power"),
+    Sensor("temp", "Temperature", "temperature", "measurement", "°C", "{{ (value_json.temp / 10.0) | round(1) }}", "temperature"),
+    Sensor("dc_volts1", "DC1 Voltage", "voltage", "measurement", "V", "{{ value_json.dc_volts1 / 10.0 }}", "dc_voltage1"),
+    Sensor("dc_amps1", "DC1 Current", "current", "measurement", "A", "{{ value_json.dc_amps1 / 10.0 }}", "dc_current1"),
+    Sensor("dc_volts2", "DC2 Voltage", "voltage", "measurement", "V", "{{ value_json.dc_volts2 / 10.0 }}", "dc_voltage2"),
+    Sensor("dc_amps2", "DC2 Current", "current", "measurement", "A", "{{ value_json.dc_amps2 / 10.0 }}", "dc_current2"),
+    Sensor("dc_volts3", "DC3 Voltage", "voltage", "measurement", "V", "{{ value_json.dc_volts3 / 10.0 }}", "dc_voltage3"),
+    Sensor("dc_amps3", "DC3 Current", "current", "measurement", "A", "{{ value_json.dc_amps3 / 10.0 }}", "dc_current3"),
+    Sensor("ac_volts1", "AC1 Voltage", "voltage", "measurement", "V", "{{ value_json.ac_volts1 / 10.0 }}", "ac_voltage1"),
+    Sensor("ac_amps1", "AC1 Current", "current", "measurement", "A", "{{ value_json.ac_amps1 / 10.0 }}", "ac_current1"),
+    Sensor("ac_volts2", "AC2 Voltage", "voltage", "measurement", "V", "{{ value_json.ac_volts2 / 10.0 }}", "ac_voltage2"),
+    Sensor("ac_amps2", "AC2 Current", "current", "measurement", "A", "{{ value_json.ac_amps2 / 10.0 }}", "ac_current2"),
+    Sensor("ac_volts3", "AC3 Voltage", "voltage", "measurement", "V", "{{ value_json.ac_volts3 / 10.0 }}", "ac_voltage3"),
+    Sensor("ac_amps3", "AC3 Current", "current", "measurement", "A", "{{ value_json.ac_amps3 / 10.0 }}", "ac_current3"),
+    Sensor("ac_freq", "AC Frequency", "frequency", "measurement", "Hz", "{{ value_json.ac_freq / 100.0 }}", "ac_frequency"),
+    Sensor("kwh_day", "Daily Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_day / 100.0 }}", "energy_today"),
+    Sensor("kwh_yesterday", "Yesterday's Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_yesterday / 100.0 }}", "energy_yesterday"),
+    Sensor("kwh_total", "Total Energy", "energy", "total_increasing", "kWh", "{{ value_json.kwh_total / 10.0 }}", "energy_total"),
+    Sensor("kwh_month", "This Month's Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_month }}", "energy_this_month"),
+    Sensor("kwh_lastmonth", "Last Month's Yield", "energy", "total_increasing", "kWh", "{{ value_json.kwh_lastmonth }}", "energy_last_month"),
+)
+
+# Published only with scaled values, which carry their inputs.
+DERIVED_SENSORS = (
+    Sensor("dc_power1", "DC1 Power", "power", "measurement", "W", "{{ value_json.dc_power1 }}", "dc_power1"),
+    Sensor("dc_power2", "DC2 Power", "power", "measurement", "W", "{{ value_json.dc_power2 }}", "dc_power2"),
+    Sensor("dc_power3", "DC3 Power", "power", "measurement", "W", "{{ value_json.dc_power3 }}", "dc_power3"),
+    Sensor("dc_power", "DC Power", "power", "measurement", "W", "{{ value_json.dc_power }}", "dc_power"),
+    Sensor("efficiency", "Conversion Efficiency", None, "measurement", "%", "{{ value_json.efficiency }}", "efficiency"),
 )
 
 
+_JSON_FIELD = re.compile(r"value_json\.\w+")
+
+
 def discovery_messages(
-    client_id: str, state_topic: str
+    client_id: str,
+    state_topic: str,
+    *,
+    field_topics: bool = False,
+    scaled: bool = False,
 ) -> Iterator[tuple[str, str]]:
-    """Yield retained Home Assistant discovery topic/payload pairs."""
+    """Yield retained Home Assistant discovery topic/payload pairs.
+
+    With ``field_topics`` each sensor reads its own ``<state_topic>/<key>``
+    topic, which carries the bare raw value, instead of the JSON state.
+    Otherwise, with ``scaled`` the sensors read the pre-scaled values of the
+    JSON state without any arithmetic, and the derived sensors are added.
+    """
+    scaled = scaled and not field_topics
     device_id = f"ginlong_inverter_{client_id}"
     device = {
         "identifiers": [device_id],
@@ -52,17 +82,77 @@ def discovery_messages(
         "name": f"Ginlong Inverter {client_id}",
     }
 
-    for sensor in SENSORS:
+    for sensor in SENSORS + DERIVED_SENSORS if scaled else SENSORS:
         topic = f"homeassistant/sensor/{device_id}/{sensor.key}/config"
+        sensor_topic = state_topic
+        value_template = sensor.value_template
+        if field_topics:
+            sensor_topic = f"{state_topic}/{sensor.key}"
+            value_template = _JSON_FIELD.sub("(value | int)", value_template)
+        elif scaled:
+            value_template = f"{{{{ value_json.{sensor.scaled_key} }}}}"
         payload = {
             "device_class": sensor.device_class,
             "device": device,
             "expire_after": 3600,
             "name": sensor.name,
             "state_class": sensor.state_class,
-            "state_topic": state_topic,
+            "state_topic": sensor_topic,
             "unique_id": f"{device_id}_{sensor.key}",
             "unit_of_measurement": sensor.unit,
-            "value_template": sensor.value_template,
+            "value_template": value_template,
         }
-        yield topic, json.dumps(payload, separators=(",", ":"), sort_keys=True)
+        if sensor.device_class is None:
+            del payload["device_class"]
+        yield topic, dumps(payload, sort_keys=True)
+
+
+class DiscoveryCache:
+    """Encode discovery once per client ID and track what the broker retains.
+
+    Payloads are built and hashed the first time an inverter is seen. A
+    client ID needs publishing until its current digest has been marked as
+    published; :meth:`forget` and :meth:`forget_all` undo that after a lost
+    publish or when Home Assistant announces a restart.
+    """
+
+    def __init__(self, *, field_topics: bool = False, scaled: bool = False) -> None:
+        self.field_topics = field_topics
+        self.scaled = scaled
+        self._encoded: dict[str, tuple[str, tuple[tuple[str, str], ...]]] = {}
+        self._published: dict[str, str] = {}
+
+    def messages(
+        self, client_id: str, state_topic: str
+    ) -> tuple[str, tuple[tuple[str, str], ...]]:
+        """Return the digest and encoded discovery messages for a client ID."""
+        encoded = self._encoded.get(client_id)
+        if encoded is None:
+            messages = tuple(
+                discovery_messages(
+                    client_id,
+                    state_topic,
+                    field_topics=self.field_topics,
+                    scaled=self.scaled,
+                )
+            )
+            digest = hashlib.sha256()
+            for topic, payload in messages:
+                digest.update(f"{topic}\0{payload}\0".encode())
+            encoded = self._encoded[client_id] = (digest.hexdigest(), messages)
+        return encoded
+
+    def needs_publish(self, client_id: str) -> bool:
+        encoded = self._encoded.get(client_id)
+        return encoded is None or self._published.get(client_id) != encoded[0]
+
+    def mark_published(self, client_id: str) -> None:
+        self._published[client_id] = self._encoded[client_id][0]
+
+    def forget(self, client_id: str) -> None:
+        self._published.pop(client_id, None)
+
+    def forget_all(self) -> list[str]:
+        """Forget every publish and return the client IDs seen so far."""
+        self._published.clear()
+        return list(self._encoded)
@@ -0,0 +1,50 @@
+"""Incremental framing of inverter reports received over a byte stream."""
+
+from __future__ import annotations
+
+from .decoder import END_CODE, FRAME_OVERHEAD, HEADCODE
+
+
+class FrameBuffer:
+    """Split a byte stream into complete report frames.
+
+    A frame starts with :data:`HEADCODE`, carries its data length in the
+    second byte and ends with :data:`END_CODE`. Bytes that cannot start a
+    frame are skipped until the next head code, so one corrupt or truncated
+    report does not desynchronise the rest of a persistent connection.
+    """
+
+    __slots__ = ("_buffer", "discarded")
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self.discarded = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """Append received bytes and return every frame they complete."""
+        buffer = self._buffer
+        buffer += data
+        frames: list[bytes] = []
+        while buffer:
+            if buffer[0] != HEADCODE:
+                start = buffer.find(HEADCODE)
+                skipped = len(buffer) if start < 0 else start
+                del buffer[:skipped]
+                self.discarded += skipped
+                continue
+            if len(buffer) < 2:
+                break
+            size = buffer[1] + FRAME_OVERHEAD
+            if len(buffer) < size:
+                break
+            if buffer[size - 1] != END_CODE:
+                # A stray head code inside garbage; resynchronise after it.
+                del buffer[:1]
+                self.discarded += 1
+                continue
+            frames.append(bytes(buffer[:size]))
+            del buffer[:size]
+        return frames
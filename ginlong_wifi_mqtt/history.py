@@ -0,0 +1,266 @@
+"""Local SQLite history of every decoded report.
+
+Reports are queued in memory as they are received and written in one
+transaction per batch on a dedicated thread, so the event loop never waits
+for the disk. Rows are indexed by inverter serial and time, rows older than
+the retention are pruned periodically, and the freed pages are returned to
+the file system.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TextIO, TypeVar
+
+from .decoder import FIELD_NAMES, InverterReport
+from .metrics import HISTORY_DROPPED, HISTORY_WRITTEN
+
+LOGGER = logging.getLogger(__name__)
+HISTORY_COLUMNS = ("inverter_serial", "time", *FIELD_NAMES)
+FLUSH_INTERVAL = 2.0
+PRUNE_INTERVAL = 3600.0
+# Pages returned to the file system per prune.
+VACUUM_PAGES = 4096
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS reports ("
+    "inverter_serial TEXT NOT NULL, time REAL NOT NULL, "
+    + ", ".join(f"{name} INTEGER NOT NULL" for name in FIELD_NAMES)
+    + ")",
+    "CREATE INDEX IF NOT EXISTS reports_by_serial_time "
+    "ON reports (inverter_serial, time)",
+    "CREATE INDEX IF NOT EXISTS reports_by_time ON reports (time)",
+)
+_INSERT = (
+    f"INSERT INTO reports ({', '.join(HISTORY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in HISTORY_COLUMNS)})"
+)
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)([smhdw])")
+_DURATION_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+Row = tuple[Any, ...]
+T = TypeVar("T")
+
+
+def parse_time(value: str, now: float | None = None) -> float:
+    """Parse Unix seconds, an ISO 8601 time or an age such as ``15m`` or ``7d``."""
+    now = time.time() if now is None else now
+    match = _DURATION.fullmatch(value.strip())
+    if match is not None:
+        return now - float(match[1]) * _DURATION_SECONDS[match[2]]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"invalid time {value!r}") from None
+
+
+def open_history(path: Path) -> sqlite3.Connection:
+    """Open or create a history database for writing."""
+    connection = sqlite3.connect(path)
+    # Incremental vacuum only applies to databases created with it.
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    with connection:
+        for statement in _SCHEMA:
+            connection.execute(statement)
+    return connection
+
+
+class HistoryWriter:
+    """Queue reports and write them to SQLite in batches off the event loop.
+
+    :meth:`add` only appends a row to a list. :meth:`run` flushes that list
+    every ``flush_interval`` seconds on a single writer thread and prunes
+    rows older than ``retention`` seconds. If the disk cannot keep up, rows
+    beyond ``max_pending`` are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        retention: float = 30 * 86400,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_pending: int = 100_000,
+    ) -> None:
+        self.path = path
+        self.retention = retention
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self._pending: list[Row] = []
+        self._connection: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="history")
+
+    def add(self, report: InverterReport, timestamp: float | None = None) -> None:
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            HISTORY_DROPPED.inc()
+            return
+        self._pending.append(
+            (
+                report.inverter_serial,
+                time.time() if timestamp is None else timestamp,
+                *report.field_values(),
+            )
+        )
+
+    def _write(self, rows: list[Row]) -> None:
+        assert self._connection is not None
+        with self._connection:
+            self._connection.executemany(_INSERT, rows)
+
+    def _prune(self, before: float) -> int:
+        assert self._connection is not None
+        with self._connection:
+            deleted = self._connection.execute(
+                "DELETE FROM reports WHERE time < ?", (before,)
+            ).rowcount
+        self._connection.execute(
+            f"PRAGMA incremental_vacuum({VACUUM_PAGES})"
+        ).fetchall()
+        return deleted
+
+    async def _call(self, function: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, function, *args
+        )
+
+    async def flush(self) -> int:
+        """Write every queued row in one transaction and return how many."""
+        rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        try:
+            await self._call(self._write, rows)
+        except sqlite3.Error as error:
+            self.dropped += len(rows)
+            HISTORY_DROPPED.inc(amount=len(rows))
+            LOGGER.warning("Could not write %d history rows: %s", len(rows), error)
+            return 0
+        self.written += len(rows)
+        HISTORY_WRITTEN.inc(amount=len(rows))
+        return len(rows)
+
+    async def prune(self, now: float | None = None) -> int:
+        before = (time.time() if now is None else now) - self.retention
+        deleted = await self._call(self._prune, before)
+        if deleted:
+            LOGGER.info("Pruned %d history rows older than the retention", deleted)
+        return deleted
+
+    async def open(self) -> None:
+        if self._connection is None:
+            self._connection = await self._call(open_history, self.path)
+
+    async def close(self) -> None:
+        if self._connection is not None:
+            await self._call(self._connection.close)
+            self._connection = None
+        self._executor.shutdown()
+
+    async def run(self) -> None:
+        await self.open()
+        LOGGER.info("Recording report history to %s", self.path)
+        next_prune = 0.0
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + PRUNE_INTERVAL
+                    try:
+                        await self.prune()
+                    except sqlite3.Error as error:
+                        LOGGER.warning("Could not prune the history: %s", error)
+        finally:
+            await self.flush()
+            await self.close()
+
+
+def query_history(
+    path: Path,
+    *,
+    serials: Sequence[str] = (),
+    start: float | None = None,
+    end: float | None = None,
+    fields: Sequence[str] = (),
+    limit: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield stored reports in time order, optionally filtered.
+
+    The database is opened read-only, so a running bridge keeps writing
+    while it is queried.
+    """
+    unknown = set(fields) - set(FIELD_NAMES)
+    if unknown:
+        raise ValueError(f"unknown history fields: {', '.join(sorted(unknown))}")
+    columns = ("inverter_serial", "time", *(fields or FIELD_NAMES))
+    conditions: list[str] = []
+    parameters: list[Any] = []
+    if serials:
+        conditions.append(
+            f"inverter_serial IN ({', '.join('?' for _ in serials)})"
+        )
+        parameters.extend(serials)
+    if start is not None:
+        conditions.append("time >= ?")
+        parameters.append(start)
+    if end is not None:
+        conditions.append("time < ?")
+        parameters.append(end)
+    sql = f"SELECT {', '.join(columns)} FROM reports"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY time"
+    if limit is not None:
+        sql += " LIMIT ?"
+        parameters.append(limit)
+    if not path.exists():
+        raise ValueError(f"{path} does not exist")
+    connection = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        try:
+            cursor = connection.execute(sql, parameters)
+        except sqlite3.Error as error:
+            raise ValueError(f"cannot read history from {path}: {error}") from None
+        for row in cursor:
+            yield dict(zip(columns, row))
+    finally:
+        connection.close()
+
+
+def write_history(
+    rows: Iterator[dict[str, Any]], stream: TextIO, output_format: str = "jsonl"
+) -> int:
+    """Write queried rows as JSON lines or CSV and return how many."""
+    count = 0
+    if output_format == "csv":
+        writer: csv.DictWriter[str] | None = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(stream, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(row, separators=(",", ":")) + "\n")
+        count += 1
+    return count
@@ -0,0 +1,149 @@
+"""Pipelined QoS 1 publishing over a single MQTT connection."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from functools import partial
+from typing import Any, Protocol
+
+from .metrics import PUBLISH_SECONDS, PUBLISHED
+
+
+class Publisher(Protocol):
+    async def publish(
+        self, topic: str, *, payload: str, qos: int, retain: bool
+    ) -> None: ...
+
+
+class InflightWindow:
+    """Keep up to ``size`` QoS 1 publishes awaiting their PUBACK at once.
+
+    Each publish may carry a ``token`` identifying what it delivers. Tokens of
+    messages that were never acknowledged are returned by :meth:`abort` in
+    submission order, so they can be re-queued for the next connection.
+    A failed publish is re-raised from the next :meth:`publish`,
+    :meth:`drain` or :meth:`wait_failed` call.
+    """
+
+    def __init__(self, client: Publisher, size: int) -> None:
+        self.client = client
+        self.size = size
+        self.acknowledged = 0
+        self._slots = asyncio.Semaphore(size)
+        self._unacked: dict[asyncio.Task[None], Any] = {}
+        self._error: BaseException | None = None
+        self._failed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._unacked)
+
+    def check(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def publish(
+        self,
+        topic: str,
+        payload: str,
+        *,
+        retain: bool = False,
+        token: Any = None,
+        on_ack: Callable[[], object] | None = None,
+    ) -> None:
+        """Send a message once a window slot is free, without awaiting its ACK.
+
+        ``on_ack`` is called once the message has been acknowledged.
+        """
+        self.check()
+        await self._slots.acquire()
+        if self._error is not None:
+            self._slots.release()
+            raise self._error
+        task = asyncio.create_task(
+            self.client.publish(topic, payload=payload, qos=1, retain=retain)
+        )
+        self._unacked[task] = token
+        started = asyncio.get_running_loop().time()
+        task.add_done_callback(partial(self._completed, started, on_ack))
+
+    def _completed(
+        self,
+        started: float,
+        on_ack: Callable[[], object] | None,
+        task: asyncio.Task[None],
+    ) -> None:
+        self._slots.release()
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is None:
+            del self._unacked[task]
+            self.acknowledged += 1
+            PUBLISHED.inc()
+            PUBLISH_SECONDS.observe(asyncio.get_running_loop().time() - started)
+            if on_ack is not None:
+                on_ack()
+        else:
+            self.fail(error)
+
+    def fail(self, error: BaseException) -> None:
+        """Fail the window as a failed publish would, unless it already failed."""
+        if self._error is None:
+            self._error = error
+            self._failed.set()
+
+    def watch(self, task: asyncio.Task[Any]) -> None:
+        """Fail the window with the error of ``task`` should it raise one."""
+        task.add_done_callback(self._watched_done)
+
+    def _watched_done(self, task: asyncio.Task[Any]) -> None:
+        if not task.cancelled() and (error := task.exception()) is not None:
+            self.fail(error)
+
+    async def wait_failed(self) -> None:
+        """Wait until an in-flight publish fails, then raise its error."""
+        await self._failed.wait()
+        self.check()
+
+    async def drain(self) -> None:
+        """Wait for every in-flight publish to be acknowledged."""
+        while self._unacked and self._error is None:
+            await asyncio.wait(
+                tuple(self._unacked), return_when=asyncio.FIRST_COMPLETED
+            )
+        self.check()
+
+    def abort(self) -> list[Any]:
+        """Cancel outstanding publishes and return unacknowledged tokens."""
+        # A token shared by several messages is returned once.
+        tokens = list(
+            {
+                id(token): token
+                for token in self._unacked.values()
+                if token is not None
+            }.values()
+        )
+        for task in self._unacked:
+            task.cancel()
+        self._unacked.clear()
+        return tokens
+
+
+async def next_or_failure(
+    window: InflightWindow, getter: asyncio.Future[Any]
+) -> Any:
+    """Await ``getter`` unless an in-flight publish fails first."""
+    failed = asyncio.ensure_future(window.wait_failed())
+    try:
+        await asyncio.wait((getter, failed), return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        getter.cancel()
+        raise
+    finally:
+        failed.cancel()
+    if not getter.done():
+        getter.cancel()
+        # Only a failure can have completed first, so this re-raises it.
+        failed.result()
+    return getter.result()
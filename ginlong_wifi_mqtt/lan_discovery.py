@@ -5,11 +5,23 @@ from __future__ import annotations
 import asyncio
 import ipaddress
 import socket
-import time
+import struct
+from collections.abc import Callable, Iterable, Sequence
 from dataclasses import dataclass
 
+from .metrics import DISCOVERED_LOGGERS, DISCOVERY_REPLIES
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
 DISCOVERY_MESSAGE = b"WIFIKIT-214028-READ"
 DISCOVERY_PORT = 48899
+# Unicast sweeps are limited to networks no larger than a /20.
+MAX_SWEEP_ADDRESSES = 4096
+_SIOCGIFADDR = 0x8915
+_SIOCGIFNETMASK = 0x891B
 
 
 @dataclass(frozen=True)
@@ -81,37 +93,143 @@ def select_logger(
     return candidates[0]
 
 
-def _discover_loggers(
-    broadcast_address: str,
-    timeout: float,
-    bind_address: str,
-    port: int,
-) -> list[LoggerAdvertisement]:
-    deadline = time.monotonic() + timeout
-    advertisements: dict[str, LoggerAdvertisement] = {}
+def parse_discovery_network(value: str) -> ipaddress.IPv4Network:
+    """Parse a ``ADDRESS/PREFIX`` IPv4 network to discover loggers on."""
+    try:
+        network = ipaddress.ip_network(value, strict=False)
+    except ValueError as error:
+        raise ValueError(f"invalid discovery network {value!r}: {error}") from error
+    if not isinstance(network, ipaddress.IPv4Network):
+        raise ValueError(f"invalid discovery network {value!r}: IPv4 only")
+    return network
 
+
+def local_ipv4_networks() -> list[ipaddress.IPv4Network]:
+    """Return the IPv4 networks of the local non-loopback interfaces (Linux)."""
+    if fcntl is None:
+        return []
+    networks: dict[ipaddress.IPv4Network, None] = {}
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, name in socket.if_nameindex():
+            request = struct.pack("256s", name.encode()[:15])
+            try:
+                address = fcntl.ioctl(sock.fileno(), _SIOCGIFADDR, request)
+                netmask = fcntl.ioctl(sock.fileno(), _SIOCGIFNETMASK, request)
+            except OSError:
+                # The interface has no IPv4 address.
+                continue
+            interface = ipaddress.IPv4Interface(
+                (socket.inet_ntoa(address[20:24]), socket.inet_ntoa(netmask[20:24]))
+            )
+            if interface.ip.is_loopback or interface.network.prefixlen >= 31:
+                continue
+            networks[interface.network] = None
+    return list(networks)
+
+
+def sweep_addresses(networks: Iterable[ipaddress.IPv4Network]) -> list[str]:
+    """Host addresses of every network small enough to unicast-sweep."""
+    addresses: dict[str, None] = {}
+    for network in networks:
+        if network.num_addresses <= MAX_SWEEP_ADDRESSES:
+            addresses.update(dict.fromkeys(str(host) for host in network.hosts()))
+    return list(addresses)
+
+
+async def send_discovery(
+    transport: asyncio.DatagramTransport,
+    port: int,
+    broadcast_addresses: Iterable[str],
+    unicast_addresses: Sequence[str] = (),
+    rate: float = 200,
+) -> None:
+    """Send one discovery round: every broadcast at once, then a paced sweep.
+
+    Replies are handled by the transport's protocol as they arrive, so the
+    broadcasts to all subnets share one collection window.
+    """
+    for address in dict.fromkeys(broadcast_addresses):
+        transport.sendto(DISCOVERY_MESSAGE, (address, port))
+    loop = asyncio.get_running_loop()
+    due = loop.time()
+    for address in unicast_addresses:
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        transport.sendto(DISCOVERY_MESSAGE, (address, port))
+        due += 1 / rate
+
+
+class LoggerRegistry:
+    """Loggers seen on the LAN, keyed by MAC address, with last-seen times."""
+
+    def __init__(self) -> None:
+        self._loggers: dict[str, tuple[LoggerAdvertisement, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._loggers)
+
+    def advertisements(self) -> list[LoggerAdvertisement]:
+        return [advertisement for advertisement, _ in self._loggers.values()]
+
+    def last_seen(self, mac_address: str) -> float | None:
+        entry = self._loggers.get(mac_address)
+        return None if entry is None else entry[1]
+
+    def update(self, advertisement: LoggerAdvertisement, now: float) -> bool:
+        """Record an advertisement and report whether the logger changed."""
+        previous = self._loggers.get(advertisement.mac_address)
+        self._loggers[advertisement.mac_address] = (advertisement, now)
+        return previous is None or previous[0] != advertisement
+
+    def expire(self, now: float, max_age: float) -> bool:
+        """Forget loggers not seen for ``max_age`` seconds."""
+        stale = [
+            mac_address
+            for mac_address, (_, seen) in self._loggers.items()
+            if now - seen > max_age
+        ]
+        for mac_address in stale:
+            del self._loggers[mac_address]
+        return bool(stale)
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, received: Callable[[LoggerAdvertisement], None]) -> None:
+        self.received = received
+
+    def datagram_received(self, data: bytes, addr: object) -> None:
+        try:
+            advertisement = parse_discovery_response(data)
+        except ValueError:
+            # Includes our own broadcast looping back on the shared port.
+            return
+        self.received(advertisement)
+
+
+def open_discovery_socket(bind_address: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setblocking(False)
         sock.bind((bind_address, port))
-        sock.sendto(DISCOVERY_MESSAGE, (broadcast_address, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
 
-        while True:
-            remaining = deadline - time.monotonic()
-            if remaining <= 0:
-                break
-            sock.settimeout(remaining)
-            try:
-                data, _ = sock.recvfrom(1024)
-            except TimeoutError:
-                break
-            try:
-                advertisement = parse_discovery_response(data)
-            except ValueError:
-                continue
-            advertisements[advertisement.mac_address] = advertisement
 
-    return list(advertisements.values())
+async def _open_endpoint(
+    bind_address: str,
+    port: int,
+    received: Callable[[LoggerAdvertisement], None],
+) -> asyncio.DatagramTransport:
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: _DiscoveryProtocol(received),
+        sock=open_discovery_socket(bind_address, port),
+    )
+    return transport
 
 
 async def discover_loggers(
@@ -120,12 +238,125 @@ async def discover_loggers(
     timeout: float = 3,
     bind_address: str = "0.0.0.0",
     port: int = DISCOVERY_PORT,
+    networks: Sequence[ipaddress.IPv4Network] = (),
+    sweep: bool = False,
+    sweep_rate: float = 200,
 ) -> list[LoggerAdvertisement]:
-    """Broadcast the read-only discovery message and collect logger replies."""
-    return await asyncio.to_thread(
-        _discover_loggers,
-        broadcast_address,
-        timeout,
-        bind_address,
-        port,
-    )
+    """Broadcast the read-only discovery message and collect logger replies.
+
+    Besides ``broadcast_address``, the message is broadcast to each of
+    ``networks`` and, with ``sweep``, sent to each of their hosts at up to
+    ``sweep_rate`` packets per second. Replies are merged by MAC address.
+    """
+    advertisements: dict[str, LoggerAdvertisement] = {}
+
+    def received(advertisement: LoggerAdvertisement) -> None:
+        advertisements[advertisement.mac_address] = advertisement
+
+    transport = await _open_endpoint(bind_address, port, received)
+    try:
+        await send_discovery(
+            transport,
+            port,
+            [broadcast_address, *(str(n.broadcast_address) for n in networks)],
+            sweep_addresses(networks) if sweep else (),
+            sweep_rate,
+        )
+        await asyncio.sleep(timeout)
+    finally:
+        transport.close()
+    return list(advertisements.values())
+
+
+class DiscoveryService:
+    """Keep broadcasting discovery and maintain a live :class:`LoggerRegistry`.
+
+    While no logger is known the broadcast repeats every ``retry_delay``
+    seconds, afterwards every ``interval`` seconds. Loggers silent for three
+    intervals are forgotten. ``on_change`` is called with all known loggers
+    whenever one appears, changes address or serial, or is forgotten.
+
+    Each round also broadcasts to ``networks`` and, with ``all_interfaces``,
+    to the networks of the local interfaces as they are at that time.
+    ``sweep`` additionally unicasts to every host of those networks.
+
+    With ``per_round``, changes are not reported as replies arrive but once
+    ``retry_delay`` seconds after each round was sent, so a choice between
+    loggers sees every logger that answered the round.
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[list[LoggerAdvertisement]], None],
+        *,
+        broadcast_address: str = "255.255.255.255",
+        bind_address: str = "0.0.0.0",
+        port: int = DISCOVERY_PORT,
+        interval: float = 300,
+        retry_delay: float = 3,
+        networks: Sequence[ipaddress.IPv4Network] = (),
+        all_interfaces: bool = False,
+        sweep: bool = False,
+        sweep_rate: float = 200,
+        per_round: bool = False,
+    ) -> None:
+        self.on_change = on_change
+        self.broadcast_address = broadcast_address
+        self.bind_address = bind_address
+        self.port = port
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.networks = tuple(networks)
+        self.all_interfaces = all_interfaces
+        self.sweep = sweep
+        self.sweep_rate = sweep_rate
+        self.per_round = per_round
+        self.registry = LoggerRegistry()
+        self._changed = False
+
+    def _received(self, advertisement: LoggerAdvertisement) -> None:
+        DISCOVERY_REPLIES.inc()
+        now = asyncio.get_running_loop().time()
+        if self.registry.update(advertisement, now):
+            self._changed = True
+            if not self.per_round:
+                self._report()
+
+    def _report(self) -> None:
+        self._changed = False
+        self.on_change(self.registry.advertisements())
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        DISCOVERED_LOGGERS.function = self.registry.__len__
+        transport = await _open_endpoint(
+            self.bind_address, self.port, self._received
+        )
+        try:
+            while True:
+                started = loop.time()
+                networks = list(self.networks)
+                if self.all_interfaces:
+                    networks.extend(local_ipv4_networks())
+                await send_discovery(
+                    transport,
+                    self.port,
+                    [
+                        self.broadcast_address,
+                        *(str(network.broadcast_address) for network in networks),
+                    ],
+                    sweep_addresses(networks) if self.sweep else (),
+                    self.sweep_rate,
+                )
+                if self.per_round:
+                    await asyncio.sleep(
+                        max(started + self.retry_delay - loop.time(), 0)
+                    )
+                    if self._changed:
+                        self._report()
+                delay = self.interval if self.registry else self.retry_delay
+                await asyncio.sleep(max(started + delay - loop.time(), 0))
+                if self.registry.expire(loop.time(), 3 * self.interval):
+                    self._report()
+        finally:
+            transport.close()
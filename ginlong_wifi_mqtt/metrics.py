@@ -0,0 +1,252 @@
+"""Minimal Prometheus metrics for the bridge, served over plain HTTP.
+
+Metrics are module-level and cheap to update, so the hot paths record them
+unconditionally; ``--metrics-port`` only decides whether they are served.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any
+
+LOGGER = logging.getLogger(__name__)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def take(self) -> list[Any]:
+        """Return the counts as JSON-ready data and reset them to zero."""
+        taken = [[list(labels), value] for labels, value in self.values.items()]
+        self.values = {}
+        return taken
+
+    def merge(self, taken: list[Any]) -> None:
+        """Add counts returned by :meth:`take` in another process."""
+        for labels, value in taken:
+            self.inc(*labels, amount=value)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """A value read from ``function`` when the metrics are scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+        self.function: Callable[[], float] = lambda: 0
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {_number(self.function())}"
+
+
+class _Buckets:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.values: dict[tuple[str, ...], _Buckets] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = _Buckets(len(self.buckets))
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series.counts[index] += 1
+        series.total += value
+        series.count += 1
+
+    def take(self) -> list[Any]:
+        """Return the observations as JSON-ready data and reset them."""
+        taken = [
+            [list(labels), series.counts, series.total, series.count]
+            for labels, series in self.values.items()
+        ]
+        self.values = {}
+        return taken
+
+    def merge(self, taken: list[Any]) -> None:
+        """Add observations returned by :meth:`take` in another process."""
+        for labels, counts, total, count in taken:
+            key = tuple(labels)
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = _Buckets(len(self.buckets))
+            series.counts = [old + new for old, new in zip(series.counts, counts)]
+            series.total += total
+            series.count += count
+
+    def samples(self) -> Iterator[str]:
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = _labels(self.labels, labels, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _labels(self.labels, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {series.count}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {series.total!r}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {series.count}"
+
+
+REGISTRY: list[Metric] = []
+
+FRAMES_RECEIVED = Counter(
+    "ginlong_frames_received_total", "Raw frames received.", ("transport",)
+)
+FRAME_BYTES = Histogram(
+    "ginlong_frame_bytes",
+    "Size of received raw frames.",
+    ("transport",),
+    (16, 64, 96, 103, 128, 192, 256, 512),
+)
+DECODE_FAILURES = Counter(
+    "ginlong_decode_failures_total", "Frames that could not be decoded.", ("reason",)
+)
+DATAGRAMS_DROPPED = Counter(
+    "ginlong_datagrams_dropped_total", "Oversized UDP datagrams dropped unread."
+)
+REPORTS_SUPERSEDED = Counter(
+    "ginlong_reports_superseded_total",
+    "Undelivered reports replaced by a newer one from the same inverter.",
+)
+BACKLOG_DROPPED = Counter(
+    "ginlong_backlog_dropped_total", "Backlogged reports dropped for lack of room."
+)
+REPORTS_PENDING = Gauge(
+    "ginlong_reports_pending", "Reports waiting to be published."
+)
+PUBLISHED = Counter("ginlong_mqtt_published_total", "MQTT messages acknowledged.")
+PUBLISH_SECONDS = Histogram(
+    "ginlong_mqtt_publish_seconds", "Time from MQTT publish to acknowledgement."
+)
+MQTT_RECONNECTS = Counter(
+    "ginlong_mqtt_reconnects_total", "Lost or failed MQTT connections."
+)
+POLL_SECONDS = Histogram(
+    "ginlong_poll_seconds", "Duration of successful V4 polls.", ("target",)
+)
+POLL_FAILURES = Counter(
+    "ginlong_poll_failures_total", "Failed V4 polls.", ("target",)
+)
+DISCOVERY_REPLIES = Counter(
+    "ginlong_discovery_replies_total", "LAN discovery replies received."
+)
+DISCOVERED_LOGGERS = Gauge(
+    "ginlong_discovered_loggers", "Loggers currently known to LAN discovery."
+)
+HISTORY_WRITTEN = Counter(
+    "ginlong_history_rows_written_total", "Reports written to the history."
+)
+HISTORY_DROPPED = Counter(
+    "ginlong_history_rows_dropped_total",
+    "Reports not written to the history because it fell behind or failed.",
+)
+WORKER_REPORTS_DROPPED = Counter(
+    "ginlong_worker_reports_dropped_total",
+    "Reports a listener worker dropped because the bridge process fell behind.",
+)
+WORKER_RESTARTS = Counter(
+    "ginlong_worker_restarts_total", "Listener worker processes restarted."
+)
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        method, _, rest = request.decode("latin-1").partition(" ")
+        path = rest.partition(" ")[0].partition("?")[0]
+        if method != "GET":
+            status, body = "405 Method Not Allowed", b""
+        elif path == "/metrics":
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b""
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, TimeoutError):
+        pass
+    except ConnectionError as error:
+        LOGGER.debug("Metrics client disconnected: %s", error)
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.Server:
+    return await asyncio.start_server(_serve, host, port)
@@ -0,0 +1,219 @@
+"""Concurrent scheduling of legacy V4 status polls across many loggers."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import random
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+
+from .metrics import POLL_FAILURES, POLL_SECONDS
+from .v4 import MAX_LOGGER_SERIAL, V4Session, request_v4_status
+
+LOGGER = logging.getLogger(__name__)
+POLL_ERRORS = (OSError, TimeoutError, asyncio.IncompleteReadError)
+
+
+@dataclass(frozen=True)
+class PollTarget:
+    host: str
+    port: int
+    logger_serial: int
+
+    def __str__(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+def parse_poll_target(value: str, default_port: int) -> PollTarget:
+    """Parse a ``SERIAL@HOST[:PORT]`` legacy V4 poll target."""
+    serial_text, separator, address = value.partition("@")
+    if not separator or not address:
+        raise ValueError(f"invalid poll target {value!r}; use SERIAL@HOST[:PORT]")
+    host, _, port_text = address.rpartition(":")
+    if not host or "]" in port_text:
+        host, port_text = address, ""
+    try:
+        logger_serial = int(serial_text)
+        port = int(port_text) if port_text else default_port
+    except ValueError as error:
+        raise ValueError(f"invalid poll target {value!r}: {error}") from error
+    if not 0 <= logger_serial <= MAX_LOGGER_SERIAL:
+        raise ValueError(f"invalid poll target {value!r}: serial out of range")
+    return PollTarget(host.strip("[]"), port, logger_serial)
+
+
+RequestStatus = Callable[[PollTarget, float], Awaitable[bytes]]
+
+
+async def request_target_status(target: PollTarget, timeout: float) -> bytes:
+    return await request_v4_status(
+        target.host, target.port, target.logger_serial, timeout
+    )
+
+
+class V4SessionPool:
+    """Request statuses over one persistent :class:`V4Session` per target."""
+
+    def __init__(self, *, max_idle: float = 300) -> None:
+        self.max_idle = max_idle
+        self.sessions: dict[PollTarget, V4Session] = {}
+
+    async def request(self, target: PollTarget, timeout: float) -> bytes:
+        session = self.sessions.get(target)
+        if session is None:
+            session = self.sessions[target] = V4Session(
+                target.host,
+                target.port,
+                target.logger_serial,
+                max_idle=self.max_idle,
+            )
+        return await session.request(timeout)
+
+    def retain(self, targets: Iterable[PollTarget]) -> None:
+        """Drop sessions of targets that are no longer polled."""
+        keep = set(targets)
+        for target in [target for target in self.sessions if target not in keep]:
+            self.sessions.pop(target).discard()
+
+    async def close(self) -> None:
+        await asyncio.gather(
+            *(session.close() for session in self.sessions.values())
+        )
+        self.sessions.clear()
+
+
+class V4Poller:
+    """Poll many loggers from one task without letting them align or block.
+
+    Each target starts at a random offset within the interval and drifts by
+    up to ``jitter`` of the interval per poll, so a fleet does not poll in
+    bursts. At most ``concurrency`` polls run at once, each bounded by
+    ``timeout`` so a slow logger cannot hold a slot past its next deadline.
+    Failing targets back off exponentially up to ``max_backoff`` seconds.
+    :meth:`set_targets` replaces the targets while running; new ones are
+    polled promptly and removed ones are dropped from the schedule.
+    """
+
+    def __init__(
+        self,
+        targets: Iterable[PollTarget],
+        interval: float,
+        on_frame: Callable[[bytes, str], object],
+        *,
+        concurrency: int = 16,
+        jitter: float = 0.1,
+        max_backoff: float = 900,
+        timeout: float = 10,
+        request: RequestStatus = request_target_status,
+    ) -> None:
+        self.interval = interval
+        self.on_frame = on_frame
+        self.jitter = jitter
+        self.max_backoff = max(max_backoff, interval)
+        self.timeout = min(timeout, interval)
+        self.request = request
+        self.failures: dict[PollTarget, int] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._order = itertools.count()
+        self._schedule: list[tuple[float, int, PollTarget]] = []
+        # Only the latest schedule entry of each target is acted upon.
+        self._live: dict[PollTarget, int] = {}
+        self._running: dict[PollTarget, asyncio.Task[None]] = {}
+        self._changed = asyncio.Event()
+        self._targets = dict.fromkeys(targets)
+        self._started = False
+
+    def _push(self, due: float, target: PollTarget) -> None:
+        order = self._live[target] = next(self._order)
+        heapq.heappush(self._schedule, (due, order, target))
+        self._changed.set()
+
+    def set_targets(self, targets: Iterable[PollTarget]) -> None:
+        targets = dict.fromkeys(targets)
+        added = [target for target in targets if target not in self._targets]
+        for target in self._targets.keys() - targets.keys():
+            self.failures.pop(target, None)
+            self._live.pop(target, None)
+        self._targets = targets
+        if not self._started:
+            return
+        now = asyncio.get_running_loop().time()
+        for target in added:
+            self._push(now + random.uniform(0, self.jitter * self.interval), target)
+        # Wake the scheduler so it drops removed targets and sees new ones.
+        self._changed.set()
+
+    def _next_delay(self, target: PollTarget) -> float:
+        failures = self.failures.get(target, 0)
+        if failures:
+            return min(self.interval * 2**failures, self.max_backoff)
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._started = True
+        for target in self._targets:
+            self._push(now + random.uniform(0, self.interval), target)
+        try:
+            while True:
+                self._changed.clear()
+                if not self._schedule:
+                    await self._changed.wait()
+                    continue
+                due, order, target = self._schedule[0]
+                delay = due - loop.time()
+                if delay > 0:
+                    # Wake early if a finished poll schedules an earlier one.
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(self._changed.wait(), delay)
+                    continue
+                heapq.heappop(self._schedule)
+                if self._live.get(target) != order or target in self._running:
+                    continue
+                del self._live[target]
+                await self._slots.acquire()
+                self._running[target] = asyncio.create_task(
+                    self._poll(target), name=f"legacy-v4-poll-{target}"
+                )
+        finally:
+            for task in self._running.values():
+                task.cancel()
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def _poll(self, target: PollTarget) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            raw_data = await asyncio.wait_for(
+                self.request(target, self.timeout), self.timeout
+            )
+        except POLL_ERRORS as error:
+            POLL_FAILURES.inc(str(target))
+            failures = self.failures.get(target, 0) + 1
+            self.failures[target] = failures
+            delay = self._next_delay(target)
+            LOGGER.warning(
+                "Legacy V4 poll of %s failed (%d in a row): %s; retrying in %.0fs",
+                target,
+                failures,
+                error,
+                delay,
+            )
+        else:
+            POLL_SECONDS.observe(loop.time() - started, str(target))
+            self.failures.pop(target, None)
+            delay = self._next_delay(target)
+            self.on_frame(raw_data, f"poll {target}")
+        finally:
+            self._slots.release()
+            del self._running[target]
+        if target not in self._targets:
+            return
+        # Schedule from the start of the poll so its duration does not drift
+        # the interval, but never into the past after a slow poll.
+        self._push(max(started + delay, loop.time()), target)
@@ -0,0 +1,190 @@
+"""Incremental per-inverter rollups of received reports.
+
+Every report updates a running minimum, maximum, sum and last value of each
+field in the current 1-minute and 15-minute window of its inverter, so a
+window costs the same memory however many reports it covers. Windows are
+aligned to wall-clock time and closed once their end has passed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+from .decoder import FIELD_NAMES, InverterReport
+from .discovery import SENSORS
+from .speedups import dumps
+
+ROLLUP_PERIODS = (("1m", 60), ("15m", 900))
+ROLLUP_FIELDS = tuple(sensor.key for sensor in SENSORS)
+# Energy counters whose increase over each window is published.
+COUNTER_FIELDS = ("kwh_total", "kwh_day")
+# Closed rollups kept while the publisher is disconnected.
+MAX_READY = 10_000
+
+_POSITIONS = tuple(FIELD_NAMES.index(name) for name in ROLLUP_FIELDS)
+_COUNTER_POSITIONS = tuple(FIELD_NAMES.index(name) for name in COUNTER_FIELDS)
+
+
+class RollupMessage(NamedTuple):
+    """One closed window, ready to publish."""
+
+    topic: str
+    payload: str
+
+
+def rollup_topic(state_topic: str, label: str) -> str:
+    return f"{state_topic}/rollup/{label}"
+
+
+class RollupWindow:
+    """Running statistics of one inverter over one window."""
+
+    __slots__ = ("start", "count", "minimum", "maximum", "total", "last", "deltas")
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.count = 0
+        size = len(ROLLUP_FIELDS)
+        self.minimum = [0] * size
+        self.maximum = [0] * size
+        self.total = [0] * size
+        self.last = [0] * size
+        self.deltas = [0] * len(COUNTER_FIELDS)
+
+    def add(self, values: tuple[int, ...], deltas: tuple[int, ...]) -> None:
+        first = self.count == 0
+        self.count += 1
+        for index, position in enumerate(_POSITIONS):
+            value = values[position]
+            if first or value < self.minimum[index]:
+                self.minimum[index] = value
+            if first or value > self.maximum[index]:
+                self.maximum[index] = value
+            self.total[index] += value
+            self.last[index] = value
+        for index, delta in enumerate(deltas):
+            self.deltas[index] += delta
+
+    def payload(self, inverter_serial: str, period: int) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "inverter_serial": inverter_serial,
+            "period": period,
+            "start": self.start,
+            "end": self.start + period,
+            "samples": self.count,
+        }
+        for index, name in enumerate(ROLLUP_FIELDS):
+            payload[name] = {
+                "min": self.minimum[index],
+                "max": self.maximum[index],
+                "mean": round(self.total[index] / self.count, 3),
+                "last": self.last[index],
+            }
+        for index, name in enumerate(COUNTER_FIELDS):
+            payload[f"{name}_delta"] = self.deltas[index]
+        return payload
+
+
+class RollupAggregator:
+    """Fold reports into per-inverter windows and queue the closed ones.
+
+    ``route`` maps a report to the client ID of its state topic, as the
+    store does. Counter deltas are the sum of increases between consecutive
+    reports of an inverter, credited to the window of the later report; a
+    decrease is taken as a counter reset and adds nothing.
+    """
+
+    def __init__(
+        self,
+        route: Callable[[InverterReport], str],
+        topic: Callable[[str], str],
+        *,
+        periods: tuple[tuple[str, int], ...] = ROLLUP_PERIODS,
+    ) -> None:
+        self.route = route
+        self.topic = topic
+        self.periods = periods
+        self.dropped = 0
+        self._windows: dict[tuple[str, int], tuple[str, RollupWindow]] = {}
+        self._counters: dict[str, tuple[int, ...]] = {}
+        self._ready: deque[RollupMessage] = deque()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def add(self, report: InverterReport, timestamp: float | None = None) -> None:
+        now = time.time() if timestamp is None else timestamp
+        client_id = self.route(report)
+        values = report.field_values()
+        counters = tuple(values[position] for position in _COUNTER_POSITIONS)
+        previous = self._counters.get(client_id)
+        self._counters[client_id] = counters
+        deltas = (
+            tuple(max(new - old, 0) for new, old in zip(counters, previous))
+            if previous is not None
+            else (0,) * len(counters)
+        )
+        for index, (_, period) in enumerate(self.periods):
+            start = int(now // period) * period
+            key = (client_id, index)
+            current = self._windows.get(key)
+            if current is None or current[1].start != start:
+                if current is not None:
+                    self._close(client_id, index, *current)
+                current = self._windows[key] = (
+                    report.inverter_serial,
+                    RollupWindow(start),
+                )
+            current[1].add(values, deltas)
+
+    def close_expired(self, now: float | None = None) -> None:
+        """Close every window whose end has passed."""
+        now = time.time() if now is None else now
+        for key, (serial, window) in list(self._windows.items()):
+            client_id, index = key
+            if window.start + self.periods[index][1] <= now:
+                del self._windows[key]
+                self._close(client_id, index, serial, window)
+
+    def _close(
+        self, client_id: str, index: int, serial: str, window: RollupWindow
+    ) -> None:
+        label, period = self.periods[index]
+        if len(self._ready) >= MAX_READY:
+            self._ready.popleft()
+            self.dropped += 1
+        self._ready.append(
+            RollupMessage(
+                rollup_topic(self.topic(client_id), label),
+                dumps(window.payload(serial, period)),
+            )
+        )
+        self._wakeup.set()
+
+    def drain(self) -> list[RollupMessage]:
+        """Take every closed rollup as topic/payload pairs."""
+        messages = list(self._ready)
+        self._ready.clear()
+        return messages
+
+    def restore(self, messages: list[RollupMessage]) -> None:
+        """Put back rollups that could not be published."""
+        self._ready.extendleft(reversed(messages))
+        self._wakeup.set()
+
+    async def get(self, tick: float = 1.0) -> list[RollupMessage]:
+        """Wait for closed windows, checking for expired ones every ``tick``."""
+        while True:
+            self.close_expired()
+            if self._ready:
+                return self.drain()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), tick)
+            except TimeoutError:
+                pass
@@ -0,0 +1,111 @@
+"""Engineering values scaled from raw report fields, computed in the bridge.
+
+The tables below are the single description of how raw register values map
+to published units, so consumers can read ``value_json.<key>`` directly
+instead of rendering a scaling template for every message.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
+from typing import Any
+
+from .decoder import InverterReport
+from .speedups import dumps
+
+ScaledValue = int | float | None
+
+
+@dataclass(frozen=True)
+class Scale:
+    key: str
+    source: str
+    divisor: int
+    digits: int
+
+
+@dataclass(frozen=True)
+class Derived:
+    key: str
+    sources: tuple[str, ...]
+    function: Callable[..., ScaledValue]
+    digits: int
+
+
+def _efficiency(ac_power: float, dc_power: float) -> float | None:
+    return ac_power / dc_power * 100 if dc_power > 0 else None
+
+
+SCALES = (
+    Scale("power", "watt_now", 1, 0),
+    Scale("temperature", "temp", 10, 1),
+    Scale("dc_voltage1", "dc_volts1", 10, 1),
+    Scale("dc_current1", "dc_amps1", 10, 1),
+    Scale("dc_voltage2", "dc_volts2", 10, 1),
+    Scale("dc_current2", "dc_amps2", 10, 1),
+    Scale("dc_voltage3", "dc_volts3", 10, 1),
+    Scale("dc_current3", "dc_amps3", 10, 1),
+    Scale("ac_voltage1", "ac_volts1", 10, 1),
+    Scale("ac_current1", "ac_amps1", 10, 1),
+    Scale("ac_voltage2", "ac_volts2", 10, 1),
+    Scale("ac_current2", "ac_amps2", 10, 1),
+    Scale("ac_voltage3", "ac_volts3", 10, 1),
+    Scale("ac_current3", "ac_amps3", 10, 1),
+    Scale("ac_frequency", "ac_freq", 100, 2),
+    Scale("energy_today", "kwh_day", 100, 2),
+    Scale("energy_yesterday", "kwh_yesterday", 100, 2),
+    Scale("energy_total", "kwh_total", 10, 1),
+    Scale("energy_this_month", "kwh_month", 1, 0),
+    Scale("energy_last_month", "kwh_lastmonth", 1, 0),
+)
+# Derived values are computed in order from scaled and earlier derived keys.
+DERIVED = (
+    Derived("dc_power1", ("dc_voltage1", "dc_current1"), lambda v, a: v * a, 1),
+    Derived("dc_power2", ("dc_voltage2", "dc_current2"), lambda v, a: v * a, 1),
+    Derived("dc_power3", ("dc_voltage3", "dc_current3"), lambda v, a: v * a, 1),
+    Derived("dc_power", ("dc_power1", "dc_power2", "dc_power3"), lambda *p: sum(p), 1),
+    Derived("efficiency", ("power", "dc_power"), _efficiency, 1),
+)
+
+
+def _raw_sources() -> dict[str, frozenset[str]]:
+    sources = {scale.key: frozenset((scale.source,)) for scale in SCALES}
+    for derived in DERIVED:
+        sources[derived.key] = frozenset().union(
+            *(sources[source] for source in derived.sources)
+        )
+    return sources
+
+
+# The raw fields each scaled or derived key depends on.
+RAW_SOURCES = _raw_sources()
+
+
+def scaled_values(
+    report: InverterReport, changed: Collection[str] | None = None
+) -> dict[str, ScaledValue]:
+    """Scale a report, or only the keys that depend on ``changed`` raw fields."""
+    values: dict[str, ScaledValue] = {}
+    for scale in SCALES:
+        raw = report[scale.source]
+        values[scale.key] = (
+            raw if scale.divisor == 1 else round(raw / scale.divisor, scale.digits)
+        )
+    for derived in DERIVED:
+        inputs = [values[source] for source in derived.sources]
+        value = None if None in inputs else derived.function(*inputs)
+        values[derived.key] = None if value is None else round(value, derived.digits)
+    if changed is None:
+        return values
+    return {
+        key: value
+        for key, value in values.items()
+        if not RAW_SOURCES[key].isdisjoint(changed)
+    }
+
+
+def state_json(report: InverterReport) -> str:
+    """Serialise the legacy raw state followed by the scaled values."""
+    scaled: dict[str, Any] = scaled_values(report)
+    return f"{report.to_json()[:-1]},{dumps(scaled)[1:]}"
@@ -0,0 +1,292 @@
+"""Simulated WiFi sticks for local load testing of the bridge.
+
+A single asyncio process can run thousands of devices: pushed reports share
+one UDP socket or use one TCP connection per device, and one V4 port and one
+discovery socket answer for every simulated logger by its serial.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import random
+import socket
+import time
+from collections.abc import Mapping, Sequence
+from typing import cast
+
+from .decoder import (
+    DATA_LENGTH,
+    END_CODE,
+    FIELD_NAMES,
+    FRAME_SIZE,
+    HEADCODE,
+    INVERTER_DATA_OFFSET,
+    INVERTER_SERIAL_OFFSET,
+    INVERTER_VALUES,
+)
+from .lan_discovery import DISCOVERY_MESSAGE
+from .v4 import create_v4_status_request
+
+LOGGER = logging.getLogger(__name__)
+REPORT_CONTROL_CODE = b"\x51\xb0"
+V4_REQUEST_SIZE = len(create_v4_status_request(0))
+
+
+def encode_frame(
+    inverter_serial: str,
+    values: Mapping[str, int],
+    *,
+    logger_serial: int = 0,
+) -> bytes:
+    """Build a checksummed report frame; fields missing from values are zero."""
+    frame = bytearray(FRAME_SIZE)
+    frame[0] = HEADCODE
+    frame[1] = DATA_LENGTH
+    frame[2:4] = REPORT_CONTROL_CODE
+    frame[4:8] = frame[8:12] = logger_serial.to_bytes(4, "little")
+    frame[INVERTER_SERIAL_OFFSET:INVERTER_DATA_OFFSET] = inverter_serial.encode(
+        "ascii"
+    ).ljust(16, b"\x00")
+    INVERTER_VALUES.pack_into(
+        frame,
+        INVERTER_DATA_OFFSET,
+        *(values.get(name, 0) for name in FIELD_NAMES),
+    )
+    frame[-2] = sum(frame[1:-2]) & 0xFF
+    frame[-1] = END_CODE
+    return bytes(frame)
+
+
+class SimulatedInverter:
+    """One inverter behind one logger, producing a plausible solar day.
+
+    Power follows a sine between 06:00 and 18:00 local time with random
+    cloud dips, and the energy counters integrate it between samples, rolling
+    the daily yield over at midnight.
+    """
+
+    def __init__(
+        self,
+        inverter_serial: str,
+        logger_serial: int,
+        mac_address: str,
+        *,
+        rated_watts: int = 5000,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.inverter_serial = inverter_serial
+        self.logger_serial = logger_serial
+        self.mac_address = mac_address
+        self.rated_watts = rated_watts
+        self.rng = rng or random.Random()
+        self.kwh_total = self.rng.uniform(1000, 20000)
+        self.kwh_day = 0.0
+        self.kwh_yesterday = self.rng.uniform(5, 30)
+        self._day: int | None = None
+        self._sampled_at: float | None = None
+
+    def values(self, now: float) -> dict[str, int]:
+        local = time.localtime(now)
+        if self._day is not None and local.tm_yday != self._day:
+            self.kwh_yesterday, self.kwh_day = self.kwh_day, 0.0
+        self._day = local.tm_yday
+
+        hour = local.tm_hour + local.tm_min / 60 + local.tm_sec / 3600
+        sun = max(math.sin(math.pi * (hour - 6) / 12), 0.0)
+        clouds = 1 - 0.6 * self.rng.random() ** 4
+        watts = self.rated_watts * sun * clouds
+        if self._sampled_at is not None:
+            energy = watts * max(now - self._sampled_at, 0) / 3_600_000
+            self.kwh_day += energy
+            self.kwh_total += energy
+        self._sampled_at = now
+
+        dc_volts = (280 + 60 * sun + self.rng.uniform(-5, 5)) if sun else 0.0
+        ac_volts = 230 + self.rng.uniform(-3, 3)
+        string_watts = watts / 2
+        return {
+            "temp": round((25 + 30 * sun + self.rng.uniform(-1, 1)) * 10),
+            "dc_volts1": round(dc_volts * 10),
+            "dc_volts2": round(dc_volts * 10),
+            "dc_amps1": round(string_watts / dc_volts * 10) if dc_volts else 0,
+            "dc_amps2": round(string_watts / dc_volts * 10) if dc_volts else 0,
+            "ac_amps1": round(watts / ac_volts * 10),
+            "ac_volts1": round(ac_volts * 10),
+            "ac_freq": round((50 + self.rng.uniform(-0.05, 0.05)) * 100),
+            "watt_now": round(watts),
+            "kwh_yesterday": round(self.kwh_yesterday * 100),
+            "kwh_day": round(self.kwh_day * 100),
+            "kwh_total": round(self.kwh_total * 10),
+            # Monthly yields are estimated from yesterday's.
+            "kwh_month": round(self.kwh_day + self.kwh_yesterday * (local.tm_mday - 1)),
+            "kwh_lastmonth": round(self.kwh_yesterday * 30),
+        }
+
+    def frame(self, now: float | None = None) -> bytes:
+        return encode_frame(
+            self.inverter_serial,
+            self.values(time.time() if now is None else now),
+            logger_serial=self.logger_serial,
+        )
+
+
+def simulated_fleet(
+    count: int, *, first_logger_serial: int = 1_000_000_000, seed: int | None = None
+) -> list[SimulatedInverter]:
+    rng = random.Random(seed)
+    return [
+        SimulatedInverter(
+            f"SIM{index:07d}",
+            first_logger_serial + index,
+            # Locally administered addresses cannot clash with real sticks.
+            f"02{index:010X}",
+            rated_watts=rng.choice((3000, 5000, 8000, 10000)),
+            rng=random.Random(rng.random()),
+        )
+        for index in range(count)
+    ]
+
+
+async def push_tcp(
+    device: SimulatedInverter, host: str, port: int, interval: float
+) -> None:
+    """Send a report every interval over one persistent connection."""
+    await asyncio.sleep(random.uniform(0, interval))
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError as error:
+            LOGGER.debug("%s cannot connect: %s", device.inverter_serial, error)
+            await asyncio.sleep(interval)
+            continue
+        try:
+            while True:
+                writer.write(device.frame())
+                await writer.drain()
+                await asyncio.sleep(interval)
+        except OSError as error:
+            LOGGER.debug("%s lost its connection: %s", device.inverter_serial, error)
+        finally:
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+
+async def push_udp(
+    transport: asyncio.DatagramTransport,
+    device: SimulatedInverter,
+    address: tuple[str, int],
+    interval: float,
+) -> None:
+    await asyncio.sleep(random.uniform(0, interval))
+    while True:
+        transport.sendto(device.frame(), address)
+        await asyncio.sleep(interval)
+
+
+async def start_v4_responder(
+    devices: Sequence[SimulatedInverter], host: str, port: int
+) -> asyncio.Server:
+    """Answer legacy V4 status requests for every device by logger serial."""
+    by_serial = {device.logger_serial: device for device in devices}
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await reader.readexactly(V4_REQUEST_SIZE)
+                logger_serial = int.from_bytes(request[4:8], "little")
+                device = by_serial.get(logger_serial)
+                if request != create_v4_status_request(logger_serial) or not device:
+                    break
+                writer.write(device.frame())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve, host, port)
+
+
+class DiscoveryResponder(asyncio.DatagramProtocol):
+    """Reply to the discovery broadcast once for every simulated logger."""
+
+    def __init__(self, devices: Sequence[SimulatedInverter], ip_address: str) -> None:
+        self.replies = [
+            f"{ip_address},{device.mac_address},{device.logger_serial}".encode()
+            for device in devices
+        ]
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = cast(asyncio.DatagramTransport, transport)
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        if data.strip() != DISCOVERY_MESSAGE or self.transport is None:
+            return
+        for reply in self.replies:
+            self.transport.sendto(reply, addr)
+
+
+async def run_simulator(
+    devices: Sequence[SimulatedInverter],
+    *,
+    protocol: str = "tcp",
+    target_address: str = "127.0.0.1",
+    target_port: int = 9999,
+    interval: float = 360,
+    bind_address: str = "127.0.0.1",
+    v4_port: int | None = None,
+    discovery_port: int | None = None,
+) -> None:
+    """Push reports from every device and serve polls and discovery."""
+    loop = asyncio.get_running_loop()
+    closers: list[asyncio.Server | asyncio.BaseTransport] = []
+    tasks: list[asyncio.Task[None]] = []
+    try:
+        if v4_port is not None:
+            closers.append(await start_v4_responder(devices, bind_address, v4_port))
+            LOGGER.info("Answering V4 polls on %s:%d", bind_address, v4_port)
+        if discovery_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: DiscoveryResponder(devices, bind_address),
+                local_addr=(bind_address, discovery_port),
+            )
+            closers.append(transport)
+            LOGGER.info("Answering discovery on %s:%d", bind_address, discovery_port)
+        if protocol == "udp":
+            sender, _ = await loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, family=socket.AF_INET
+            )
+            closers.append(sender)
+            address = (target_address, target_port)
+            tasks.extend(
+                asyncio.create_task(push_udp(sender, device, address, interval))
+                for device in devices
+            )
+        elif protocol == "tcp":
+            tasks.extend(
+                asyncio.create_task(
+                    push_tcp(device, target_address, target_port, interval)
+                )
+                for device in devices
+            )
+        if tasks:
+            LOGGER.info(
+                "Pushing %d devices over %s to %s:%d, %.1f reports/s",
+                len(devices),
+                protocol.upper(),
+                target_address,
+                target_port,
+                len(devices) / interval,
+            )
+        await asyncio.Future()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for closer in closers:
+            closer.close()
@@ -0,0 +1,108 @@
+"""Optional faster event loop and JSON encoder backends.
+
+Neither backend is a dependency: ``auto`` picks uvloop, orjson or msgspec
+when they are installed, and a backend that cannot be imported falls back to
+the standard library without complaint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import Callable, Coroutine
+from typing import Any, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+EVENT_LOOPS = ("auto", "asyncio", "uvloop")
+JSON_ENCODERS = ("auto", "json", "orjson", "msgspec")
+
+T = TypeVar("T")
+Encoder = Callable[[Any, bool], str]
+
+
+def _json_encoder() -> Encoder:
+    def dumps(value: Any, sort_keys: bool) -> str:
+        return json.dumps(value, separators=(",", ":"), sort_keys=sort_keys)
+
+    return dumps
+
+
+def _orjson_encoder() -> Encoder:
+    import orjson
+
+    def dumps(value: Any, sort_keys: bool) -> str:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(value, option=option).decode()
+
+    return dumps
+
+
+def _msgspec_encoder() -> Encoder:
+    import msgspec
+
+    plain = msgspec.json.Encoder()
+    ordered = msgspec.json.Encoder(order="sorted")
+
+    def dumps(value: Any, sort_keys: bool) -> str:
+        return (ordered if sort_keys else plain).encode(value).decode()
+
+    return dumps
+
+
+_ENCODERS: dict[str, Callable[[], Encoder]] = {
+    "orjson": _orjson_encoder,
+    "msgspec": _msgspec_encoder,
+    "json": _json_encoder,
+}
+_dumps: Encoder = _json_encoder()
+json_encoder = "json"
+
+
+def select_json_encoder(name: str) -> str:
+    """Use the named encoder for MQTT payloads and return the one in use."""
+    global _dumps, json_encoder
+    candidates = ("orjson", "msgspec", "json") if name == "auto" else (name, "json")
+    for candidate in candidates:
+        try:
+            encoder = _ENCODERS[candidate]()
+        except ImportError:
+            LOGGER.debug("JSON encoder %s is not installed", candidate)
+            continue
+        _dumps, json_encoder = encoder, candidate
+        break
+    return json_encoder
+
+
+def dumps(value: Any, *, sort_keys: bool = False) -> str:
+    """Serialise to compact JSON with the selected encoder."""
+    return _dumps(value, sort_keys)
+
+
+def event_loop_factory(
+    name: str,
+) -> tuple[str, Callable[[], asyncio.AbstractEventLoop] | None]:
+    """Return the event loop that ``name`` resolves to and its factory."""
+    if name != "asyncio":
+        try:
+            import uvloop
+        except ImportError:
+            LOGGER.debug("uvloop is not installed")
+        else:
+            return "uvloop", uvloop.new_event_loop
+    return "asyncio", None
+
+
+def run_in_loop(
+    main: Coroutine[Any, Any, T],
+    loop_factory: Callable[[], asyncio.AbstractEventLoop] | None = None,
+) -> T:
+    """Run ``main`` to completion like :func:`asyncio.run` on a resolved loop."""
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(main)
+
+
+def run_event_loop(main: Coroutine[Any, Any, T], event_loop: str = "auto") -> T:
+    """Run ``main`` to completion like :func:`asyncio.run` on the chosen loop."""
+    _, factory = event_loop_factory(event_loop)
+    return run_in_loop(main, factory)
@@ -0,0 +1,220 @@
+"""Per-inverter report buffering between receivers and the MQTT publisher."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+from .decoder import DecodeError, InverterReport, decode_inverter_report
+from .metrics import BACKLOG_DROPPED, REPORTS_SUPERSEDED
+
+LOGGER = logging.getLogger(__name__)
+SPILL_READ_BATCH = 256
+SPILL_SCAN_SIZE = 4096
+
+_UNSAFE_TOPIC_CHARACTERS = re.compile(r"[^0-9A-Za-z_-]+")
+
+
+def serial_client_id(inverter_serial: str) -> str:
+    """Derive an MQTT-safe client ID from a decoded inverter serial."""
+    client_id = _UNSAFE_TOPIC_CHARACTERS.sub("_", inverter_serial).strip("_")
+    return client_id or "unknown"
+
+
+class ReportSink(Protocol):
+    """Where receivers hand decoded reports: a store or a worker's forwarder."""
+
+    def put(self, report: InverterReport) -> None: ...
+
+
+class ReportRecorder(Protocol):
+    def add(self, report: InverterReport) -> None: ...
+
+
+class RecordingSink:
+    """Report sink that shows each report to recorders, then passes it on."""
+
+    def __init__(self, sink: ReportSink, *recorders: ReportRecorder) -> None:
+        self.sink = sink
+        self.recorders = recorders
+
+    def put(self, report: InverterReport) -> None:
+        for recorder in self.recorders:
+            recorder.add(report)
+        self.sink.put(report)
+
+
+class LatestReports:
+    """Keep the latest undelivered report for each inverter.
+
+    With a fixed ``client_id`` every report shares one slot, which matches the
+    single-inverter bridge. Without one, reports are routed by their decoded
+    inverter serial so that a fleet of sticks cannot overwrite each other.
+
+    By default a newer report replaces an undelivered one. With a
+    ``backlog_size`` the replaced reports are kept instead, oldest first, and
+    once that many are held in memory the oldest spill to an append-only
+    ``spill_path`` segment of at most ``spill_limit`` bytes. :meth:`get` hands
+    out the backlog in order, read back from disk in bulk, before any live
+    report, so a reconnecting publisher catches up without gaps.
+
+    Once :meth:`finish` is called, :meth:`get` raises
+    :class:`asyncio.QueueEmpty` instead of waiting when nothing is left.
+    """
+
+    def __init__(
+        self,
+        client_id: str | None = None,
+        *,
+        backlog_size: int = 0,
+        spill_path: Path | None = None,
+        spill_limit: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.client_id = client_id
+        self.backlog_size = backlog_size
+        self.spill_limit = spill_limit
+        self.dropped = 0
+        self.finished = False
+        self._pending: dict[str, InverterReport] = {}
+        self._backlog: deque[tuple[str, InverterReport]] = deque()
+        self._replay: deque[tuple[str, InverterReport]] = deque()
+        self._ready = asyncio.Event()
+        self._spill: BinaryIO | None = None
+        self._spill_offset = 0
+        if spill_path is not None:
+            # A segment left by a previous run is replayed before new reports.
+            self._spill = spill_path.open("a+b")
+            torn = _drop_partial_record(self._spill)
+            if torn:
+                LOGGER.warning(
+                    "Dropped a %d-byte partial record from %s", torn, spill_path
+                )
+            if self._spill.tell():
+                self._ready.set()
+
+    def __len__(self) -> int:
+        return len(self._replay) + len(self._backlog) + len(self._pending)
+
+    @property
+    def spilled_bytes(self) -> int:
+        if self._spill is None:
+            return 0
+        return self._spill.seek(0, 2) - self._spill_offset
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def route(self, report: InverterReport) -> str:
+        if self.client_id is not None:
+            return self.client_id
+        return serial_client_id(report.inverter_serial)
+
+    def put(self, report: InverterReport) -> str:
+        client_id = self.route(report)
+        # Re-inserting moves the inverter to the back, so a chatty stick cannot
+        # starve the others while the publisher catches up.
+        replaced = self._pending.pop(client_id, None)
+        self._pending[client_id] = report
+        if replaced is not None:
+            if self.backlog_size > 0:
+                self._backlog.append((client_id, replaced))
+                if len(self._backlog) > self.backlog_size:
+                    self._spill_oldest()
+            else:
+                REPORTS_SUPERSEDED.inc()
+        self._ready.set()
+        return client_id
+
+    def restore(self, client_id: str, report: InverterReport) -> None:
+        """Return an unpublished report to the front of the line."""
+        self._replay.appendleft((client_id, report))
+        self._ready.set()
+
+    def finish(self) -> None:
+        """Mark the input as complete, as at the end of a replay."""
+        self.finished = True
+        self._ready.set()
+
+    def get_nowait(self) -> tuple[str, InverterReport]:
+        if not self._replay and self.spilled_bytes:
+            self._read_spill()
+        if self._replay:
+            return self._replay.popleft()
+        if self._backlog:
+            return self._backlog.popleft()
+        if not self._pending:
+            raise asyncio.QueueEmpty
+        client_id = next(iter(self._pending))
+        return client_id, self._pending.pop(client_id)
+
+    async def get(self) -> tuple[str, InverterReport]:
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                if self.finished:
+                    raise
+                self._ready.clear()
+            await self._ready.wait()
+
+    def _spill_oldest(self) -> None:
+        client_id, report = self._backlog.popleft()
+        if self._spill is None:
+            self.dropped += 1
+            BACKLOG_DROPPED.inc()
+            return
+        record = f"{client_id}\t{report.hex()}\n".encode()
+        if self.spilled_bytes + len(record) > self.spill_limit:
+            self.dropped += 1
+            BACKLOG_DROPPED.inc()
+            LOGGER.warning("Backlog spill file is full; dropped a report")
+            return
+        self._spill.write(record)
+        self._spill.flush()
+
+    def _read_spill(self) -> None:
+        assert self._spill is not None
+        self._spill.seek(self._spill_offset)
+        for _ in range(SPILL_READ_BATCH):
+            line = self._spill.readline()
+            if not line:
+                break
+            try:
+                client_id, _, frame_hex = (
+                    line.decode().rstrip("\n").rpartition("\t")
+                )
+                report = decode_inverter_report(bytes.fromhex(frame_hex))
+            except (DecodeError, ValueError) as error:
+                self.dropped += 1
+                BACKLOG_DROPPED.inc()
+                LOGGER.warning("Skipped a corrupt backlog spill record: %s", error)
+                continue
+            self._replay.append((client_id, report))
+        self._spill_offset = self._spill.tell()
+        if self._spill_offset == self._spill.seek(0, 2):
+            self._spill.truncate(0)
+            self._spill_offset = 0
+
+
+def _drop_partial_record(spill: BinaryIO) -> int:
+    """Cut a record left half-written by a crash; return the bytes removed."""
+    end = position = spill.seek(0, 2)
+    keep = 0
+    while position > 0:
+        start = max(position - SPILL_SCAN_SIZE, 0)
+        spill.seek(start)
+        newline = spill.read(position - start).rfind(b"\n")
+        if newline >= 0:
+            keep = start + newline + 1
+            break
+        position = start
+    if keep < end:
+        spill.truncate(keep)
+    spill.seek(keep)
+    return end - keep
@@ -0,0 +1,75 @@
+"""Per-stage timing of reports from socket receive to MQTT acknowledgement."""
+
+from __future__ import annotations
+
+import logging
+import time
+
+from .metrics import Histogram
+
+LOGGER = logging.getLogger(__name__)
+STAGES = ("decode", "enqueue", "queue", "publish", "total")
+STAGE_BUCKETS = (
+    0.00001,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    30,
+    300,
+)
+STAGE_SECONDS = Histogram(
+    "ginlong_report_stage_seconds",
+    "Time each report spent in a stage between receive and acknowledgement.",
+    ("stage",),
+    STAGE_BUCKETS,
+)
+
+
+class ReportTrace:
+    """Monotonic timestamps of one report as it passes through the bridge.
+
+    ``received`` is when its bytes were read from the socket or poll,
+    ``decoded`` when it was validated, ``enqueued`` when the store accepted
+    it and ``dequeued`` when the publisher took it; completing the trace at
+    the PUBACK of its last message records the time between each of them.
+    """
+
+    __slots__ = ("received", "decoded", "enqueued", "dequeued")
+
+    def __init__(self, received: float, decoded: float) -> None:
+        self.received = received
+        self.decoded = decoded
+        self.enqueued = decoded
+        self.dequeued = decoded
+
+    def stages(self, acknowledged: float) -> dict[str, float]:
+        return {
+            "decode": self.decoded - self.received,
+            "enqueue": self.enqueued - self.decoded,
+            "queue": self.dequeued - self.enqueued,
+            "publish": acknowledged - self.dequeued,
+            "total": acknowledged - self.received,
+        }
+
+    def complete(
+        self, inverter_serial: str, slow_threshold: float | None = None
+    ) -> dict[str, float]:
+        """Record the stage histograms and log the report if it was slow."""
+        stages = self.stages(time.perf_counter())
+        for stage, seconds in stages.items():
+            STAGE_SECONDS.observe(seconds, stage)
+        if slow_threshold is not None and stages["total"] >= slow_threshold:
+            breakdown = " ".join(
+                f"{stage}={seconds:.6f}s" for stage, seconds in stages.items()
+            )
+            LOGGER.warning(
+                "Slow report from inverter %s: %s", inverter_serial, breakdown
+            )
+        return stages
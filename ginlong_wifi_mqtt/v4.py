@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 
 V4_REQUEST_HEADER = bytes.fromhex("680241b1")
 V4_REQUEST_COMMAND = bytes.fromhex("0100")
@@ -28,6 +29,23 @@ def create_v4_status_request(logger_serial: int) -> bytes:
     return bytes(frame)
 
 
+async def _exchange_status(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    logger_serial: int,
+    timeout: float,
+) -> bytes:
+    writer.write(create_v4_status_request(logger_serial))
+    await asyncio.wait_for(writer.drain(), timeout)
+
+    header = await asyncio.wait_for(reader.readexactly(2), timeout)
+    expected_size = header[1] + 14
+    remainder = await asyncio.wait_for(
+        reader.readexactly(expected_size - len(header)), timeout
+    )
+    return header + remainder
+
+
 async def request_v4_status(
     host: str,
     port: int,
@@ -39,15 +57,94 @@ async def request_v4_status(
         asyncio.open_connection(host, port), timeout
     )
     try:
-        writer.write(create_v4_status_request(logger_serial))
-        await asyncio.wait_for(writer.drain(), timeout)
-
-        header = await asyncio.wait_for(reader.readexactly(2), timeout)
-        expected_size = header[1] + 14
-        remainder = await asyncio.wait_for(
-            reader.readexactly(expected_size - len(header)), timeout
-        )
-        return header + remainder
+        return await _exchange_status(reader, writer, logger_serial, timeout)
     finally:
         writer.close()
         await writer.wait_closed()
+
+
+class V4Session:
+    """Reuse one TCP connection for successive status requests to a logger.
+
+    Before each request the connection is checked for an end-of-stream from
+    the stick and for having been idle longer than ``max_idle`` seconds. A
+    reused connection that fails with a reset or end-of-stream is replaced
+    once, transparently; any other failure closes it for the next request.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        logger_serial: int,
+        *,
+        max_idle: float = 300,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.logger_serial = logger_serial
+        self.max_idle = max_idle
+        self.connects = 0
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._last_used = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def _is_stale(self) -> bool:
+        assert self._reader is not None and self._writer is not None
+        idle = asyncio.get_running_loop().time() - self._last_used
+        return (
+            self._reader.at_eof()
+            or self._writer.is_closing()
+            or idle > self.max_idle
+        )
+
+    async def _connect(self, timeout: float) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout
+        )
+        self.connects += 1
+
+    def discard(self) -> None:
+        # Synchronous so that it is safe while a poll is being cancelled.
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def close(self) -> None:
+        writer = self._writer
+        self.discard()
+        if writer is not None:
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+    async def request(self, timeout: float = 10) -> bytes:
+        """Request one status frame over the persistent connection."""
+        if self._writer is not None and self._is_stale():
+            self.discard()
+        reused = self._writer is not None
+        if not reused:
+            await self._connect(timeout)
+        try:
+            return await self._exchange(timeout)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+        # The stick dropped the idle connection since the last poll.
+        await self._connect(timeout)
+        return await self._exchange(timeout)
+
+    async def _exchange(self, timeout: float) -> bytes:
+        assert self._reader is not None and self._writer is not None
+        try:
+            frame = await _exchange_status(
+                self._reader, self._writer, self.logger_serial, timeout
+            )
+        except BaseException:
+            self.discard()
+            raise
+        self._last_used = asyncio.get_running_loop().time()
+        return frame
@@ -0,0 +1,273 @@
+"""Listener worker processes sharing the listen port through SO_REUSEPORT.
+
+Each worker binds the listen port itself, so the kernel spreads connections
+and datagrams across processes that frame and decode on their own cores.
+Validated frames are forwarded with their receive and decode timestamps over
+a Unix socket to the bridge process, which stores and publishes them. The
+listener metrics counted in a worker are sent over the same socket every
+second and added to the bridge's own, so ``/metrics`` covers every worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import struct
+import tempfile
+import time
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .decoder import InverterReport
+from .metrics import (
+    DATAGRAMS_DROPPED,
+    DECODE_FAILURES,
+    FRAME_BYTES,
+    FRAMES_RECEIVED,
+    WORKER_REPORTS_DROPPED,
+    WORKER_RESTARTS,
+)
+from .store import ReportSink
+from .tracing import ReportTrace
+
+if TYPE_CHECKING:
+    from .app import Settings
+
+LOGGER = logging.getLogger(__name__)
+# Record kind, receive time, decode time and body length precede each
+# forwarded frame or metrics update.
+FORWARD_HEADER = struct.Struct("<BddH")
+REPORT_RECORD = 0
+METRICS_RECORD = 1
+# Metrics counted in the workers, which the bridge process cannot see.
+WORKER_METRICS = {
+    metric.name: metric
+    for metric in (
+        FRAMES_RECEIVED,
+        FRAME_BYTES,
+        DECODE_FAILURES,
+        DATAGRAMS_DROPPED,
+        WORKER_REPORTS_DROPPED,
+    )
+}
+METRICS_INTERVAL = 1.0
+# Bytes a worker may queue for the bridge before it drops reports.
+FORWARD_BUFFER_LIMIT = 1024 * 1024
+RESTART_DELAY = 1.0
+# A worker that exits sooner than this after starting waits before a restart.
+MIN_UPTIME = 10.0
+
+
+class ReportForwarder:
+    """Report sink of a worker that writes reports to the bridge process.
+
+    Reports are dropped and counted while more than ``buffer_limit`` bytes
+    wait to be written, so a stalled bridge cannot exhaust a worker's memory.
+    """
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, buffer_limit: int = FORWARD_BUFFER_LIMIT
+    ) -> None:
+        self.writer = writer
+        self.buffer_limit = buffer_limit
+        self.dropped = 0
+
+    def put(self, report: InverterReport) -> None:
+        if self.writer.transport.get_write_buffer_size() > self.buffer_limit:
+            self.dropped += 1
+            WORKER_REPORTS_DROPPED.inc()
+            return
+        trace = report.trace
+        received = decoded = time.perf_counter()
+        if trace is not None:
+            received, decoded = trace.received, trace.decoded
+        frame = report.frame
+        self.writer.write(
+            FORWARD_HEADER.pack(REPORT_RECORD, received, decoded, len(frame))
+        )
+        self.writer.write(frame)
+
+    def send_metrics(self) -> None:
+        """Send the worker metrics counted since the last call."""
+        taken = {name: metric.take() for name, metric in WORKER_METRICS.items()}
+        if not any(taken.values()):
+            return
+        body = json.dumps(taken, separators=(",", ":")).encode()
+        self.writer.write(FORWARD_HEADER.pack(METRICS_RECORD, 0, 0, len(body)))
+        self.writer.write(body)
+
+
+def merge_worker_metrics(body: bytes) -> None:
+    for name, taken in json.loads(body).items():
+        metric = WORKER_METRICS.get(name)
+        if metric is not None:
+            metric.merge(taken)
+
+
+async def receive_forwarded(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, reports: ReportSink
+) -> int:
+    """Store reports forwarded by one worker until it disconnects."""
+    received = 0
+    try:
+        while True:
+            header = await reader.readexactly(FORWARD_HEADER.size)
+            kind, received_at, decoded_at, size = FORWARD_HEADER.unpack(header)
+            body = await reader.readexactly(size)
+            if kind == METRICS_RECORD:
+                merge_worker_metrics(body)
+                continue
+            # Workers forward only frames that passed validation.
+            report = InverterReport(body)
+            trace = report.trace = ReportTrace(received_at, decoded_at)
+            reports.put(report)
+            trace.enqueued = time.perf_counter()
+            received += 1
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+    return received
+
+
+async def send_metrics(forwarder: ReportForwarder) -> None:
+    try:
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL)
+            forwarder.send_metrics()
+    finally:
+        forwarder.send_metrics()
+
+
+async def run_worker(settings: Settings, socket_path: Path) -> None:
+    from .app import REPORT_LOG, run_listener
+
+    REPORT_LOG.interval = settings.report_log_interval
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    forwarder = ReportForwarder(writer)
+    listener = asyncio.create_task(run_listener(settings, forwarder, reuse_port=True))
+    metrics = asyncio.create_task(send_metrics(forwarder))
+    # The bridge never writes, so end of file means it has gone away.
+    closed = asyncio.create_task(reader.read())
+    try:
+        done, _ = await asyncio.wait(
+            (listener, closed), return_when=asyncio.FIRST_COMPLETED
+        )
+        if listener in done:
+            listener.result()
+        LOGGER.info("Bridge process closed the connection; stopping")
+    finally:
+        listener.cancel()
+        closed.cancel()
+        metrics.cancel()
+        await asyncio.gather(listener, closed, metrics, return_exceptions=True)
+        writer.close()
+
+
+def worker_main(settings: Settings, socket_path: Path, log_level: int) -> None:
+    """Entry point of a spawned worker process."""
+    from .app import LOG_FORMAT
+    from .speedups import run_event_loop
+
+    logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    with contextlib.suppress(KeyboardInterrupt):
+        run_event_loop(run_worker(settings, socket_path), settings.event_loop)
+
+
+class WorkerSupervisor:
+    """Start ``count`` listener workers and restart any that exit.
+
+    Workers are spawned rather than forked so that none inherits the
+    bridge's running event loop, MQTT connection or open sockets.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        count: int,
+        socket_path: Path,
+        *,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self.settings = settings
+        self.count = count
+        self.socket_path = socket_path
+        self.poll_interval = poll_interval
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: list[tuple[BaseProcess, float] | None] = [None] * count
+
+    def _start(self, index: int) -> None:
+        process = self._context.Process(
+            target=worker_main,
+            args=(
+                self.settings,
+                self.socket_path,
+                logging.getLogger().getEffectiveLevel(),
+            ),
+            name=f"ginlong-listener-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[index] = (process, time.monotonic())
+
+    async def run(self) -> None:
+        try:
+            for index in range(self.count):
+                self._start(index)
+            LOGGER.info("Started %d listener workers", self.count)
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                for index, worker in enumerate(self._workers):
+                    if worker is None or worker[0].is_alive():
+                        continue
+                    process, started = worker
+                    LOGGER.warning(
+                        "Listener worker %s exited with code %s; restarting",
+                        process.name,
+                        process.exitcode,
+                    )
+                    process.close()
+                    self._workers[index] = None
+                    if time.monotonic() - started < MIN_UPTIME:
+                        await asyncio.sleep(RESTART_DELAY)
+                    self._start(index)
+                    self.restarts += 1
+                    WORKER_RESTARTS.inc()
+        finally:
+            await asyncio.to_thread(self.stop)
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            if worker is not None and worker[0].is_alive():
+                worker[0].terminate()
+        for worker in self._workers:
+            if worker is not None:
+                worker[0].join(5)
+                if worker[0].is_alive():
+                    worker[0].kill()
+                    worker[0].join()
+
+
+async def run_workers(settings: Settings, reports: ReportSink) -> None:
+    """Accept forwarded reports and keep ``settings.workers`` workers running."""
+    count = settings.workers
+    with tempfile.TemporaryDirectory(prefix="ginlong-") as directory:
+        socket_path = Path(directory) / "reports.sock"
+        server = await asyncio.start_unix_server(
+            lambda reader, writer: receive_forwarded(reader, writer, reports),
+            socket_path,
+        )
+        LOGGER.info(
+            "Listening on %s %s:%d with %d worker processes",
+            settings.protocol.upper(),
+            settings.listen_address,
+            settings.listen_port,
+            count,
+        )
+        async with server:
+            await WorkerSupervisor(settings, count, socket_path).run()
@@ -0,0 +1,58 @@
+"""Frames and reports shared by the tests."""
+
+import struct
+
+from ginlong_wifi_mqtt.decoder import (
+    END_CODE,
+    FIELD_NAMES,
+    FRAME_OVERHEAD,
+    INVERTER_DATA_OFFSET,
+    INVERTER_SERIAL_OFFSET,
+    FrameLayout,
+    InverterReport,
+    decode_inverter_report,
+)
+from ginlong_wifi_mqtt.simulator import encode_frame
+
+# A report pushed by a stick at night, and one polled over V4 during the day.
+SAMPLE_FRAME = bytes.fromhex(
+    "685951b0154d5925154d592581030530303037353030313733323230303620"
+    "00fb05db074a0000000000100000000600000000096e000000001384009000"
+    "000000002a00aa01a40003d3380000000000030000be75040f003b0000010f"
+    "0000000000000000af16"
+)
+POLLED_FRAME = bytes.fromhex(
+    "685951b0154d5925154d592581030530303037353030313733323230303620"
+    "01970c670c670000003b003a0000006900000000096b00000000138809e300"
+    "000000002a0b7c0276000571660000000000030000be75040f02400000029c"
+    "00000000000000003916"
+)
+SAMPLE_SERIAL = "000750017322006"
+SAMPLE_VALUES = dict(
+    zip(FIELD_NAMES, decode_inverter_report(SAMPLE_FRAME).field_values())
+)
+
+
+def report_frame(serial: str = SAMPLE_SERIAL, **values: int) -> bytes:
+    """Return a frame for ``serial`` with the sample values, some replaced."""
+    return encode_frame(serial, SAMPLE_VALUES | values)
+
+
+def sample_report(serial: str = SAMPLE_SERIAL, **values: int) -> InverterReport:
+    """Return the decoded :func:`report_frame` for ``serial`` and ``values``."""
+    return decode_inverter_report(report_frame(serial, **values))
+
+
+def layout_frame(layout: FrameLayout, serial: str, *values: int) -> bytes:
+    """Return a frame in ``layout`` carrying ``values`` in its value order."""
+    frame = bytearray(layout.data_length + FRAME_OVERHEAD)
+    frame[0] = layout.headcode
+    frame[1] = layout.data_length
+    frame[2:4] = (layout.control_code or 0).to_bytes(2, "big")
+    frame[INVERTER_SERIAL_OFFSET:INVERTER_DATA_OFFSET] = serial.encode(
+        "ascii"
+    ).ljust(16, b"\x00")
+    struct.pack_into(f">{layout.values}", frame, layout.data_offset, *values)
+    frame[-2] = sum(frame[1:-2]) & 0xFF
+    frame[-1] = END_CODE
+    return bytes(frame)
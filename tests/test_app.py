@@ -1,23 +1,125 @@
 import argparse
 import asyncio
+import socket
+from pathlib import Path
 
 import pytest
 
 import ginlong_wifi_mqtt.app as app
 from ginlong_wifi_mqtt.app import (
     Settings,
+    PollTarget,
     build_parser,
-    enqueue_latest,
+    discovered_poll_targets,
     mqtt_publisher,
-    resolve_poll_target,
+    parse_poll_target,
+    settings_from_args,
 )
+from ginlong_wifi_mqtt.capture import CaptureWriter
 from ginlong_wifi_mqtt.lan_discovery import LoggerAdvertisement
+from ginlong_wifi_mqtt.rollups import RollupAggregator
+from ginlong_wifi_mqtt.store import LatestReports
+
+from frames import report_frame, sample_report
 
 
 def parse(parser: argparse.ArgumentParser, *arguments: str) -> argparse.Namespace:
     return parser.parse_args(arguments)
 
 
+def publisher_settings(**overrides: object) -> Settings:
+    values: dict[str, object] = dict(
+        listen_enabled=True,
+        listen_address="127.0.0.1",
+        listen_port=9999,
+        client_id="test",
+        mqtt_address="broker",
+        mqtt_port=1883,
+        mqtt_username=None,
+        mqtt_password=None,
+        homeassistant=True,
+        protocol="tcp",
+        reconnect_delay=0,
+        poll_host=None,
+        poll_port=8899,
+        logger_serial=None,
+        poll_interval=60,
+        discover=False,
+        logger_mac=None,
+        discovery_broadcast="255.255.255.255",
+        discovery_bind_address="0.0.0.0",
+        discovery_timeout=3,
+    )
+    values.update(overrides)
+    return Settings(**values)  # type: ignore[arg-type]
+
+
+class FakeMessage:
+    def __init__(self, payload: bytes) -> None:
+        self.payload = payload
+
+
+class FakeClient:
+    pending_calls_threshold = 10
+
+    def __init__(self, fail_topic: str | None = None) -> None:
+        self.connections = 0
+        self.fail_topic = fail_topic
+        self.published: list[tuple[int, str, bool]] = []
+        self.subscriptions: list[str] = []
+        self.incoming: asyncio.Queue[FakeMessage] = asyncio.Queue()
+        self.changed = asyncio.Event()
+
+    async def __aenter__(self) -> "FakeClient":
+        self.connections += 1
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        return None
+
+    async def publish(
+        self,
+        topic: str,
+        *,
+        payload: str,
+        qos: int,
+        retain: bool,
+    ) -> None:
+        del payload, qos
+        if topic == self.fail_topic:
+            self.fail_topic = None
+            raise app.aiomqtt.MqttError("simulated disconnect")
+        self.published.append((self.connections, topic, retain))
+        self.changed.set()
+
+    async def subscribe(self, topic: str, *, qos: int) -> None:
+        del qos
+        self.subscriptions.append(topic)
+
+    @property
+    async def messages(self):  # type: ignore[no-untyped-def]
+        while True:
+            yield await self.incoming.get()
+
+    async def wait_for(self, topic: str, count: int = 1) -> None:
+        async def published() -> None:
+            while sum(item[1] == topic for item in self.published) < count:
+                self.changed.clear()
+                await self.changed.wait()
+
+        await asyncio.wait_for(published(), timeout=1)
+
+
+async def run_publisher(
+    client: FakeClient,
+    settings: Settings,
+    reports: LatestReports,
+    monkeypatch: pytest.MonkeyPatch,
+) -> asyncio.Task[None]:
+    monkeypatch.setattr(app.aiomqtt, "Client", lambda **kwargs: client)
+    return asyncio.create_task(mqtt_publisher(settings, reports))
+
+
 def test_serve_command_accepts_modern_options() -> None:
     args = parse(
         build_parser(),
@@ -37,6 +139,16 @@ def test_serve_command_accepts_modern_options() -> None:
     assert args.homeassistant is True
 
 
+def test_history_file_from_the_environment_is_a_path(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("GINLONG_HISTORY_FILE", "history.db")
+    parser = build_parser()
+
+    assert parse(parser, "serve").history_file == Path("history.db")
+    assert parse(parser, "history").history_file == Path("history.db")
+
+
 def test_decode_is_a_separate_command() -> None:
     args = parse(build_parser(), "decode", "6859ffff")
 
@@ -44,79 +156,75 @@ def test_decode_is_a_separate_command() -> None:
     assert args.hex_report == "6859ffff"
 
 
-def test_queue_keeps_latest_report_during_mqtt_outage() -> None:
-    queue: asyncio.Queue[dict[str, object]] = asyncio.Queue(maxsize=1)
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("123456789@192.0.2.10", PollTarget("192.0.2.10", 8899, 123456789)),
+        ("42@logger.lan:9000", PollTarget("logger.lan", 9000, 42)),
+        ("42@[2001:db8::1]:9000", PollTarget("2001:db8::1", 9000, 42)),
+    ],
+)
+def test_parses_poll_targets(value: str, expected: PollTarget) -> None:
+    assert parse_poll_target(value, 8899) == expected
 
-    enqueue_latest(queue, {"watt_now": 1})
-    enqueue_latest(queue, {"watt_now": 2})
 
-    assert queue.get_nowait() == {"watt_now": 2}
+@pytest.mark.parametrize("value", ["192.0.2.10", "x@192.0.2.10", "-1@host"])
+def test_rejects_invalid_poll_targets(value: str) -> None:
+    with pytest.raises(ValueError, match="invalid poll target"):
+        parse_poll_target(value, 8899)
+
+
+def test_deadband_mode_is_rejected_with_home_assistant_discovery() -> None:
+    args = parse(
+        build_parser(),
+        "serve",
+        "--homeassistant",
+        "--publish-mode",
+        "deadband",
+        "--no-listen",
+        "--poll-host",
+        "192.0.2.10",
+        "--logger-serial",
+        "1",
+    )
+
+    with pytest.raises(ValueError, match="cannot be used with --homeassistant"):
+        settings_from_args(args)
+
+
+def test_fleet_settings_collect_static_and_extra_poll_targets() -> None:
+    settings = settings_from_args(
+        parse(
+            build_parser(),
+            "serve",
+            "--fleet",
+            "--no-listen",
+            "--poll-host",
+            "192.0.2.10",
+            "--logger-serial",
+            "1",
+            "--poll-target",
+            "2@192.0.2.11",
+        )
+    )
+
+    assert settings.fleet is True
+    assert settings.all_poll_targets() == (
+        PollTarget("192.0.2.10", 8899, 1),
+        PollTarget("192.0.2.11", 8899, 2),
+    )
 
 
 @pytest.mark.asyncio
-async def test_mqtt_reconnect_republishes_discovery_and_pending_state(
+async def test_mqtt_reconnect_resends_pending_state_but_not_unchanged_discovery(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    state_published = asyncio.Event()
-
-    class FakeClient:
-        def __init__(self) -> None:
-            self.connections = 0
-            self.failed_state_once = False
-            self.published: list[tuple[int, str, bool]] = []
-
-        async def __aenter__(self) -> "FakeClient":
-            self.connections += 1
-            return self
-
-        async def __aexit__(self, *args: object) -> None:
-            return None
-
-        async def publish(
-            self,
-            topic: str,
-            *,
-            payload: str,
-            qos: int,
-            retain: bool,
-        ) -> None:
-            del payload, qos
-            if topic == "ginlong/inverter_test" and not self.failed_state_once:
-                self.failed_state_once = True
-                raise app.aiomqtt.MqttError("simulated disconnect")
-            self.published.append((self.connections, topic, retain))
-            if topic == "ginlong/inverter_test":
-                state_published.set()
+    client = FakeClient(fail_topic="ginlong/inverter_test")
+    reports = LatestReports("test")
+    reports.put(sample_report())
 
-    client = FakeClient()
-    monkeypatch.setattr(app.aiomqtt, "Client", lambda **kwargs: client)
-    settings = Settings(
-        listen_enabled=True,
-        listen_address="127.0.0.1",
-        listen_port=9999,
-        client_id="test",
-        mqtt_address="broker",
-        mqtt_port=1883,
-        mqtt_username=None,
-        mqtt_password=None,
-        homeassistant=True,
-        protocol="tcp",
-        reconnect_delay=0,
-        poll_host=None,
-        poll_port=8899,
-        logger_serial=None,
-        poll_interval=60,
-        discover=False,
-        logger_mac=None,
-        discovery_broadcast="255.255.255.255",
-        discovery_bind_address="0.0.0.0",
-        discovery_timeout=3,
-    )
-    queue: asyncio.Queue[dict[str, object]] = asyncio.Queue(maxsize=1)
-    queue.put_nowait({"watt_now": 123})
-
-    task = asyncio.create_task(mqtt_publisher(settings, queue))
-    await asyncio.wait_for(state_published.wait(), timeout=1)
+    task = await run_publisher(client, publisher_settings(), reports, monkeypatch)
+    await client.wait_for("ginlong/inverter_test")
     task.cancel()
     await asyncio.gather(task, return_exceptions=True)
 
@@ -126,49 +234,260 @@ async def test_mqtt_reconnect_republishes_discovery_and_pending_state(
         for connection, topic, retained in client.published
         if topic.startswith("homeassistant/") and retained
     }
-    assert discovery_connections == {1, 2}
+    assert discovery_connections == {1}
     assert client.published[-1] == (2, "ginlong/inverter_test", False)
 
 
 @pytest.mark.asyncio
-async def test_discovery_overrides_static_poll_host(
+async def test_a_full_inflight_window_does_not_trip_the_pending_call_warning(
     monkeypatch: pytest.MonkeyPatch,
 ) -> None:
-    async def fake_discover_loggers(**kwargs: object) -> list[LoggerAdvertisement]:
-        assert kwargs["broadcast_address"] == "192.0.2.255"
-        return [
-            LoggerAdvertisement(
-                ip_address="192.0.2.35",
-                mac_address="AA1122334455",
-                serial=None,
-            )
-        ]
-
-    monkeypatch.setattr(app, "discover_loggers", fake_discover_loggers)
-    settings = Settings(
-        listen_enabled=True,
-        listen_address="0.0.0.0",
-        listen_port=9999,
-        client_id="solis",
-        mqtt_address="127.0.0.1",
-        mqtt_port=1883,
-        mqtt_username=None,
-        mqtt_password=None,
-        homeassistant=True,
-        protocol="tcp",
-        reconnect_delay=5,
+    client = FakeClient()
+
+    task = await run_publisher(
+        client, publisher_settings(mqtt_inflight=50), LatestReports("test"), monkeypatch
+    )
+    await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert client.pending_calls_threshold == 50
+
+
+@pytest.mark.asyncio
+async def test_homeassistant_birth_message_republishes_discovery(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client = FakeClient()
+    topic = "homeassistant/sensor/ginlong_inverter_test/watt_now/config"
+
+    task = await run_publisher(
+        client, publisher_settings(), LatestReports("test"), monkeypatch
+    )
+    await client.wait_for(topic)
+    client.incoming.put_nowait(FakeMessage(b"offline"))
+    client.incoming.put_nowait(FakeMessage(b"online"))
+    await client.wait_for(topic, count=2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert client.subscriptions == ["homeassistant/status"]
+    assert sum(item[1] == topic for item in client.published) == 2
+
+
+@pytest.mark.asyncio
+async def test_a_crashed_homeassistant_watcher_stops_the_publisher(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def crash(*args: object) -> None:
+        raise RuntimeError("watcher crashed")
+
+    monkeypatch.setattr(app, "watch_homeassistant_status", crash)
+    task = await run_publisher(
+        FakeClient(), publisher_settings(), LatestReports("test"), monkeypatch
+    )
+
+    with pytest.raises(RuntimeError, match="watcher crashed"):
+        await asyncio.wait_for(task, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_fleet_mode_publishes_each_inverter_to_its_own_topic(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client = FakeClient()
+    reports = LatestReports()
+    reports.put(sample_report("A"))
+    reports.put(sample_report("B"))
+
+    settings = publisher_settings(client_id="ignored", fleet=True)
+    task = await run_publisher(client, settings, reports, monkeypatch)
+    await client.wait_for("ginlong/inverter_B")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    published = [topic for _, topic, _ in client.published]
+    state_topics = [topic for topic in published if topic.startswith("ginlong/")]
+    assert state_topics == ["ginlong/inverter_A", "ginlong/inverter_B"]
+    assert any("ginlong_inverter_A/" in topic for topic in published)
+    assert not any("ginlong_inverter_ignored" in topic for topic in published)
+
+
+def test_discovery_overrides_static_poll_host() -> None:
+    settings = publisher_settings(
         poll_host="192.0.2.99",
-        poll_port=8899,
         logger_serial=123456789,
-        poll_interval=60,
         discover=True,
         logger_mac="AA1122334455",
-        discovery_broadcast="192.0.2.255",
-        discovery_bind_address="0.0.0.0",
-        discovery_timeout=3,
+        poll_targets=(PollTarget("192.0.2.50", 8899, 42),),
     )
+    discovered = LoggerAdvertisement(
+        ip_address="192.0.2.35",
+        mac_address="AA1122334455",
+        serial=None,
+    )
+
+    assert discovered_poll_targets(settings, []) == (
+        PollTarget("192.0.2.99", 8899, 123456789),
+        PollTarget("192.0.2.50", 8899, 42),
+    )
+    assert discovered_poll_targets(settings, [discovered]) == (
+        PollTarget("192.0.2.35", 8899, 123456789),
+        PollTarget("192.0.2.50", 8899, 42),
+    )
+
+
+def test_fleet_discovery_polls_every_logger_that_reports_a_serial() -> None:
+    settings = publisher_settings(fleet=True, discover=True)
 
-    resolved = await resolve_poll_target(settings)
+    targets = discovered_poll_targets(
+        settings,
+        [
+            LoggerAdvertisement("192.0.2.35", "AA1122334455", None),
+            LoggerAdvertisement("192.0.2.36", "AA1122334466", 7),
+        ],
+    )
+
+    assert targets == (PollTarget("192.0.2.36", 8899, 7),)
+
+
+@pytest.mark.asyncio
+async def test_tcp_listener_decodes_every_frame_on_a_persistent_connection() -> None:
+    reports = LatestReports()
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(
+        lambda: app.InverterStreamProtocol(reports, idle_timeout=0.2),
+        "127.0.0.1",
+        0,
+    )
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        frames = [report_frame(serial) for serial in ("A", "B", "C")]
+        writer.write(frames[0] + frames[1][:20])
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        writer.write(frames[1][20:] + frames[2])
+        await writer.drain()
+
+        # The bridge closes the connection only once it has been idle.
+        assert await asyncio.wait_for(reader.read(), timeout=1) == b""
+    finally:
+        writer.close()
+        server.close()
+        await server.wait_closed()
+
+    assert sorted(reports.get_nowait()[0] for _ in range(3)) == ["A", "B", "C"]
+
+
+@pytest.mark.asyncio
+async def test_udp_reader_decodes_batches_and_counts_drops() -> None:
+    reports = LatestReports()
+    protocol = app.InverterDatagramProtocol(reports)
+    receiver = app.bind_udp_socket("127.0.0.1", 0)
+    reader = app.BatchedDatagramReader(receiver, protocol, batch_size=2)
+    with receiver, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        address = receiver.getsockname()
+        for serial in ("A", "B", "C"):
+            sender.sendto(report_frame(serial), address)
+        sender.sendto(b"\x68" * 1000, address)
+        sender.sendto(b"\x00\x00\x00\x00", address)
+        await asyncio.sleep(0.05)
+
+        reader.read_ready()
+        assert protocol.received == 2
+        reader.read_ready()
+        reader.read_ready()
+
+    assert (protocol.received, protocol.rejected, protocol.dropped) == (5, 1, 1)
+    assert len(reports) == 3
+
+
+@pytest.mark.asyncio
+async def test_replay_publishes_every_captured_frame_and_stops(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    path = tmp_path / "frames.cap"
+    capture = CaptureWriter(path)
+    peer = ("192.0.2.10", 41000)
+    for timestamp, serial in enumerate(("A", "B", "C")):
+        capture.write(report_frame(serial), peer, "tcp", timestamp)
+    capture.write(b"\x00\x00\x00\x00", peer, "udp", 3)
+    capture.close()
+    client = FakeClient()
+    monkeypatch.setattr(app.aiomqtt, "Client", lambda **kwargs: client)
+
+    settings = publisher_settings(fleet=True, homeassistant=False)
+    await asyncio.wait_for(app.run_replay(settings, path, speed=0), timeout=1)
+
+    assert [topic for _, topic, _ in client.published] == [
+        "ginlong/inverter_A",
+        "ginlong/inverter_B",
+        "ginlong/inverter_C",
+    ]
+
+
+def test_report_log_sampler_logs_each_inverter_once_per_interval() -> None:
+    sampler = app.ReportLogSampler(interval=60)
+
+    assert sampler.sample("A", now=0) == 0
+    assert sampler.sample("B", now=1) == 0
+    assert sampler.sample("A", now=30) is None
+    assert sampler.sample("A", now=59) is None
+    assert sampler.sample("A", now=60) == 2
+    assert app.ReportLogSampler(interval=0).sample("A", now=0) == 0
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_published_to_their_own_topics(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client = FakeClient()
+    reports = LatestReports("test")
+    rollups = RollupAggregator(reports.route, app.state_topic)
+    rollups.add(sample_report("A"), timestamp=0)
+
+    monkeypatch.setattr(app.aiomqtt, "Client", lambda **kwargs: client)
+    task = asyncio.create_task(
+        mqtt_publisher(publisher_settings(homeassistant=False), reports, rollups)
+    )
+    await client.wait_for("ginlong/inverter_test/rollup/15m")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert [topic for _, topic, _ in client.published] == [
+        "ginlong/inverter_test/rollup/1m",
+        "ginlong/inverter_test/rollup/15m",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rollups_lost_with_the_connection_are_published_again(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    client = FakeClient(fail_topic="ginlong/inverter_test/rollup/1m")
+    reports = LatestReports("test")
+    rollups = RollupAggregator(reports.route, app.state_topic)
+    rollups.add(sample_report("A"), timestamp=0)
+
+    monkeypatch.setattr(app.aiomqtt, "Client", lambda **kwargs: client)
+    task = asyncio.create_task(
+        mqtt_publisher(publisher_settings(homeassistant=False), reports, rollups)
+    )
+    await client.wait_for("ginlong/inverter_test/rollup/1m")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert (2, "ginlong/inverter_test/rollup/1m", False) in client.published
+    assert len(rollups) == 0
+
+
+def test_decode_streams_inputs_to_a_chosen_format() -> None:
+    args = parse(
+        build_parser(), "decode", "--input", "a.hex", "--input", "-", "--format", "csv"
+    )
 
-    assert resolved.poll_host == "192.0.2.35"
-    assert resolved.logger_serial == 123456789
+    assert args.hex_report is None
+    assert args.inputs == ["a.hex", "-"]
+    assert (args.input_format, args.format, args.workers) == ("auto", "csv", 1)
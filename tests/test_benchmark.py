@@ -0,0 +1,26 @@
+import pytest
+
+from ginlong_wifi_mqtt.benchmark import (
+    BENCHMARKS,
+    format_results,
+    run_benchmarks,
+    synthetic_frame,
+)
+from ginlong_wifi_mqtt.decoder import decode_inverter_report
+
+
+def test_synthetic_frames_carry_serial_sequence_and_checksum() -> None:
+    frame = synthetic_frame("BENCH7", 513)
+    report = decode_inverter_report(frame)
+
+    assert (report.inverter_serial, report["watt_now"]) == ("BENCH7", 513)
+    assert sum(frame[1:-2]) & 0xFF == frame[-2]
+
+
+@pytest.mark.asyncio
+async def test_every_benchmark_completes_without_losing_frames() -> None:
+    results = await run_benchmarks(BENCHMARKS, frames=200, connections=4)
+
+    assert [result.operations for result in results] == [200] * len(BENCHMARKS)
+    assert all(result.lost == 0 for result in results)
+    assert "publish" in format_results(results)
@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from ginlong_wifi_mqtt.bulk import DECODE_COLUMNS, bulk_decode
+from ginlong_wifi_mqtt.capture import CaptureWriter
+
+from frames import report_frame
+
+
+def decode_to_jsonl(inputs: list[str], **options: object) -> tuple[list, str]:
+    output = inputs[0] + ".jsonl"
+    errors = io.StringIO()
+    bulk_decode(inputs, output=Path(output), errors=errors, **options)
+    rows = [json.loads(line) for line in Path(output).read_text().splitlines()]
+    return rows, errors.getvalue()
+
+
+def test_hex_lines_report_errors_per_line_and_keep_going(tmp_path: Path) -> None:
+    path = tmp_path / "reports.hex"
+    path.write_text(
+        "# captured on site\n"
+        f"{report_frame('A').hex()}\n"
+        "\n"
+        "not hex\n"
+        "6859ffff\n"
+        f"{report_frame('B').hex()}\n"
+    )
+
+    rows, errors = decode_to_jsonl([str(path)], batch_size=2)
+
+    assert [(row["record"], row["inverter_serial"]) for row in rows] == [
+        (2, "A"),
+        (6, "B"),
+    ]
+    assert list(rows[0]) == list(DECODE_COLUMNS)
+    assert rows[1]["source"] == str(path)
+    assert errors.splitlines() == [
+        f"{path}:4: invalid hexadecimal input: "
+        "non-hexadecimal number found in fromhex() arg at position 0",
+        f"{path}:5: incomplete frame: received 4 bytes, need at least 93",
+    ]
+
+
+def test_binary_streams_and_captures_are_detected(tmp_path: Path) -> None:
+    binary = tmp_path / "frames.bin"
+    short = b"\x68\x02" + bytes(13) + b"\x16"
+    binary.write_bytes(b"noise" + report_frame("A") + short + report_frame("B"))
+    capture = tmp_path / "frames.cap"
+    writer = CaptureWriter(capture)
+    for serial in "CD":
+        writer.write(report_frame(serial), ("192.0.2.10", 41000), "tcp")
+    writer.close()
+
+    rows, errors = decode_to_jsonl([str(binary), str(capture)])
+
+    assert [(row["record"], row["inverter_serial"]) for row in rows] == [
+        (1, "A"),
+        (3, "B"),
+        (1, "C"),
+        (2, "D"),
+    ]
+    assert errors == f"{binary}:2: unknown data length 2\n"
+
+
+def test_worker_processes_keep_input_order_and_write_csv(tmp_path: Path) -> None:
+    path = tmp_path / "reports.hex"
+    path.write_text(
+        "".join(f"{report_frame(f'S{index}').hex()}\n" for index in range(50))
+    )
+    output = tmp_path / "reports.csv"
+
+    decoded, failed = bulk_decode(
+        [str(path)], output=output, output_format="csv", workers=2, batch_size=7
+    )
+
+    with output.open(newline="") as stream:
+        rows = list(csv.DictReader(stream))
+    assert (decoded, failed) == (50, 0)
+    assert [row["inverter_serial"] for row in rows] == [f"S{i}" for i in range(50)]
+    assert rows[7]["record"] == "8"
+
+
+def test_parquet_output_needs_an_output_file(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="requires --output"):
+        bulk_decode([str(tmp_path / "missing")], output_format="parquet")
+
+
+def test_unreadable_inputs_are_reported_and_skipped(tmp_path: Path) -> None:
+    path = tmp_path / "reports.hex"
+    path.write_text(f"{report_frame('A').hex()}\n")
+    missing = tmp_path / "missing.hex"
+
+    rows, errors = decode_to_jsonl([str(path), str(missing), str(tmp_path)])
+
+    assert [row["inverter_serial"] for row in rows] == ["A"]
+    assert errors.splitlines() == [
+        f"{missing}: cannot read input: No such file or directory",
+        f"{tmp_path}: cannot read input: Is a directory",
+    ]
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+
+from ginlong_wifi_mqtt.capture import CapturedFrame, CaptureWriter, read_capture
+
+
+def test_capture_round_trips_frames_and_survives_a_torn_record(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "frames.cap"
+    writer = CaptureWriter(path)
+    writer.write(b"\x68\x59", ("192.0.2.10", 41000), "tcp", timestamp=1.5)
+    writer.write(b"", "poll 192.0.2.11:8899", "poll", timestamp=2.0)
+    writer.close()
+    # Appending keeps earlier records; a cut-off record ends the capture.
+    writer = CaptureWriter(path)
+    writer.write(b"\x68" * 10, ("192.0.2.12", 9999), "udp", timestamp=3.0)
+    writer.close()
+    path.write_bytes(path.read_bytes()[:-1])
+
+    assert list(read_capture(path)) == [
+        CapturedFrame(1.5, "tcp", "192.0.2.10:41000", b"\x68\x59"),
+        CapturedFrame(2.0, "poll", "poll 192.0.2.11:8899", b""),
+    ]
+
+
+def test_rejects_files_that_are_not_captures(tmp_path: Path) -> None:
+    path = tmp_path / "backlog"
+    path.write_bytes(b"solis\t6859\n")
+
+    with pytest.raises(ValueError, match="not a frame capture"):
+        list(read_capture(path))
+    with pytest.raises(ValueError, match="not a frame capture"):
+        CaptureWriter(path)
+
+
+def test_records_reach_the_file_before_the_writer_is_closed(tmp_path: Path) -> None:
+    path = tmp_path / "frames.cap"
+    writer = CaptureWriter(path)
+    writer.write(b"\x68\x59", ("192.0.2.10", 41000), "tcp", timestamp=1.5)
+
+    assert list(read_capture(path)) == [
+        CapturedFrame(1.5, "tcp", "192.0.2.10:41000", b"\x68\x59")
+    ]
+    writer.close()
+
+
+def test_reopening_cuts_a_torn_record_so_appended_frames_replay(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "frames.cap"
+    writer = CaptureWriter(path)
+    writer.write(b"\x68\x59", ("192.0.2.10", 41000), "tcp", timestamp=1.5)
+    writer.write(b"\x68" * 10, ("192.0.2.12", 9999), "udp", timestamp=2.0)
+    writer.close()
+    path.write_bytes(path.read_bytes()[:-3])
+
+    writer = CaptureWriter(path)
+    writer.write(b"\x68\x01", "poll 192.0.2.11:8899", "poll", timestamp=3.0)
+    writer.close()
+
+    assert list(read_capture(path)) == [
+        CapturedFrame(1.5, "tcp", "192.0.2.10:41000", b"\x68\x59"),
+        CapturedFrame(3.0, "poll", "poll 192.0.2.11:8899", b"\x68\x01"),
+    ]
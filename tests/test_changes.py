@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from ginlong_wifi_mqtt.changes import ChangeFilter, parse_deadband
+
+from frames import sample_report
+
+TOPIC = "ginlong/inverter_solis"
+
+
+def test_full_mode_publishes_every_report() -> None:
+    changes = ChangeFilter("full")
+
+    assert changes.messages("solis", TOPIC, sample_report(watt_now=144), 0) == [
+        (TOPIC, sample_report(watt_now=144).to_json())
+    ]
+    assert len(changes.messages("solis", TOPIC, sample_report(watt_now=144), 1)) == 1
+
+
+def test_changed_mode_skips_unchanged_reports_until_refresh() -> None:
+    changes = ChangeFilter("changed", refresh_interval=60)
+
+    assert len(changes.messages("solis", TOPIC, sample_report(watt_now=0), 0)) == 1
+    assert changes.messages("solis", TOPIC, sample_report(watt_now=0), 10) == []
+    assert len(changes.messages("solis", TOPIC, sample_report(watt_now=1), 20)) == 1
+    assert len(changes.messages("solis", TOPIC, sample_report(watt_now=1), 80)) == 1
+    assert changes.skipped == 1
+
+
+def test_deadband_mode_publishes_only_fields_beyond_their_deadband() -> None:
+    changes = ChangeFilter("deadband", {"watt_now": 10})
+    changes.messages("solis", TOPIC, sample_report(watt_now=100), 0)
+
+    report = sample_report(watt_now=105, temp=252)
+    assert changes.messages("solis", TOPIC, report, 1) == [
+        (TOPIC, '{"inverter_serial":"000750017322006","temp":252}')
+    ]
+    # Drift is measured against the last published value, not the last report.
+    report = sample_report(watt_now=111, temp=252)
+    [(_, payload)] = changes.messages("solis", TOPIC, report, 2)
+    assert json.loads(payload) == {
+        "inverter_serial": "000750017322006",
+        "watt_now": 111,
+    }
+
+
+def test_fields_mode_publishes_changed_values_to_field_topics() -> None:
+    changes = ChangeFilter("fields")
+
+    assert len(changes.messages("solis", TOPIC, sample_report(watt_now=100), 0)) == 30
+    assert changes.messages("solis", TOPIC, sample_report(watt_now=120), 1) == [
+        (f"{TOPIC}/watt_now", "120")
+    ]
+
+
+@pytest.mark.parametrize("value", ["watt_now", "nope=1", "watt_now=x", "temp=-1"])
+def test_rejects_invalid_deadbands(value: str) -> None:
+    with pytest.raises(ValueError, match="invalid deadband"):
+        parse_deadband(value)
+
+
+def test_scaled_deadband_payload_carries_dependent_scaled_values() -> None:
+    changes = ChangeFilter("deadband", scaled=True)
+    [(_, full)] = changes.messages("solis", TOPIC, sample_report(watt_now=100), 0)
+    assert json.loads(full)["temperature"] == 25.1
+
+    report = sample_report(watt_now=100, temp=252)
+    [(_, payload)] = changes.messages("solis", TOPIC, report, 1)
+    assert json.loads(payload) == {
+        "inverter_serial": "000750017322006",
+        "temp": 252,
+        "temperature": 25.2,
+    }
@@ -1,21 +1,23 @@
-import pytest
-
-from ginlong_wifi_mqtt.decoder import DecodeError, decode_hex_string
+import json
 
+import pytest
 
-SAMPLE = (
-    "685951b0154d5925154d592581030530303037353030313733323230303620"
-    "00fb05db074a0000000000100000000600000000096e000000001384009000"
-    "000000002a00aa01a40003d3380000000000030000be75040f003b0000010f"
-    "0000000000000000af16"
+import ginlong_wifi_mqtt.decoder as decoder
+from ginlong_wifi_mqtt.decoder import (
+    DEFAULT_LAYOUT,
+    DecodeError,
+    FrameLayout,
+    InverterReport,
+    decode_hex_string,
+    decode_inverter_batch,
+    decode_inverter_report,
+    register_layout,
 )
 
-POLLED_SAMPLE = (
-    "685951b0154d5925154d592581030530303037353030313733323230303620"
-    "01970c670c670000003b003a0000006900000000096b00000000138809e300"
-    "000000002a0b7c0276000571660000000000030000be75040f02400000029c"
-    "00000000000000003916"
-)
+from frames import POLLED_FRAME, SAMPLE_FRAME, layout_frame
+
+SAMPLE = SAMPLE_FRAME.hex()
+POLLED_SAMPLE = POLLED_FRAME.hex()
 
 
 def test_decodes_known_inverter_report() -> None:
@@ -55,3 +57,164 @@ def test_decodes_live_polled_report() -> None:
 def test_rejects_invalid_reports(payload: str, message: str) -> None:
     with pytest.raises(DecodeError, match=message):
         decode_hex_string(payload)
+
+
+def test_batch_decode_matches_single_frame_decoder() -> None:
+    frames = [SAMPLE_FRAME, b"\x00\x59\xff\xff", POLLED_FRAME]
+
+    batch = decode_inverter_batch(frames)
+
+    assert list(batch.indices) == [0, 2]
+    assert batch.errors == [(1, "unknown headcode 0x00")]
+    for position, hex_report in enumerate((SAMPLE, POLLED_SAMPLE)):
+        expected = decode_hex_string(hex_report)
+        del expected["raw"], expected["raw_length"]
+        assert batch.row(position) == expected
+    assert list(batch.columns["kwh_total"]) == [250680, 356710]
+
+
+def test_batch_decode_splits_concatenated_buffer() -> None:
+    buffer = SAMPLE_FRAME * 3 + bytes.fromhex("6859ffff")
+
+    batch = decode_inverter_batch(buffer)
+
+    assert len(batch) == 3
+    assert list(batch.columns["watt_now"]) == [144, 144, 144]
+    assert batch.errors == [
+        (3, "incomplete frame: received 4 bytes, need at least 93")
+    ]
+
+
+def test_batch_decode_rejects_full_frames_like_the_single_frame_decoder() -> None:
+    bad_checksum = bytearray(POLLED_FRAME)
+    bad_checksum[60] ^= 1
+    bad_end_code = bytearray(SAMPLE_FRAME)
+    bad_end_code[-1] = 0x17
+    frames = [SAMPLE_FRAME, bad_checksum, bad_end_code, POLLED_FRAME]
+
+    for batch in (
+        decode_inverter_batch(frames),
+        decode_inverter_batch(b"".join(frames)),
+    ):
+        assert list(batch.indices) == [0, 3]
+        assert list(batch.columns["watt_now"]) == [144, 2531]
+        assert batch.inverter_serial == ["000750017322006"] * 2
+        assert batch.errors == [
+            (1, "checksum mismatch: computed 0x38, frame carries 0x39"),
+            (2, "bad end code 0x17"),
+        ]
+    with pytest.raises(DecodeError, match="bad end code 0x17"):
+        decode_inverter_report(bad_end_code)
+
+
+def test_report_view_matches_legacy_schema_and_json() -> None:
+    raw_data = SAMPLE_FRAME
+
+    report = decode_inverter_report(raw_data)
+
+    assert report.frame.obj is raw_data
+    assert report == decode_hex_string(SAMPLE)
+    assert list(report) == list(decode_hex_string(SAMPLE))
+    assert report.to_json() == json.dumps(
+        decode_hex_string(SAMPLE), separators=(",", ":")
+    )
+    with pytest.raises(KeyError):
+        report["missing"]
+
+
+@pytest.mark.parametrize(
+    ("raw_data", "reason"),
+    [
+        (b"\x68", "frame is too short"),
+        (b"\x00\x59\xff\xff", "unknown headcode"),
+        (b"\x68\x10\xff\xff", "unknown data length"),
+        (b"\x68\x59\xff\xff", "incomplete frame"),
+    ],
+)
+def test_decode_error_reason_omits_frame_details(raw_data: bytes, reason: str) -> None:
+    with pytest.raises(DecodeError) as caught:
+        decode_inverter_report(raw_data)
+
+    assert caught.value.reason == reason
+
+
+HYBRID = FrameLayout(
+    "test-hybrid",
+    0x3C,
+    "HHLH",
+    ("temp", "watt_now", "kwh_total", None),
+    control_code=0x51B1,
+    scales=(("kwh_total", 0.1),),
+)
+
+
+def test_rejects_frames_with_a_bad_checksum() -> None:
+    frame = bytearray(SAMPLE_FRAME)
+    frame[60] ^= 1
+
+    with pytest.raises(DecodeError, match="checksum mismatch") as caught:
+        decode_inverter_report(frame)
+    assert caught.value.reason == "checksum mismatch"
+
+
+@pytest.fixture
+def layouts(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep layouts registered by a test out of the other tests."""
+    monkeypatch.setattr(decoder, "_LAYOUTS", dict(decoder._LAYOUTS))
+
+
+@pytest.mark.usefixtures("layouts")
+def test_registered_layouts_decode_to_the_common_schema() -> None:
+    register_layout(HYBRID)
+    frame = layout_frame(HYBRID, "HYB1", 315, 4200, 123456, 7)
+
+    report = decode_inverter_report(frame)
+
+    assert report.layout.layout is HYBRID
+    assert report.inverter_serial == "HYB1"
+    assert (report["temp"], report["watt_now"], report["kwh_total"]) == (
+        315,
+        4200,
+        12346,
+    )
+    assert report["dc_volts1"] == 0
+    assert report["ctrlcode"] == 0x51B1
+    with pytest.raises(DecodeError, match="unknown control code 0x51b0"):
+        decode_inverter_report(frame[:2] + b"\x51\xb0" + frame[4:])
+
+    batch = decode_inverter_batch(SAMPLE_FRAME + frame + POLLED_FRAME)
+    assert list(batch.indices) == [0, 1, 2]
+    assert list(batch.columns["watt_now"]) == [144, 4200, 2531]
+    assert batch.row(1) == {
+        name: value
+        for name, value in report.items()
+        if name not in ("raw", "raw_length")
+    }
+
+
+def test_report_without_a_layout_looks_it_up_from_the_header() -> None:
+    assert InverterReport(SAMPLE_FRAME).layout is DEFAULT_LAYOUT
+    with pytest.raises(DecodeError, match="unknown headcode 0x00"):
+        InverterReport(b"\x00" + SAMPLE_FRAME[1:])
+
+
+def test_default_layout_matches_any_control_code() -> None:
+    frame = bytearray(SAMPLE_FRAME)
+    frame[2:4] = b"\x12\x34"
+    frame[-2] = sum(frame[1:-2]) & 0xFF
+
+    assert decode_inverter_report(frame).layout is DEFAULT_LAYOUT
+
+
+@pytest.mark.parametrize(
+    ("layout", "message"),
+    [
+        (FrameLayout("short", 0x20, "HH", ("temp",)), "1 fields for 2 values"),
+        (FrameLayout("typo", 0x20, "H", ("tmep",)), "unknown or repeated"),
+        (FrameLayout("long", 0x10, "20H", (None,) * 20), "past the checksum"),
+    ],
+)
+@pytest.mark.usefixtures("layouts")
+def test_rejects_inconsistent_layouts(layout: FrameLayout, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        register_layout(layout)
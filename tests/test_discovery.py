@@ -1,6 +1,6 @@
 import json
 
-from ginlong_wifi_mqtt.discovery import SENSORS, discovery_messages
+from ginlong_wifi_mqtt.discovery import SENSORS, DiscoveryCache, discovery_messages
 
 
 def test_discovery_topics_are_unique_and_reference_state_topic() -> None:
@@ -29,3 +29,47 @@ def test_energy_scaling_matches_raw_decoder_values() -> None:
 
     assert payloads["kwh_day"]["value_template"].endswith("/ 100.0 }}")
     assert payloads["kwh_total"]["value_template"].endswith("/ 10.0 }}")
+
+
+def test_field_topics_read_bare_values_from_per_field_topics() -> None:
+    payloads = {
+        topic.rsplit("/", 2)[-2]: json.loads(payload)
+        for topic, payload in discovery_messages(
+            "solis", "ginlong/inverter_solis", field_topics=True
+        )
+    }
+
+    assert payloads["kwh_day"]["state_topic"] == "ginlong/inverter_solis/kwh_day"
+    assert payloads["kwh_day"]["value_template"] == "{{ (value | int) / 100.0 }}"
+
+
+def test_cache_encodes_once_and_skips_published_content() -> None:
+    cache = DiscoveryCache()
+
+    digest, messages = cache.messages("solis", "ginlong/inverter_solis")
+    assert cache.messages("solis", "ginlong/inverter_solis")[1] is messages
+    assert messages == tuple(
+        discovery_messages("solis", "ginlong/inverter_solis")
+    )
+    assert cache.needs_publish("solis")
+
+    cache.mark_published("solis")
+    assert not cache.needs_publish("solis")
+    assert cache.forget_all() == ["solis"]
+    assert cache.needs_publish("solis")
+    assert cache.messages("solis", "ginlong/inverter_solis")[0] == digest
+
+
+def test_scaled_discovery_uses_plain_lookups_and_adds_derived_sensors() -> None:
+    payloads = {
+        topic.rsplit("/", 2)[-2]: json.loads(payload)
+        for topic, payload in discovery_messages(
+            "solis", "ginlong/inverter_solis", scaled=True
+        )
+    }
+
+    assert len(payloads) == len(SENSORS) + 5
+    assert payloads["kwh_day"]["value_template"] == "{{ value_json.energy_today }}"
+    assert payloads["dc_power"]["unit_of_measurement"] == "W"
+    assert "device_class" not in payloads["efficiency"]
+    assert all("/" not in payload["value_template"] for payload in payloads.values())
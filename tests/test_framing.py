@@ -0,0 +1,28 @@
+from ginlong_wifi_mqtt.framing import FrameBuffer
+
+from frames import SAMPLE_FRAME as SAMPLE
+
+
+def test_yields_every_frame_in_one_chunk() -> None:
+    frames = FrameBuffer()
+
+    assert frames.feed(SAMPLE * 3) == [SAMPLE, SAMPLE, SAMPLE]
+    assert len(frames) == 0
+
+
+def test_reassembles_frames_split_across_chunks() -> None:
+    frames = FrameBuffer()
+
+    assert frames.feed(SAMPLE[:1]) == []
+    assert frames.feed(SAMPLE[1:50]) == []
+    assert frames.feed(SAMPLE[50:] + SAMPLE[:10]) == [SAMPLE]
+    assert len(frames) == 10
+
+
+def test_resynchronises_on_headcode_after_garbage() -> None:
+    frames = FrameBuffer()
+    # A stray head code whose claimed length does not end with the end code.
+    garbage = b"\x00\x01\x68\x02\xff\xff" + bytes(14)
+
+    assert frames.feed(garbage + SAMPLE) == [SAMPLE]
+    assert frames.discarded == len(garbage)
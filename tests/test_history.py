@@ -0,0 +1,96 @@
+import asyncio
+import io
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from ginlong_wifi_mqtt.history import (
+    HistoryWriter,
+    parse_time,
+    query_history,
+    write_history,
+)
+from ginlong_wifi_mqtt.store import LatestReports, RecordingSink
+
+from frames import sample_report
+
+
+def test_parse_time_accepts_ages_timestamps_and_iso_times() -> None:
+    assert parse_time("15m", now=10_000) == 10_000 - 900
+    assert parse_time("2d", now=200_000) == 200_000 - 172_800
+    assert parse_time("1700000000.5") == 1_700_000_000.5
+    assert parse_time("2024-01-02T03:04:05+00:00") == 1_704_164_645
+    with pytest.raises(ValueError, match="invalid time"):
+        parse_time("yesterday")
+
+
+@pytest.mark.asyncio
+async def test_writer_batches_reports_and_queries_by_serial_and_time(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "history.db"
+    history = HistoryWriter(path)
+    await history.open()
+    for second, serial in enumerate(["A", "B", "A", "A"]):
+        history.add(sample_report(serial, watt_now=second), second)
+
+    assert await history.flush() == 4
+    assert await history.flush() == 0
+    await history.close()
+
+    rows = list(
+        query_history(path, serials=["A"], start=1, end=3, fields=["watt_now"])
+    )
+    assert rows == [{"inverter_serial": "A", "time": 2.0, "watt_now": 2}]
+    assert len(list(query_history(path, limit=3))) == 3
+    with pytest.raises(ValueError, match="unknown history fields: power"):
+        list(query_history(path, fields=["power"]))
+
+
+@pytest.mark.asyncio
+async def test_prune_removes_rows_older_than_the_retention(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+    history = HistoryWriter(path, retention=100)
+    await history.open()
+    for timestamp in (10, 500, 950):
+        history.add(sample_report("A"), timestamp)
+    await history.flush()
+
+    assert await history.prune(now=1000) == 2
+    await history.close()
+    assert [row["time"] for row in query_history(path)] == [950.0]
+
+
+@pytest.mark.asyncio
+async def test_run_writes_what_the_recording_sink_received(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+    reports = LatestReports()
+    history = HistoryWriter(path, flush_interval=0.01)
+    sink = RecordingSink(reports, history)
+    running = asyncio.create_task(history.run())
+    sink.put(sample_report("A", watt_now=5))
+    await asyncio.sleep(0.05)
+    sink.put(sample_report("A", watt_now=6))
+    running.cancel()
+    await asyncio.gather(running, return_exceptions=True)
+
+    assert reports.get_nowait()[1]["watt_now"] == 6
+    assert [row["watt_now"] for row in query_history(path)] == [5, 6]
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+
+
+def test_write_history_formats_csv_and_json_lines() -> None:
+    rows = [{"inverter_serial": "A", "time": 1.0, "watt_now": 2}]
+    csv_output, json_output = io.StringIO(), io.StringIO()
+
+    assert write_history(iter(rows), csv_output, "csv") == 1
+    assert write_history(iter(rows), json_output) == 1
+    assert csv_output.getvalue().splitlines() == [
+        "inverter_serial,time,watt_now",
+        "A,1.0,2",
+    ]
+    assert json_output.getvalue() == (
+        '{"inverter_serial":"A","time":1.0,"watt_now":2}\n'
+    )
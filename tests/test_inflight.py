@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from ginlong_wifi_mqtt.inflight import InflightWindow, next_or_failure
+
+
+class SlowBroker:
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self.release = asyncio.Event()
+        self.published: list[str] = []
+
+    async def publish(
+        self, topic: str, *, payload: str, qos: int, retain: bool
+    ) -> None:
+        del payload, qos, retain
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await self.release.wait()
+        self.active -= 1
+        if topic == "fail":
+            raise RuntimeError("no PUBACK")
+        self.published.append(topic)
+
+
+@pytest.mark.asyncio
+async def test_pipelines_up_to_window_size() -> None:
+    broker = SlowBroker()
+    window = InflightWindow(broker, size=3)
+
+    for number in range(3):
+        await window.publish(f"topic/{number}", "{}")
+    blocked = asyncio.create_task(window.publish("topic/3", "{}"))
+    await asyncio.sleep(0)
+
+    assert broker.peak == 3
+    assert not blocked.done()
+    broker.release.set()
+    await blocked
+    await window.drain()
+    assert broker.published == [f"topic/{number}" for number in range(4)]
+    assert window.acknowledged == 4
+
+
+@pytest.mark.asyncio
+async def test_failure_surfaces_and_returns_unacked_tokens_in_order() -> None:
+    broker = SlowBroker()
+    window = InflightWindow(broker, size=4)
+    await window.publish("fail", "{}", token="first")
+    await window.publish("state", "{}", token="second")
+    await window.publish("discovery", "{}", retain=True)
+
+    broker.release.set()
+    getter = asyncio.get_running_loop().create_future()
+    with pytest.raises(RuntimeError, match="no PUBACK"):
+        await next_or_failure(window, getter)
+
+    assert getter.cancelled()
+    assert window.abort() == ["first"]
+    assert len(window) == 0
+
+
+@pytest.mark.asyncio
+async def test_a_watched_task_failure_fails_the_window() -> None:
+    window = InflightWindow(SlowBroker(), size=1)
+
+    async def crash() -> None:
+        raise RuntimeError("watcher crashed")
+
+    window.watch(asyncio.create_task(crash()))
+    getter = asyncio.get_running_loop().create_future()
+    with pytest.raises(RuntimeError, match="watcher crashed"):
+        await next_or_failure(window, getter)
+    with pytest.raises(RuntimeError, match="watcher crashed"):
+        await window.publish("state", "{}")
+
+
+@pytest.mark.asyncio
+async def test_on_ack_runs_only_after_acknowledgement() -> None:
+    broker = SlowBroker()
+    window = InflightWindow(broker, size=2)
+    acked: list[str] = []
+    await window.publish("state", "{}", on_ack=lambda: acked.append("state"))
+    await window.publish("fail", "{}", on_ack=lambda: acked.append("fail"))
+    await asyncio.sleep(0)
+    assert acked == []
+
+    broker.release.set()
+    with pytest.raises(RuntimeError, match="no PUBACK"):
+        await window.drain()
+    assert acked == ["state"]
@@ -1,10 +1,18 @@
+import asyncio
+import socket
+
 import pytest
 
 from ginlong_wifi_mqtt.lan_discovery import (
+    DiscoveryService,
     LoggerAdvertisement,
+    LoggerRegistry,
+    discover_loggers,
     normalize_mac_address,
+    parse_discovery_network,
     parse_discovery_response,
     select_logger,
+    sweep_addresses,
 )
 
 
@@ -47,3 +55,133 @@ def test_selects_logger_by_mac_when_serial_is_not_reported() -> None:
 def test_rejects_invalid_mac(value: str) -> None:
     with pytest.raises(ValueError):
         normalize_mac_address(value)
+
+
+def test_registry_reports_changes_and_expires_silent_loggers() -> None:
+    registry = LoggerRegistry()
+    logger = LoggerAdvertisement("192.0.2.35", "AA1122334455", None)
+
+    assert registry.update(logger, now=0)
+    assert not registry.update(logger, now=10)
+    assert registry.update(
+        LoggerAdvertisement("192.0.2.36", "AA1122334455", None), now=20
+    )
+    assert registry.last_seen("AA1122334455") == 20
+    assert not registry.expire(now=50, max_age=30)
+    assert registry.expire(now=51, max_age=30)
+    assert registry.advertisements() == []
+
+
+@pytest.mark.asyncio
+async def test_discovery_service_tracks_replies_in_the_background() -> None:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    changes: list[list[LoggerAdvertisement]] = []
+    service = DiscoveryService(
+        changes.append,
+        broadcast_address="127.0.0.1",
+        bind_address="127.0.0.1",
+        port=port,
+        retry_delay=0.05,
+    )
+    task = asyncio.create_task(service.run())
+    await asyncio.sleep(0.02)
+    # The service also hears its own request, which must be ignored.
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as logger:
+        logger.sendto(b"192.0.2.35,AA1122334455,42", ("127.0.0.1", port))
+        logger.sendto(b"192.0.2.35,AA1122334455,42", ("127.0.0.1", port))
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert changes == [[LoggerAdvertisement("192.0.2.35", "AA1122334455", 42)]]
+
+
+@pytest.mark.asyncio
+async def test_per_round_discovery_reports_every_reply_of_a_round_at_once() -> None:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    changes: list[list[LoggerAdvertisement]] = []
+    service = DiscoveryService(
+        changes.append,
+        broadcast_address="127.0.0.1",
+        bind_address="127.0.0.1",
+        port=port,
+        interval=60,
+        retry_delay=0.2,
+        per_round=True,
+    )
+    task = asyncio.create_task(service.run())
+    await asyncio.sleep(0.02)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as logger:
+        logger.sendto(b"192.0.2.35,AA1122334455,42", ("127.0.0.1", port))
+        await asyncio.sleep(0.05)
+        assert changes == []
+        logger.sendto(b"192.0.2.36,AA1122334466,43", ("127.0.0.1", port))
+        await asyncio.sleep(0.3)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert changes == [
+        [
+            LoggerAdvertisement("192.0.2.35", "AA1122334455", 42),
+            LoggerAdvertisement("192.0.2.36", "AA1122334466", 43),
+        ]
+    ]
+
+
+def test_sweep_skips_networks_too_large_to_unicast() -> None:
+    networks = [
+        parse_discovery_network("192.0.2.9/30"),
+        parse_discovery_network("10.0.0.0/16"),
+    ]
+
+    assert sweep_addresses(networks) == ["192.0.2.9", "192.0.2.10"]
+
+
+@pytest.mark.parametrize("value", ["192.0.2.0/33", "2001:db8::/64", "lan"])
+def test_rejects_invalid_discovery_network(value: str) -> None:
+    with pytest.raises(ValueError, match="invalid discovery network"):
+        parse_discovery_network(value)
+
+
+@pytest.mark.asyncio
+async def test_discovery_sweep_merges_replies_from_every_host_by_mac() -> None:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    requests: list[str] = []
+
+    class Responder(asyncio.DatagramProtocol):
+        def connection_made(self, transport: asyncio.BaseTransport) -> None:
+            self.transport = transport
+
+        def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+            requests.append(self.transport.get_extra_info("sockname")[0])
+            self.transport.sendto(b"192.0.2.35,AA1122334455,42", addr)
+
+    loop = asyncio.get_running_loop()
+    responders = [
+        await loop.create_datagram_endpoint(
+            Responder, local_addr=(f"127.0.0.{host}", port)
+        )
+        for host in (2, 3)
+    ]
+    try:
+        advertisements = await discover_loggers(
+            broadcast_address="127.0.0.2",
+            timeout=0.1,
+            bind_address="127.0.0.1",
+            port=port,
+            networks=[parse_discovery_network("127.0.0.0/30")],
+            sweep=True,
+        )
+    finally:
+        for transport, _ in responders:
+            transport.close()
+
+    # .2 is the broadcast address and swept, .3 is the /30 broadcast address.
+    assert sorted(requests) == ["127.0.0.2", "127.0.0.2", "127.0.0.3"]
+    assert advertisements == [LoggerAdvertisement("192.0.2.35", "AA1122334455", 42)]
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from ginlong_wifi_mqtt import metrics
+from ginlong_wifi_mqtt.metrics import Counter, Histogram, start_metrics_server
+
+
+def test_renders_counters_and_cumulative_histogram_buckets() -> None:
+    counter = Counter("test_frames_total", "Frames.", ("transport",))
+    histogram = Histogram("test_seconds", "Latency.", buckets=(0.1, 1))
+    try:
+        counter.inc("udp")
+        counter.inc("udp", amount=2)
+        counter.inc('t"cp')
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+
+        assert counter.render() == (
+            "# HELP test_frames_total Frames.\n"
+            "# TYPE test_frames_total counter\n"
+            'test_frames_total{transport="udp"} 3\n'
+            'test_frames_total{transport="t\\"cp"} 1\n'
+        )
+        assert histogram.render().splitlines()[2:] == [
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1"} 2',
+            'test_seconds_bucket{le="+Inf"} 3',
+            "test_seconds_sum 5.55",
+            "test_seconds_count 3",
+        ]
+    finally:
+        metrics.REGISTRY.remove(counter)
+        metrics.REGISTRY.remove(histogram)
+
+
+def test_taken_values_merge_into_another_registry() -> None:
+    counter = Counter("test_taken_total", "Taken.", ("reason",))
+    histogram = Histogram("test_taken_seconds", "Taken.", buckets=(0.1, 1))
+    try:
+        counter.inc("short", amount=2)
+        histogram.observe(0.5)
+        taken_counts, taken_observations = counter.take(), histogram.take()
+        assert counter.value("short") == 0
+        assert histogram.render().splitlines()[2:] == []
+
+        counter.inc("short")
+        counter.merge(taken_counts)
+        histogram.merge(taken_observations)
+        histogram.merge(taken_observations)
+
+        assert counter.value("short") == 3
+        assert histogram.render().splitlines()[2:] == [
+            'test_taken_seconds_bucket{le="0.1"} 0',
+            'test_taken_seconds_bucket{le="1"} 2',
+            'test_taken_seconds_bucket{le="+Inf"} 2',
+            "test_taken_seconds_sum 1.0",
+            "test_taken_seconds_count 2",
+        ]
+    finally:
+        metrics.REGISTRY.remove(counter)
+        metrics.REGISTRY.remove(histogram)
+
+
+@pytest.mark.asyncio
+async def test_serves_metrics_over_http() -> None:
+    metrics.MQTT_RECONNECTS.inc()
+    server = await start_metrics_server("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: bridge\r\n\r\n")
+        response = await asyncio.wait_for(reader.read(), timeout=1)
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    assert b"\nginlong_mqtt_reconnects_total " in b"\n" + body
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from ginlong_wifi_mqtt.poller import PollTarget, V4Poller
+
+FAST = PollTarget("192.0.2.10", 8899, 1)
+SLOW = PollTarget("192.0.2.11", 8899, 2)
+BROKEN = PollTarget("192.0.2.12", 8899, 3)
+
+
+@pytest.mark.asyncio
+async def test_slow_or_failing_loggers_do_not_delay_others() -> None:
+    frames: list[str] = []
+    attempts = {FAST: 0, SLOW: 0, BROKEN: 0}
+
+    async def request(target: PollTarget, timeout: float) -> bytes:
+        attempts[target] += 1
+        if target == SLOW:
+            await asyncio.sleep(timeout * 2)
+        if target == BROKEN:
+            raise ConnectionRefusedError("refused")
+        return b"frame"
+
+    poller = V4Poller(
+        (FAST, SLOW, BROKEN),
+        interval=0.05,
+        on_frame=lambda raw_data, peer: frames.append(peer),
+        concurrency=3,
+        jitter=0,
+        max_backoff=0.2,
+        request=request,
+    )
+    task = asyncio.create_task(poller.run())
+    await asyncio.sleep(0.5)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert frames.count(f"poll {FAST}") >= 6
+    assert f"poll {SLOW}" not in frames
+    # Backing off 0.1s, 0.2s, 0.2s... leaves far fewer attempts than polls.
+    assert 2 <= attempts[BROKEN] <= 5
+    assert poller.failures[BROKEN] == attempts[BROKEN]
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_bounds_simultaneous_polls() -> None:
+    active = 0
+    peak = 0
+
+    async def request(target: PollTarget, timeout: float) -> bytes:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return b"frame"
+
+    targets = [PollTarget("192.0.2.10", 8899, serial) for serial in range(20)]
+    poller = V4Poller(
+        targets,
+        interval=0.05,
+        on_frame=lambda raw_data, peer: None,
+        concurrency=4,
+        request=request,
+    )
+    task = asyncio.create_task(poller.run())
+    await asyncio.sleep(0.2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert peak == 4
+
+
+@pytest.mark.asyncio
+async def test_set_targets_replaces_targets_while_running() -> None:
+    polled: list[PollTarget] = []
+
+    async def request(target: PollTarget, timeout: float) -> bytes:
+        polled.append(target)
+        return b"frame"
+
+    poller = V4Poller(
+        (), interval=0.05, on_frame=lambda raw_data, peer: None, request=request
+    )
+    task = asyncio.create_task(poller.run())
+    await asyncio.sleep(0.01)
+    poller.set_targets((FAST,))
+    await asyncio.sleep(0.12)
+    poller.set_targets((SLOW,))
+    polled.clear()
+    await asyncio.sleep(0.12)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert FAST not in polled
+    assert 2 <= polled.count(SLOW) <= 3
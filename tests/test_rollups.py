@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from ginlong_wifi_mqtt.decoder import InverterReport
+from ginlong_wifi_mqtt.rollups import RollupAggregator
+from ginlong_wifi_mqtt.store import serial_client_id
+
+from frames import sample_report
+
+
+def sample(watts: int, kwh_total: int, serial: str = "A") -> InverterReport:
+    return sample_report(serial, watt_now=watts, kwh_total=kwh_total)
+
+
+def aggregator() -> RollupAggregator:
+    return RollupAggregator(
+        lambda report: serial_client_id(report.inverter_serial),
+        lambda client_id: f"ginlong/inverter_{client_id}",
+    )
+
+
+def test_closed_window_reports_min_max_mean_last_and_counter_delta() -> None:
+    rollups = aggregator()
+    rollups.add(sample(100, 5000), 6000)
+    rollups.add(sample(300, 5002), 6010)
+    rollups.add(sample(200, 5003), 6059)
+    assert len(rollups) == 0
+
+    rollups.add(sample(50, 5004), 6060)
+
+    [(topic, payload)] = rollups.drain()
+    rollup = json.loads(payload)
+    assert topic == "ginlong/inverter_A/rollup/1m"
+    assert (rollup["start"], rollup["end"], rollup["samples"]) == (6000, 6060, 3)
+    assert rollup["watt_now"] == {"min": 100, "max": 300, "mean": 200.0, "last": 200}
+    assert rollup["kwh_total_delta"] == 3
+
+
+def test_counter_reset_adds_nothing_and_later_increases_count() -> None:
+    rollups = aggregator()
+    for offset, kwh_total in enumerate((5000, 5001, 0, 2)):
+        rollups.add(sample(0, kwh_total), 900 + offset)
+
+    rollups.close_expired(now=1800)
+
+    by_topic = {topic: json.loads(payload) for topic, payload in rollups.drain()}
+    assert by_topic["ginlong/inverter_A/rollup/1m"]["kwh_total_delta"] == 3
+    assert by_topic["ginlong/inverter_A/rollup/15m"]["kwh_total_delta"] == 3
+
+
+def test_inverters_have_separate_windows() -> None:
+    rollups = aggregator()
+    rollups.add(sample(10, 0, "A"), 0)
+    rollups.add(sample(20, 0, "B"), 1)
+
+    rollups.close_expired(now=60)
+
+    topics = sorted(topic for topic, _ in rollups.drain())
+    assert topics == ["ginlong/inverter_A/rollup/1m", "ginlong/inverter_B/rollup/1m"]
+
+
+@pytest.mark.asyncio
+async def test_get_returns_closed_windows_and_restore_puts_them_back() -> None:
+    rollups = aggregator()
+    rollups.add(sample(100, 1), 0)
+
+    messages = await rollups.get()
+    assert [topic for topic, _ in messages] == [
+        "ginlong/inverter_A/rollup/1m",
+        "ginlong/inverter_A/rollup/15m",
+    ]
+    rollups.restore(messages[1:])
+    assert await rollups.get() == messages[1:]
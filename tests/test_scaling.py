@@ -0,0 +1,65 @@
+import json
+
+from ginlong_wifi_mqtt.decoder import decode_inverter_report
+from ginlong_wifi_mqtt.discovery import DERIVED_SENSORS, SENSORS
+from ginlong_wifi_mqtt.scaling import RAW_SOURCES, scaled_values, state_json
+from ginlong_wifi_mqtt.simulator import encode_frame
+
+VALUES = {
+    "watt_now": 1900,
+    "temp": 431,
+    "dc_volts1": 3012,
+    "dc_amps1": 35,
+    "dc_volts2": 2998,
+    "dc_amps2": 31,
+    "ac_freq": 4998,
+    "kwh_day": 1234,
+    "kwh_total": 251234,
+}
+
+
+def test_scaled_and_derived_values() -> None:
+    values = scaled_values(decode_inverter_report(encode_frame("A", VALUES)))
+
+    assert values["power"] == 1900
+    assert values["temperature"] == 43.1
+    assert values["ac_frequency"] == 49.98
+    assert values["energy_today"] == 12.34
+    assert values["energy_total"] == 25123.4
+    assert values["dc_power1"] == 1054.2
+    assert values["dc_power2"] == 929.4
+    assert values["dc_power"] == 1983.6
+    assert values["efficiency"] == 95.8
+
+
+def test_efficiency_is_null_without_dc_power() -> None:
+    values = scaled_values(decode_inverter_report(encode_frame("A", {})))
+
+    assert values["dc_power"] == 0
+    assert values["efficiency"] is None
+
+
+def test_changed_fields_select_dependent_values_only() -> None:
+    report = decode_inverter_report(encode_frame("A", VALUES))
+
+    assert set(scaled_values(report, {"dc_amps1"})) == {
+        "dc_current1",
+        "dc_power1",
+        "dc_power",
+        "efficiency",
+    }
+    assert RAW_SOURCES["efficiency"] >= {"watt_now", "dc_volts3"}
+
+
+def test_state_json_extends_the_raw_schema() -> None:
+    report = decode_inverter_report(encode_frame("A", VALUES))
+    state = json.loads(state_json(report))
+
+    assert state["watt_now"] == 1900
+    assert state["temperature"] == 43.1
+    assert state | json.loads(report.to_json()) == state
+
+
+def test_every_sensor_reads_a_scaled_key() -> None:
+    for sensor in SENSORS + DERIVED_SENSORS:
+        assert sensor.scaled_key in RAW_SOURCES
@@ -0,0 +1,75 @@
+import asyncio
+import socket
+
+import pytest
+
+from ginlong_wifi_mqtt.decoder import decode_inverter_report
+from ginlong_wifi_mqtt.lan_discovery import LoggerAdvertisement, discover_loggers
+from ginlong_wifi_mqtt.simulator import (
+    DiscoveryResponder,
+    encode_frame,
+    simulated_fleet,
+    start_v4_responder,
+)
+from ginlong_wifi_mqtt.v4 import V4Session
+
+NOON = 1_750_000_000 - 1_750_000_000 % 86400 + 12 * 3600
+
+
+def test_encoded_frames_decode_with_valid_checksum() -> None:
+    frame = encode_frame("SIM0000001", {"watt_now": 4321, "kwh_total": 123456})
+    report = decode_inverter_report(frame)
+
+    assert report.inverter_serial == "SIM0000001"
+    assert (report["watt_now"], report["kwh_total"], report["temp"]) == (
+        4321,
+        123456,
+        0,
+    )
+    assert sum(frame[1:-2]) & 0xFF == frame[-2]
+
+
+def test_simulated_energy_counters_only_increase() -> None:
+    device = simulated_fleet(1, seed=1)[0]
+    first = decode_inverter_report(device.frame(NOON))
+    second = decode_inverter_report(device.frame(NOON + 600))
+
+    assert 0 < second["watt_now"] <= device.rated_watts
+    assert second["kwh_total"] >= first["kwh_total"]
+    assert second["kwh_day"] > first["kwh_day"]
+
+
+@pytest.mark.asyncio
+async def test_responders_answer_polls_and_discovery_for_every_device() -> None:
+    devices = simulated_fleet(3, seed=2)
+    server = await start_v4_responder(devices, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    session = V4Session("127.0.0.1", port, devices[1].logger_serial)
+    try:
+        report = decode_inverter_report(await session.request(timeout=1))
+    finally:
+        await session.close()
+        server.close()
+        await server.wait_closed()
+    assert report.inverter_serial == devices[1].inverter_serial
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        discovery_port = probe.getsockname()[1]
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: DiscoveryResponder(devices, "127.0.0.1"),
+        local_addr=("127.0.0.2", discovery_port),
+    )
+    try:
+        advertisements = await discover_loggers(
+            broadcast_address="127.0.0.2",
+            timeout=0.1,
+            bind_address="127.0.0.1",
+            port=discovery_port,
+        )
+    finally:
+        transport.close()
+    assert sorted(advertisements, key=lambda item: item.mac_address) == [
+        LoggerAdvertisement("127.0.0.1", device.mac_address, device.logger_serial)
+        for device in devices
+    ]
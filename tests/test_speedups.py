@@ -0,0 +1,51 @@
+import asyncio
+import json
+from collections.abc import Iterator
+
+import pytest
+
+from ginlong_wifi_mqtt import speedups
+from ginlong_wifi_mqtt.speedups import (
+    dumps,
+    event_loop_factory,
+    run_event_loop,
+    run_in_loop,
+    select_json_encoder,
+)
+
+
+@pytest.fixture(autouse=True)
+def restore_encoder() -> Iterator[None]:
+    yield
+    select_json_encoder("json")
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec", "auto"])
+def test_every_encoder_matches_compact_stdlib_output(name: str) -> None:
+    value = {"watt_now": 1234, "inverter_serial": "1234567890", "temp": 43}
+    selected = select_json_encoder(name)
+
+    assert selected in ("json", "orjson", "msgspec")
+    assert dumps(value) == json.dumps(value, separators=(",", ":"))
+    assert dumps(value, sort_keys=True) == json.dumps(
+        value, separators=(",", ":"), sort_keys=True
+    )
+
+
+def test_missing_encoder_falls_back_to_stdlib(monkeypatch: pytest.MonkeyPatch) -> None:
+    def missing() -> speedups.Encoder:
+        raise ImportError("not installed")
+
+    monkeypatch.setitem(speedups._ENCODERS, "orjson", missing)
+
+    assert select_json_encoder("orjson") == "json"
+
+
+def test_asyncio_loop_runs_coroutines() -> None:
+    async def loop_class() -> str:
+        return type(asyncio.get_running_loop()).__module__
+
+    assert event_loop_factory("asyncio") == ("asyncio", None)
+    assert run_event_loop(loop_class(), "asyncio").startswith("asyncio")
+    assert run_event_loop(loop_class(), "auto")
+    assert run_in_loop(loop_class()).startswith("asyncio")
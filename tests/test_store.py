@@ -0,0 +1,131 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from ginlong_wifi_mqtt.store import LatestReports, serial_client_id
+
+from frames import sample_report
+
+
+def test_keeps_latest_report_during_mqtt_outage() -> None:
+    reports = LatestReports("solis")
+
+    reports.put(sample_report("A", watt_now=1))
+    reports.put(sample_report("B", watt_now=2))
+
+    client_id, latest = reports.get_nowait()
+    assert (client_id, latest["watt_now"]) == ("solis", 2)
+    assert len(reports) == 0
+
+
+def test_fleet_mode_keeps_one_slot_per_inverter_serial() -> None:
+    reports = LatestReports()
+
+    reports.put(sample_report("A", watt_now=1))
+    reports.put(sample_report("B", watt_now=2))
+    reports.put(sample_report("A", watt_now=3))
+
+    assert [
+        (client_id, latest["watt_now"])
+        for client_id, latest in (reports.get_nowait(), reports.get_nowait())
+    ] == [("B", 2), ("A", 3)]
+    with pytest.raises(asyncio.QueueEmpty):
+        reports.get_nowait()
+
+
+@pytest.mark.parametrize(
+    ("serial", "expected"),
+    [("000750017322006", "000750017322006"), ("ab/c#1 ", "ab_c_1"), ("", "unknown")],
+)
+def test_serial_client_ids_are_topic_safe(serial: str, expected: str) -> None:
+    assert serial_client_id(serial) == expected
+
+
+@pytest.mark.asyncio
+async def test_get_waits_for_next_report() -> None:
+    reports = LatestReports()
+    waiter = asyncio.create_task(reports.get())
+    await asyncio.sleep(0)
+
+    reports.put(sample_report("A", watt_now=1))
+
+    client_id, _ = await asyncio.wait_for(waiter, timeout=1)
+    assert client_id == "A"
+
+
+def test_backlog_keeps_superseded_reports_in_order() -> None:
+    reports = LatestReports("solis", backlog_size=2)
+
+    for watt_now in range(1, 5):
+        reports.put(sample_report("A", watt_now=watt_now))
+
+    # The oldest report did not fit and there is nowhere to spill it.
+    assert reports.dropped == 1
+    assert [reports.get_nowait()[1]["watt_now"] for _ in range(3)] == [2, 3, 4]
+
+
+def test_backlog_spills_to_disk_and_survives_restart(tmp_path: Path) -> None:
+    spill_path = tmp_path / "backlog.seg"
+    reports = LatestReports(backlog_size=1, spill_path=spill_path)
+    for watt_now in range(1, 6):
+        reports.put(sample_report("A", watt_now=watt_now))
+    reports.close()
+
+    restarted = LatestReports(backlog_size=1, spill_path=spill_path)
+
+    assert restarted.spilled_bytes > 0
+    assert [
+        (client_id, replayed["watt_now"])
+        for client_id, replayed in (restarted.get_nowait() for _ in range(3))
+    ] == [("A", 1), ("A", 2), ("A", 3)]
+    assert restarted.spilled_bytes == 0
+    assert spill_path.stat().st_size == 0
+
+
+def test_corrupt_and_torn_spill_records_are_skipped(tmp_path: Path) -> None:
+    spill_path = tmp_path / "backlog.seg"
+    valid = sample_report("A", watt_now=7).hex()
+    spill_path.write_text(
+        f"A\t{valid}\n"
+        f"A\t{valid[:-1]}\n"
+        f"A\t{valid[:60]}\n"
+        f"B\t{sample_report('B', watt_now=8).hex()}\n"
+        f"A\t{valid[:120]}"
+    )
+
+    restarted = LatestReports(backlog_size=1, spill_path=spill_path)
+
+    assert not spill_path.read_text().endswith(valid[:120])
+    assert [
+        (client_id, replayed["watt_now"])
+        for client_id, replayed in (restarted.get_nowait() for _ in range(2))
+    ] == [("A", 7), ("B", 8)]
+    assert restarted.dropped == 2
+    with pytest.raises(asyncio.QueueEmpty):
+        restarted.get_nowait()
+
+
+def test_restored_report_is_published_before_backlog() -> None:
+    reports = LatestReports("solis", backlog_size=4)
+    reports.put(sample_report("A", watt_now=1))
+    client_id, first = reports.get_nowait()
+    reports.put(sample_report("A", watt_now=2))
+    reports.put(sample_report("A", watt_now=3))
+
+    reports.restore(client_id, first)
+
+    assert [reports.get_nowait()[1]["watt_now"] for _ in range(3)] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_finished_store_stops_waiting_once_empty() -> None:
+    reports = LatestReports("solis")
+    getter = asyncio.create_task(reports.get())
+    await asyncio.sleep(0)
+    reports.put(sample_report("A", watt_now=1))
+    reports.finish()
+
+    assert (await getter)[1]["watt_now"] == 1
+    with pytest.raises(asyncio.QueueEmpty):
+        await reports.get()
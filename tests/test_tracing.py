@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+from ginlong_wifi_mqtt.tracing import STAGE_SECONDS, ReportTrace
+
+
+def test_stages_split_the_total_between_timestamps() -> None:
+    trace = ReportTrace(10.0, 10.5)
+    trace.enqueued = 11.0
+    trace.dequeued = 13.0
+
+    assert trace.stages(16.0) == {
+        "decode": 0.5,
+        "enqueue": 0.5,
+        "queue": 2.0,
+        "publish": 3.0,
+        "total": 6.0,
+    }
+
+
+def test_complete_records_histograms_and_logs_slow_reports(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    before = {
+        stage: series.count for (stage,), series in STAGE_SECONDS.values.items()
+    }
+    trace = ReportTrace(0.0, 0.0)
+
+    with caplog.at_level(logging.WARNING, logger="ginlong_wifi_mqtt.tracing"):
+        stages = trace.complete("1234567890", slow_threshold=0)
+
+    assert set(stages) == {"decode", "enqueue", "queue", "publish", "total"}
+    for stage in stages:
+        assert STAGE_SECONDS.values[(stage,)].count == before.get(stage, 0) + 1
+    assert "Slow report from inverter 1234567890: decode=" in caplog.text
+
+
+def test_complete_stays_quiet_below_threshold(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    trace = ReportTrace(1e12, 1e12)
+
+    with caplog.at_level(logging.WARNING, logger="ginlong_wifi_mqtt.tracing"):
+        trace.complete("1234567890", slow_threshold=1)
+
+    assert caplog.text == ""
@@ -1,6 +1,10 @@
+import asyncio
+
 import pytest
 
-from ginlong_wifi_mqtt.v4 import create_v4_status_request
+from ginlong_wifi_mqtt.v4 import V4Session, create_v4_status_request
+
+from frames import POLLED_FRAME as RESPONSE
 
 
 def test_builds_observed_legacy_status_request() -> None:
@@ -13,3 +17,38 @@ def test_builds_observed_legacy_status_request() -> None:
 def test_rejects_out_of_range_logger_serial(serial: int) -> None:
     with pytest.raises(ValueError, match="unsigned 32-bit"):
         create_v4_status_request(serial)
+
+
+@pytest.mark.asyncio
+async def test_session_reuses_connection_and_reconnects_after_drop() -> None:
+    connections = 0
+
+    async def logger(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        nonlocal connections
+        connections += 1
+        requests = 0
+        while await reader.read(16):
+            requests += 1
+            writer.write(RESPONSE)
+            await writer.drain()
+            # The first connection is dropped after two requests.
+            if connections == 1 and requests == 2:
+                break
+        writer.close()
+
+    server = await asyncio.start_server(logger, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    session = V4Session("127.0.0.1", port, 123456789)
+    try:
+        assert await session.request(timeout=1) == RESPONSE
+        assert await session.request(timeout=1) == RESPONSE
+        await asyncio.sleep(0.05)
+        assert await session.request(timeout=1) == RESPONSE
+    finally:
+        await session.close()
+        server.close()
+        await server.wait_closed()
+
+    assert session.connects == connections == 2
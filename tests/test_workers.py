@@ -0,0 +1,142 @@
+import asyncio
+import socket
+
+import pytest
+
+from ginlong_wifi_mqtt.app import Settings
+from ginlong_wifi_mqtt.metrics import (
+    DECODE_FAILURES,
+    FRAME_BYTES,
+    WORKER_REPORTS_DROPPED,
+)
+from ginlong_wifi_mqtt.store import LatestReports
+from ginlong_wifi_mqtt.tracing import ReportTrace
+from ginlong_wifi_mqtt.workers import ReportForwarder, receive_forwarded, run_workers
+
+from frames import report_frame, sample_report
+
+
+@pytest.mark.asyncio
+async def test_forwarded_reports_keep_their_frame_and_timestamps() -> None:
+    worker_end, bridge_end = socket.socketpair()
+    reports = LatestReports()
+    _, worker_writer = await asyncio.open_connection(sock=worker_end)
+    reader, writer = await asyncio.open_connection(sock=bridge_end)
+    receiving = asyncio.create_task(receive_forwarded(reader, writer, reports))
+
+    forwarder = ReportForwarder(worker_writer)
+    for serial in ("A", "B"):
+        report = sample_report(serial, watt_now=7)
+        report.trace = ReportTrace(1.0, 2.0)
+        forwarder.put(report)
+    await worker_writer.drain()
+    worker_writer.close()
+
+    assert await asyncio.wait_for(receiving, timeout=1) == 2
+    received = [reports.get_nowait()[1] for _ in range(2)]
+    assert [report.inverter_serial for report in received] == ["A", "B"]
+    assert received[0]["watt_now"] == 7
+    assert received[0].trace is not None
+    assert (received[0].trace.received, received[0].trace.decoded) == (1.0, 2.0)
+
+
+@pytest.mark.asyncio
+async def test_worker_metrics_are_added_to_the_bridge_metrics() -> None:
+    worker_end, bridge_end = socket.socketpair()
+    reports = LatestReports()
+    _, worker_writer = await asyncio.open_connection(sock=worker_end)
+    reader, writer = await asyncio.open_connection(sock=bridge_end)
+    receiving = asyncio.create_task(receive_forwarded(reader, writer, reports))
+    failures = DECODE_FAILURES.value("forwarded test failure")
+    observed = sum(series.count for series in FRAME_BYTES.values.values())
+
+    DECODE_FAILURES.inc("forwarded test failure")
+    FRAME_BYTES.observe(103, "tcp")
+    forwarder = ReportForwarder(worker_writer)
+    forwarder.send_metrics()
+    # A worker's own registry is emptied once its counts have been sent.
+    assert DECODE_FAILURES.value("forwarded test failure") == 0
+    forwarder.send_metrics()
+    await worker_writer.drain()
+    worker_writer.close()
+
+    assert await asyncio.wait_for(receiving, timeout=1) == 0
+    assert DECODE_FAILURES.value("forwarded test failure") == failures + 1
+    assert sum(series.count for series in FRAME_BYTES.values.values()) == (
+        observed + 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_forwarder_drops_reports_while_the_bridge_falls_behind() -> None:
+    worker_end, bridge_end = socket.socketpair()
+    _, worker_writer = await asyncio.open_connection(sock=worker_end)
+    dropped = WORKER_REPORTS_DROPPED.value()
+
+    forwarder = ReportForwarder(worker_writer, buffer_limit=-1)
+    forwarder.put(sample_report("A"))
+
+    assert forwarder.dropped == 1
+    assert WORKER_REPORTS_DROPPED.value() == dropped + 1
+    worker_writer.close()
+    bridge_end.close()
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_worker_processes_share_the_port_and_forward_reports() -> None:
+    port = free_port()
+    settings = Settings(
+        listen_enabled=True,
+        listen_address="127.0.0.1",
+        listen_port=port,
+        client_id="test",
+        mqtt_address="127.0.0.1",
+        mqtt_port=1883,
+        mqtt_username=None,
+        mqtt_password=None,
+        homeassistant=False,
+        protocol="tcp",
+        reconnect_delay=0,
+        poll_host=None,
+        poll_port=8899,
+        logger_serial=None,
+        poll_interval=60,
+        discover=False,
+        logger_mac=None,
+        discovery_broadcast="255.255.255.255",
+        discovery_bind_address="0.0.0.0",
+        discovery_timeout=3,
+        workers=2,
+        event_loop="asyncio",
+    )
+    reports = LatestReports()
+    workers = asyncio.create_task(run_workers(settings, reports))
+    serials = [f"W{number}" for number in range(8)]
+    try:
+        for serial in serials:
+            for _ in range(100):
+                try:
+                    _, writer = await asyncio.open_connection("127.0.0.1", port)
+                    break
+                except OSError:
+                    await asyncio.sleep(0.1)
+            writer.write(report_frame(serial))
+            await writer.drain()
+            writer.close()
+
+        async def stored() -> None:
+            while len(reports) < len(serials):
+                await asyncio.sleep(0.05)
+
+        await asyncio.wait_for(stored(), timeout=10)
+    finally:
+        workers.cancel()
+        await asyncio.gather(workers, return_exceptions=True)
+
+    assert sorted(reports.get_nowait()[0] for _ in serials) == serials